@@ -0,0 +1 @@
+"""Microbenchmarks for the emulator's hot paths."""
@@ -0,0 +1,48 @@
+"""
+Directory load time: parsing users.json vs mapping the binary snapshot.
+
+Usage:
+    python -m benchmarks.bench_directory_startup [count]
+"""
+import itertools
+import json
+import sys
+import time
+
+from benchmarks.common import isolate_data_dirs, measure, report, synthetic_users
+
+isolate_data_dirs()
+
+from config import config  # noqa: E402
+from services.user_service import UserService  # noqa: E402
+
+
+def timed_load() -> tuple:
+    start = time.perf_counter()
+    service = UserService()
+    return service, time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    users = list(synthetic_users(count))
+    config.USERS_FILE.write_text(json.dumps(users, indent=2))
+    config.USERS_SNAPSHOT_FILE.unlink(missing_ok=True)
+
+    print(f"Directory of {count:,} users")
+    config.DIRECTORY_SNAPSHOT = False
+    _, json_time = timed_load()
+    print(f"{'JSON parse + records':<30} {json_time:8.2f}s")
+
+    config.DIRECTORY_SNAPSHOT = True
+    _, build_time = timed_load()
+    print(f"{'first start (compile snapshot)':<30} {build_time:8.2f}s")
+    service, mmap_time = timed_load()
+    print(f"{'later start (mmap snapshot)':<30} {mmap_time:8.2f}s   x{json_time / mmap_time:.0f}")
+
+    upns = itertools.cycle([u["userPrincipalName"] for u in users[:: max(1, count // 1000)]])
+    report("snapshot lookup by UPN", measure(lambda: service._find_by_upn(next(upns)), 1.0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+End-to-end endpoint benchmarks with regression gating.
+
+Drives the FastAPI app in-process through httpx's ASGI transport (routing,
+validation, middleware, serialization; no sockets) for the authorize flow,
+every /token grant, userinfo, JWKS, discovery and SAML metadata, and reports
+ops/s with p50/p95/p99 latency per scenario and directory size.
+
+Each directory size runs in its own subprocess with fresh DATA_DIR/KEYS_DIR,
+seeded with synthetic users plus the default test user.
+
+Usage:
+    python -m benchmarks.bench_endpoints [--sizes 1000,100000] [--requests 200]
+        [--concurrency 4] [--scenarios token_client_credentials,jwks]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.2]
+
+Exits 1 if any request got an unexpected status: an endpoint that fails
+fast would otherwise look like a speedup. With --baseline, also exits 1 if
+any scenario's ops/s dropped, or its p95 grew, by more than --threshold
+(a fraction) against the stored results.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+TENANT = "common"
+TEST_USER = "test@contoso.onmicrosoft.com"
+TEST_PASSWORD = "Test123!"
+WEB_APP = "test-app-123"
+WEB_SECRET = "test-secret"
+REDIRECT_URI = "http://localhost:3029/callback"
+SERVICE_APP = "service-app-456"
+SERVICE_SECRET = "service-secret"
+
+
+def _scenarios(token_service, app_service, user_service) -> Dict[str, tuple]:
+    """name -> (prepare(n) -> per-request arguments, request(client, argument) coroutine, expected status)."""
+    user = user_service.get_user_by_upn(TEST_USER)
+    web_app = app_service.get_app_by_id(WEB_APP)
+    token_url = f"/{TENANT}/oauth2/v2.0/token"
+    authorize_url = f"/{TENANT}/oauth2/v2.0/authorize"
+
+    def repeat(value):
+        return lambda n: [value] * n
+
+    def codes(n):
+        return [
+            token_service.generate_authorization_code(user, web_app, REDIRECT_URI, "openid profile")
+            for _ in range(n)
+        ]
+
+    def refresh_tokens(n):
+        return [token_service.generate_refresh_token(user, web_app) for _ in range(n)]
+
+    def access_tokens(n):
+        # One token for every request, so the verified-token cache is exercised
+        return [token_service.generate_access_token(user, web_app, "openid profile", TENANT)] * n
+
+    return {
+        "authorize_get": (
+            repeat({
+                "client_id": WEB_APP, "response_type": "code",
+                "redirect_uri": REDIRECT_URI, "scope": "openid profile"
+            }),
+            lambda client, params: client.get(authorize_url, params=params),
+            200
+        ),
+        "authorize_get_test_user": (
+            repeat({
+                "client_id": WEB_APP, "response_type": "code", "redirect_uri": REDIRECT_URI,
+                "scope": "openid profile", "test_user": TEST_USER
+            }),
+            lambda client, params: client.get(authorize_url, params=params),
+            307
+        ),
+        "authorize_post": (
+            repeat({
+                "username": TEST_USER, "password": TEST_PASSWORD,
+                "client_id": WEB_APP, "redirect_uri": REDIRECT_URI
+            }),
+            lambda client, form: client.post(authorize_url, data=form),
+            302
+        ),
+        "token_authorization_code": (
+            codes,
+            lambda client, code: client.post(token_url, data={
+                "grant_type": "authorization_code", "client_id": WEB_APP,
+                "client_secret": WEB_SECRET, "code": code, "redirect_uri": REDIRECT_URI
+            }),
+            200
+        ),
+        "token_client_credentials": (
+            repeat(None),
+            lambda client, _: client.post(token_url, data={
+                "grant_type": "client_credentials", "client_id": SERVICE_APP,
+                "client_secret": SERVICE_SECRET, "scope": "api://.default"
+            }),
+            200
+        ),
+        "token_refresh_token": (
+            refresh_tokens,
+            lambda client, refresh_token: client.post(token_url, data={
+                "grant_type": "refresh_token", "client_id": WEB_APP,
+                "refresh_token": refresh_token
+            }),
+            200
+        ),
+        "token_password": (
+            repeat(None),
+            lambda client, _: client.post(token_url, data={
+                "grant_type": "password", "client_id": WEB_APP,
+                "username": TEST_USER, "password": TEST_PASSWORD
+            }),
+            200
+        ),
+        "userinfo": (
+            access_tokens,
+            lambda client, token: client.get(
+                "/oidc/userinfo", headers={"Authorization": f"Bearer {token}"}
+            ),
+            200
+        ),
+        "jwks": (
+            repeat(None),
+            lambda client, _: client.get(f"/{TENANT}/discovery/v2.0/keys"),
+            200
+        ),
+        "discovery": (
+            repeat(None),
+            lambda client, _: client.get(f"/{TENANT}/v2.0/.well-known/openid-configuration"),
+            200
+        ),
+        "saml_metadata": (
+            repeat(None),
+            lambda client, _: client.get(
+                f"/{TENANT}/FederationMetadata/2007-06/FederationMetadata.xml"
+            ),
+            200
+        ),
+    }
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def _run_scenario(client, prepare: Callable, request: Callable, expected: int,
+                        requests: int, concurrency: int) -> dict:
+    await request(client, prepare(1)[0])  # warm up (template compile, caches)
+    arguments = prepare(requests)
+    latencies: List[float] = []
+    errors = 0
+
+    async def worker(chunk):
+        nonlocal errors
+        for argument in chunk:
+            start = time.perf_counter()
+            response = await request(client, argument)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != expected:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(arguments[i::concurrency]) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "ops_per_sec": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def _seed_directory(size: int) -> None:
+    """users.json with the default test user and `size` synthetic users."""
+    from benchmarks.common import synthetic_users
+    from config import config
+    from services.password_hasher import get_hasher
+
+    test_user = {
+        "id": "00000000-0000-4000-8000-000000000001",
+        "userPrincipalName": TEST_USER,
+        "displayName": "Test User",
+        "givenName": "Test",
+        "surname": "User",
+        "mail": TEST_USER,
+        "jobTitle": "Developer",
+        "department": "Engineering",
+        "passwordHash": get_hasher().hash(TEST_PASSWORD)
+    }
+    config.USERS_FILE.write_text(json.dumps([test_user, *synthetic_users(size)]))
+    config.USERS_SNAPSHOT_FILE.unlink(missing_ok=True)
+
+
+async def _run_size(size: int, names: List[str], requests: int, concurrency: int) -> dict:
+    import httpx
+
+    _seed_directory(size)
+    from main import app, lifespan
+    from services import app_service, token_service, user_service
+
+    scenarios = _scenarios(token_service, app_service, user_service)
+    results = {}
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+            for name in names:
+                prepare, request, expected = scenarios[name]
+                results[name] = await _run_scenario(
+                    client, prepare, request, expected, requests, concurrency
+                )
+    return results
+
+
+def _run_child(size: int, args) -> dict:
+    """Benchmark one directory size in a fresh interpreter and data directory."""
+    scratch = tempfile.mkdtemp(prefix="entra-bench-")
+    env = dict(
+        os.environ,
+        DATA_DIR=os.path.join(scratch, "data"),
+        KEYS_DIR=os.path.join(scratch, "keys")
+    )
+    command = [
+        sys.executable, "-m", "benchmarks.bench_endpoints", "--child", str(size),
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+        "--scenarios", ",".join(args.scenarios)
+    ]
+    output = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return json.loads(output)
+
+
+def failures(results: dict) -> List[str]:
+    """Scenarios with requests that got an unexpected status, as report lines."""
+    return [
+        f"{name} @ {size} users: {current['errors']} of {current['requests']} requests failed"
+        for size, scenarios in results["results"].items()
+        for name, current in scenarios.items()
+        if current["errors"]
+    ]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Regressions of `results` against `baseline`, as report lines.
+
+    A scenario with errors is always a regression, whatever its timings.
+    """
+    regressions = failures(results)
+    for size, scenarios in results["results"].items():
+        for name, current in scenarios.items():
+            if current["errors"]:
+                continue
+            previous = baseline.get("results", {}).get(size, {}).get(name)
+            if not previous:
+                continue
+            if current["ops_per_sec"] < previous["ops_per_sec"] * (1 - threshold):
+                regressions.append(
+                    f"{name} @ {size} users: {current['ops_per_sec']:,.0f} ops/s "
+                    f"(baseline {previous['ops_per_sec']:,.0f})"
+                )
+            if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+                regressions.append(
+                    f"{name} @ {size} users: p95 {current['p95_ms']:.2f} ms "
+                    f"(baseline {previous['p95_ms']:.2f} ms)"
+                )
+    return regressions
+
+
+def _print_table(size: str, scenarios: dict) -> None:
+    print(f"Directory size {int(size):,}")
+    print(f"  {'scenario':<26} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, result in scenarios.items():
+        print(
+            f"  {name:<26} {result['ops_per_sec']:>10,.0f} {result['p50_ms']:>9.2f}"
+            f" {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}"
+        )
+
+
+SCENARIOS = [
+    "authorize_get", "authorize_get_test_user", "authorize_post",
+    "token_authorization_code", "token_client_credentials", "token_refresh_token",
+    "token_password", "userinfo", "jwks", "discovery", "saml_metadata"
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,100000",
+                        help="comma-separated directory sizes")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="concurrent in-flight requests")
+    parser.add_argument("--scenarios", type=lambda value: value.split(","), default=SCENARIOS,
+                        help="comma-separated scenarios (default: all)")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results stored by --output")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed regression as a fraction (default 0.2)")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    if args.child is not None:
+        results = asyncio.run(_run_size(args.child, args.scenarios, args.requests, args.concurrency))
+        print(json.dumps(results))
+        return
+
+    results = {
+        "meta": {
+            "timestamp": int(time.time()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "requests": args.requests,
+            "concurrency": args.concurrency
+        },
+        "results": {}
+    }
+    for size in [int(n) for n in args.sizes.split(",")]:
+        results["results"][str(size)] = _run_child(size, args)
+        _print_table(str(size), results["results"][str(size)])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"Regressions above {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions above {args.threshold:.0%} against {args.baseline}")
+    else:
+        errors = failures(results)
+        if errors:
+            print("Failed requests:")
+            for line in errors:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Token issuance throughput per signing algorithm (RS256, PS256, ES256, EdDSA).
+
+Usage:
+    python -m benchmarks.bench_signing_algorithms [seconds]
+"""
+import sys
+
+from benchmarks.common import isolate_data_dirs, measure, report
+
+isolate_data_dirs()
+
+import jwt  # noqa: E402
+from services import key_service, user_service, app_service, token_service  # noqa: E402
+from services.key_service import ALGORITHMS  # noqa: E402
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    user = user_service.get_user_by_upn("test@contoso.onmicrosoft.com")
+    base_app = app_service.get_app_by_id("test-app-123")
+    key_service.ensure_algorithms(ALGORITHMS)
+
+    results = {}
+    for alg in ALGORITHMS:
+        app = base_app.model_copy(update={"signingAlgorithm": alg})
+        key = key_service.get_active_key(alg)
+        token = token_service.generate_access_token(user, app, "openid")
+        results[alg] = (
+            measure(lambda: token_service.generate_access_token(user, app, "openid"), seconds),
+            measure(lambda: jwt.decode(
+                token, key.public_key, algorithms=[alg], options={"verify_aud": False}
+            ), seconds)
+        )
+
+    baseline_issue, baseline_verify = results["RS256"]
+    print("Access token issuance (generate_access_token)")
+    for alg, (issue, _) in results.items():
+        report(alg, issue, baseline_issue if alg != "RS256" else None)
+    print("Signature verification (jwt.decode)")
+    for alg, (_, verify) in results.items():
+        report(alg, verify, baseline_verify if alg != "RS256" else None)
+
+
+if __name__ == "__main__":
+    main()
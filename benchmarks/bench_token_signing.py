@@ -0,0 +1,87 @@
+"""
+Token signing throughput: PEM round trip vs cached key object, and
+PyJWT's generic encoding vs precompiled claim templates.
+
+Usage:
+    python -m benchmarks.bench_token_signing [seconds]
+"""
+import secrets
+import sys
+import uuid
+from datetime import datetime, timedelta
+
+from benchmarks.common import isolate_data_dirs, measure, report
+
+isolate_data_dirs()
+
+import jwt  # noqa: E402
+from services import key_service, user_service, app_service, token_service  # noqa: E402
+from config import config  # noqa: E402
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    user = user_service.get_user_by_upn("test@contoso.onmicrosoft.com")
+    app = app_service.get_app_by_id("test-app-123")
+    template = token_service.access_token_template(user, app)
+    claims = template.claims(dict(token_service.token_values(), scp="openid"))
+
+    def sign_with_pem():
+        # Original behaviour: serialize to PKCS8 PEM and let PyJWT parse it back
+        return jwt.encode(
+            claims,
+            key_service.get_private_key_pem(),
+            algorithm="RS256",
+            headers={"kid": key_service.kid}
+        )
+
+    def sign_with_key_object():
+        return jwt.encode(claims, key_service.private_key, algorithm="RS256", headers={"kid": key_service.kid})
+
+    def build_claims_dict():
+        # What generate_access_token did per call before templates
+        now = datetime.utcnow()
+        return {
+            "aud": f"api://{app.appId}",
+            "iss": config.get_issuer("common"),
+            "iat": int(now.timestamp()),
+            "nbf": int(now.timestamp()),
+            "exp": int((now + timedelta(seconds=config.TOKEN_EXPIRY_SECONDS)).timestamp()),
+            "aio": secrets.token_urlsafe(16),
+            "azp": app.appId,
+            "azpacr": "1",
+            "name": user.displayName,
+            "oid": user.id,
+            "preferred_username": user.userPrincipalName,
+            "rh": secrets.token_urlsafe(8),
+            "scp": "openid",
+            "sub": user.id,
+            "tid": "common",
+            "uti": str(uuid.uuid4()),
+            "ver": "2.0"
+        }
+
+    def render_template():
+        values = token_service.token_values()
+        values["scp"] = "openid"
+        return template.render(values)
+
+    print("Token signing (RS256, 2048-bit)")
+    before = measure(sign_with_pem, seconds)
+    report("jwt.encode with PEM", before)
+    report("jwt.encode with key object", measure(sign_with_key_object, seconds), before)
+    report(
+        "generate_access_token",
+        measure(lambda: token_service.generate_access_token(user, app, "openid"), seconds),
+        before
+    )
+
+    print("Payload serialization (no signature)")
+    encode_payload = jwt.api_jwt.PyJWT()._encode_payload
+    baseline = measure(lambda: encode_payload(build_claims_dict()), seconds)
+    report("claims dict + json.dumps", baseline)
+    report("claim template render", measure(render_template, seconds), baseline)
+
+
+if __name__ == "__main__":
+    main()
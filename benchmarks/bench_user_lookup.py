@@ -0,0 +1,48 @@
+"""
+User lookup scaling: linear scan vs dictionary indexes.
+
+Usage:
+    python -m benchmarks.bench_user_lookup [sizes] [seconds]
+
+`sizes` is a comma-separated list of directory sizes (default 1000,10000,100000).
+"""
+import itertools
+import random
+import sys
+
+from benchmarks.common import isolate_data_dirs, measure, report
+
+isolate_data_dirs()
+
+from benchmarks.common import synthetic_users  # noqa: E402
+from models.user import UserRecord  # noqa: E402
+from services import user_service  # noqa: E402
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1].split(",")] if len(sys.argv) > 1 else [1000, 10000, 100000]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    rng = random.Random(42)
+
+    for size in sizes:
+        user_service._snapshot = None
+        user_service._records = [UserRecord.from_dict(u) for u in synthetic_users(size)]
+        user_service._rebuild_indexes()
+        sample = rng.sample(user_service._records, 256)
+        upns = itertools.cycle([u.userPrincipalName.upper() for u in sample])
+        ids = itertools.cycle([u.id for u in sample])
+
+        def scan_by_upn():
+            upn = next(upns).lower()
+            return next((u for u in user_service._records if u.userPrincipalName.lower() == upn), None)
+
+        print(f"Directory size {size:,}")
+        before = measure(scan_by_upn, seconds)
+        report("  linear scan by UPN", before)
+        by_upn = measure(lambda: user_service.get_user_by_upn(next(upns)), seconds)
+        report("  get_user_by_upn (index)", by_upn, before)
+        report("  get_user_by_id (index)", measure(lambda: user_service.get_user_by_id(next(ids)), seconds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Memory and load time per user: pydantic User models vs compact UserRecords.
+
+Usage:
+    python -m benchmarks.bench_user_memory [count]
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import isolate_data_dirs, synthetic_users
+
+isolate_data_dirs()
+
+from models.user import User, UserRecord  # noqa: E402
+from services import user_service  # noqa: E402
+from services.user_service import UserService  # noqa: E402
+
+
+def measure_directory(build):
+    """Return (bytes retained, seconds) for building a directory."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    directory = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del directory
+    return retained, elapsed
+
+
+def build_models(raw: str):
+    """Previous layout: validated User models plus dict indexes."""
+    users = [User(**user) for user in json.loads(raw)]
+    return (
+        users,
+        {u.id: u for u in users},
+        {u.userPrincipalName.lower(): u for u in users},
+        {u.mail.lower(): u for u in users if u.mail}
+    )
+
+
+def build_records(raw: str):
+    """Current layout: UserService records and indexes."""
+    service = UserService.__new__(UserService)
+    service._models = user_service._models
+    service._snapshot = None
+    service._records = [UserRecord.from_dict(user) for user in json.loads(raw)]
+    service._rebuild_indexes()
+    return service
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    # Parse inside the measurement so both layouts pay for their own strings
+    raw = json.dumps(list(synthetic_users(count)))
+
+    print(f"Directory of {count:,} users")
+    before, before_time = measure_directory(lambda: build_models(raw))
+    after, after_time = measure_directory(lambda: build_records(raw))
+    print(f"{'User models + indexes':<30} {before / count:>8,.0f} B/user   load {before_time:6.2f}s")
+    print(f"{'UserRecord + indexes':<30} {after / count:>8,.0f} B/user   load {after_time:6.2f}s")
+    print(f"{'saving':<30} {1 - after / before:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Shared helpers for the microbenchmarks.
+"""
+import os
+import random
+import string
+import tempfile
+import time
+from typing import Callable, Iterator
+
+
+def isolate_data_dirs() -> None:
+    """Point DATA_DIR/KEYS_DIR at a scratch directory unless already set.
+
+    Must run before importing `config` so benchmarks never touch the
+    repository's own data and keys.
+    """
+    scratch = tempfile.mkdtemp(prefix="entra-bench-")
+    os.environ.setdefault("DATA_DIR", os.path.join(scratch, "data"))
+    os.environ.setdefault("KEYS_DIR", os.path.join(scratch, "keys"))
+
+
+def measure(fn: Callable[[], object], seconds: float = 2.0) -> float:
+    """Run fn repeatedly for about `seconds` and return calls per second."""
+    fn()  # warm up
+    calls = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        fn()
+        calls += 1
+    return calls / (time.perf_counter() - start)
+
+
+def report(label: str, ops_per_sec: float, baseline: float = None) -> None:
+    """Print one benchmark result line, with speedup if a baseline is given."""
+    line = f"{label:<40} {ops_per_sec:>12,.0f} ops/s"
+    if baseline:
+        line += f"   x{ops_per_sec / baseline:.2f}"
+    print(line)
+
+
+DEPARTMENTS = ["Engineering", "Sales", "Marketing", "Finance", "IT", "HR"]
+JOB_TITLES = ["Developer", "Manager", "Analyst", "Consultant", "Administrator"]
+FIRST_NAMES = ["Mario", "Giulia", "Luca", "Sara", "Marco", "Anna", "Paolo", "Elena"]
+LAST_NAMES = ["Rossi", "Bianchi", "Verdi", "Russo", "Ferrari", "Esposito", "Romano"]
+
+
+def synthetic_users(count: int, seed: int = 42) -> Iterator[dict]:
+    """Yield realistic user dicts as stored in users.json.
+    
+    The bcrypt-shaped hash is random and never verifies.
+    """
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + "./"
+    for i in range(count):
+        given = rng.choice(FIRST_NAMES)
+        surname = rng.choice(LAST_NAMES)
+        upn = f"{given.lower()}.{surname.lower()}{i}@contoso.onmicrosoft.com"
+        yield {
+            "id": f"{rng.getrandbits(128):032x}"[:8] + f"-{i:04x}-4000-8000-{rng.getrandbits(48):012x}",
+            "userPrincipalName": upn,
+            "displayName": f"{given} {surname}",
+            "givenName": given,
+            "surname": surname,
+            "mail": upn,
+            "jobTitle": rng.choice(JOB_TITLES),
+            "department": rng.choice(DEPARTMENTS),
+            "passwordHash": "$2b$12$" + "".join(rng.choice(alphabet) for _ in range(53))
+        }
@@ -4,6 +4,7 @@ Loads settings from environment variables for Docker deployment.
 """
 import os
 from pathlib import Path
+from typing import Optional
 
 
 class Config:
@@ -13,6 +14,12 @@ class Config:
     HOST: str = os.getenv("EMULATOR_HOST", "0.0.0.0")
     PORT: int = int(os.getenv("EMULATOR_PORT", "8029"))
     
+    # Production launcher (serve.py)
+    WORKERS: int = int(os.getenv("WORKERS", "1"))
+    UVICORN_LOOP: str = os.getenv("UVICORN_LOOP", "uvloop")
+    UVICORN_HTTP: str = os.getenv("UVICORN_HTTP", "httptools")
+    GRACEFUL_SHUTDOWN_SECONDS: int = int(os.getenv("GRACEFUL_SHUTDOWN_SECONDS", "30"))
+    
     # Tenant settings
     TENANT_ID: str = os.getenv("TENANT_ID", "common")
     ISSUER_URL: str = os.getenv("ISSUER_URL", "http://localhost:8029")
@@ -20,6 +27,63 @@ class Config:
     # Token settings
     TOKEN_EXPIRY_SECONDS: int = int(os.getenv("TOKEN_EXPIRY_SECONDS", "3600"))
     REFRESH_TOKEN_EXPIRY_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRY_DAYS", "14"))
+    VERIFIED_TOKEN_CACHE_SIZE: int = int(os.getenv("VERIFIED_TOKEN_CACHE_SIZE", "10000"))  # 0 disables
+    CLAIM_TEMPLATE_CACHE_SIZE: int = int(os.getenv("CLAIM_TEMPLATE_CACHE_SIZE", "10000"))  # compiled (user, app, tenant, kind) layouts
+    # Where /token signs: inline (on the event loop), thread or process (a pool of
+    # SIGNING_ENGINE_WORKERS, concurrent requests batched up to SIGNING_BATCH_SIZE tokens)
+    SIGNING_ENGINE: str = os.getenv("SIGNING_ENGINE", "inline").lower()
+    SIGNING_ENGINE_WORKERS: int = int(os.getenv("SIGNING_ENGINE_WORKERS", str(os.cpu_count() or 1)))
+    SIGNING_BATCH_SIZE: int = int(os.getenv("SIGNING_BATCH_SIZE", "64"))
+    # Signing algorithm: RS256, PS256, ES256 or EdDSA (an application's signingAlgorithm wins)
+    TOKEN_SIGNING_ALG: str = os.getenv("TOKEN_SIGNING_ALG", "RS256")
+    # Per-tenant overrides, e.g. "loadtest=ES256,contoso=PS256"
+    TOKEN_SIGNING_ALG_PROFILES: str = os.getenv("TOKEN_SIGNING_ALG_PROFILES", "")
+    
+    # Password hashing: scheme bcrypt, pbkdf2 or scrypt; cost defaults to the scheme's
+    # (bcrypt log2 rounds 12, pbkdf2 iterations 600000, scrypt log2 N 15)
+    PASSWORD_HASH_SCHEME: str = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt").lower()
+    PASSWORD_HASH_COST: Optional[int] = int(os.getenv("PASSWORD_HASH_COST")) if os.getenv("PASSWORD_HASH_COST") else None
+    # Per-tenant overrides, e.g. "loadtest=bcrypt:4,contoso=scrypt:14"
+    PASSWORD_HASH_PROFILES: str = os.getenv("PASSWORD_HASH_PROFILES", "")
+    
+    # Password verification (hash checks run on a dedicated thread pool)
+    PASSWORD_VERIFY_CONCURRENCY: int = int(os.getenv("PASSWORD_VERIFY_CONCURRENCY", str(os.cpu_count() or 1)))
+    PASSWORD_VERIFY_QUEUE_DEPTH: int = int(os.getenv("PASSWORD_VERIFY_QUEUE_DEPTH", "64"))
+    
+    # Verified-credential cache (opt-in, meant for load tests with a few test accounts)
+    CREDENTIAL_CACHE_ENABLED: bool = os.getenv("CREDENTIAL_CACHE_ENABLED", "false").lower() == "true"
+    CREDENTIAL_CACHE_TTL_SECONDS: int = int(os.getenv("CREDENTIAL_CACHE_TTL_SECONDS", "300"))
+    CREDENTIAL_CACHE_SIZE: int = int(os.getenv("CREDENTIAL_CACHE_SIZE", "1024"))
+    
+    # Admin API (/admin/*): disabled unless a secret is set, sent as X-Admin-Secret
+    ADMIN_SECRET: Optional[str] = os.getenv("ADMIN_SECRET") or None
+    
+    # Admission control on /token and the login form (0 disables a limit); an application's
+    # tokenRateLimit/tokenRateBurst override the per-client defaults
+    ADMISSION_MAX_IN_FLIGHT: int = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "0"))
+    CLIENT_RATE_LIMIT: float = float(os.getenv("CLIENT_RATE_LIMIT", "0"))  # requests/s per client_id
+    CLIENT_RATE_BURST: int = int(os.getenv("CLIENT_RATE_BURST", "20"))
+    IP_RATE_LIMIT: float = float(os.getenv("IP_RATE_LIMIT", "0"))  # requests/s per client IP
+    IP_RATE_BURST: int = int(os.getenv("IP_RATE_BURST", "40"))
+    RATE_LIMIT_TRACKED_KEYS: int = int(os.getenv("RATE_LIMIT_TRACKED_KEYS", "100000"))  # buckets kept
+    
+    # Per-request profiling (X-Profile-Request: <ADMIN_SECRET>), kept for GET /admin/profiles
+    PROFILE_RING_SIZE: int = int(os.getenv("PROFILE_RING_SIZE", "20"))
+    # Single-purpose token for the ?__profile= flag (browser flows); it can't read profiles
+    PROFILE_TOKEN: Optional[str] = os.getenv("PROFILE_TOKEN") or None
+    
+    # Prometheus metrics (GET /metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = float(os.getenv("EVENT_LOOP_LAG_INTERVAL_SECONDS", "1"))
+    
+    # Bulk user provisioning (POST /admin/users/bulk, provision.py)
+    BULK_IMPORT_BATCH_SIZE: int = int(os.getenv("BULK_IMPORT_BATCH_SIZE", "1000"))
+    BULK_IMPORT_WORKERS: int = int(os.getenv("BULK_IMPORT_WORKERS", str(os.cpu_count() or 1)))
+    
+    # Bulk token minting (POST /admin/tokens/bulk)
+    TOKEN_MINT_BATCH_SIZE: int = int(os.getenv("TOKEN_MINT_BATCH_SIZE", "500"))  # tokens per signing task
+    TOKEN_MINT_WORKERS: int = int(os.getenv("TOKEN_MINT_WORKERS", str(os.cpu_count() or 1)))
+    TOKEN_MINT_MAX_COUNT: int = int(os.getenv("TOKEN_MINT_MAX_COUNT", "1000000"))  # per request
     
     # Directory settings
     BASE_DIR: Path = Path(__file__).parent
@@ -34,11 +98,40 @@ class Config:
     # File paths
     USERS_FILE: Path = DATA_DIR / "users.json"
     APPLICATIONS_FILE: Path = DATA_DIR / "applications.json"
+    # Compile users.json into a memory-mapped binary snapshot (rebuilt when the JSON changes)
+    DIRECTORY_SNAPSHOT: bool = os.getenv("DIRECTORY_SNAPSHOT", "true").lower() == "true"
+    USERS_SNAPSHOT_FILE: Path = DATA_DIR / "users.snap"
+    USER_MODEL_CACHE_SIZE: int = int(os.getenv("USER_MODEL_CACHE_SIZE", "4096"))  # recently used User models
+    # Compact once the journal reaches this fraction of the snapshot's size (and at least MIN_BYTES)
+    JOURNAL_COMPACT_RATIO: float = float(os.getenv("JOURNAL_COMPACT_RATIO", "1.0"))
+    JOURNAL_COMPACT_MIN_BYTES: int = int(os.getenv("JOURNAL_COMPACT_MIN_BYTES", "1048576"))
     PRIVATE_KEY_FILE: Path = KEYS_DIR / "private_key.pem"
     PUBLIC_KEY_FILE: Path = KEYS_DIR / "public_key.pem"
+    CERTIFICATE_FILE: Path = KEYS_DIR / "certificate.pem"  # self-signed X.509 for the signing key
+    # Key ring: every signing key and its lifecycle (the files above mirror the active key)
+    KEYRING_FILE: Path = KEYS_DIR / "keyring.json"
+    KEYRING_DIR: Path = KEYS_DIR / "keyring"
+    CERTIFICATE_VALID_DAYS: int = int(os.getenv("CERTIFICATE_VALID_DAYS", "3650"))
+    STATE_DB_FILE: Path = DATA_DIR / "state.db"
+    
+    # Signing key rotation (0 disables scheduled rotation; POST /admin/keys/rotate always works)
+    KEY_ROTATION_INTERVAL_HOURS: float = float(os.getenv("KEY_ROTATION_INTERVAL_HOURS", "0"))
+    KEY_RETENTION_HOURS: float = float(os.getenv("KEY_RETENTION_HOURS", "24"))  # retired keys stay published
+    KEY_RING_POLL_SECONDS: int = int(os.getenv("KEY_RING_POLL_SECONDS", "30"))
+    
+    # Discovery/JWKS/federation metadata: rendered once, served with ETags
+    METADATA_MAX_AGE_SECONDS: int = int(os.getenv("METADATA_MAX_AGE_SECONDS", "3600"))  # Cache-Control max-age
+    METADATA_CACHE_SIZE: int = int(os.getenv("METADATA_CACHE_SIZE", "256"))  # rendered documents kept
+    
+    # SAML federation metadata
+    SAML_METADATA_SIGN: bool = os.getenv("SAML_METADATA_SIGN", "true").lower() == "true"
+    SAML_METADATA_VALID_HOURS: int = int(os.getenv("SAML_METADATA_VALID_HOURS", "168"))  # validUntil
     
     # OAuth/OIDC settings
     AUTHORIZATION_CODE_EXPIRY: int = 600  # 10 minutes
+    # Where codes/refresh tokens live: "memory" (single process) or "sqlite" (shared by workers)
+    STATE_BACKEND: str = os.getenv("STATE_BACKEND", "sqlite" if WORKERS > 1 else "memory").lower()
+    TOKEN_STORE_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("TOKEN_STORE_SWEEP_INTERVAL_SECONDS", "60"))
     
     @classmethod
     def get_issuer(cls, tenant: str = None) -> str:
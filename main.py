@@ -1,18 +1,52 @@
 """
 Microsoft Entra ID Emulator - Main FastAPI Application
 """
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
-from routers import oauth_router, oidc_router, saml_router
+from routers import oauth_router, oidc_router, saml_router, admin_router, metrics_router
+from services import key_service, token_service, provisioning, signing
+from services.admission import Throttled, throttled_response
+from services.metrics import MetricsMiddleware, monitor_event_loop
+from services.profiling import ProfilingMiddleware
+from services.signing import signing_engine
 from config import config
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop background tasks."""
+    # Fork the worker pools before any thread starts (see services.signing); the
+    # bulk pools only serve the admin API
+    signing_engine.start()
+    if config.ADMIN_SECRET:
+        provisioning.start_pool()
+        signing.start_pool()
+    sweeper = asyncio.create_task(token_service.run_sweeper())
+    key_rotation = asyncio.create_task(key_service.run_rotation())
+    loop_monitor = None
+    if config.METRICS_ENABLED:
+        loop_monitor = asyncio.create_task(monitor_event_loop(config.EVENT_LOOP_LAG_INTERVAL_SECONDS))
+    yield
+    sweeper.cancel()
+    key_rotation.cancel()
+    if loop_monitor:
+        loop_monitor.cancel()
+    provisioning.shutdown_pool()
+    signing.shutdown_pool()
+    signing_engine.shutdown()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Microsoft Entra ID Emulator",
     description="OAuth 2.0 and OpenID Connect emulator for development and testing",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+app.add_exception_handler(Throttled, throttled_response)
 
 # CORS configuration
 app.add_middleware(
@@ -23,10 +57,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if config.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Profiling is triggered with the admin secret, so it only exists with the admin API
+if config.ADMIN_SECRET:
+    app.add_middleware(ProfilingMiddleware)
+
 # Include routers
 app.include_router(oauth_router, tags=["OAuth 2.0"])
 app.include_router(oidc_router, tags=["OpenID Connect"])
 app.include_router(saml_router, tags=["SAML"])
+app.include_router(admin_router, tags=["Admin"])
+if config.METRICS_ENABLED:
+    app.include_router(metrics_router, tags=["Metrics"])
 
 
 @app.get("/")
@@ -1,5 +1,6 @@
 """Models package."""
-from .user import User
+from .user import User, UserRecord
 from .application import Application
+from .token_mint import TokenMintRequest
 
-__all__ = ["User", "Application"]
+__all__ = ["User", "UserRecord", "Application", "TokenMintRequest"]
@@ -1,11 +1,105 @@
 """
 Application model for Microsoft Entra ID Emulator.
 """
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Iterable, List, Literal, Optional
+from urllib.parse import urlsplit
+from pydantic import BaseModel, Field, PrivateAttr
 import uuid
 
 
+# Characters a non-trailing '*' may match: one DNS label or path-segment word
+_LABEL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-")
+
+
+class _TrieNode:
+    """Node of the wildcard redirect URI trie."""
+    
+    __slots__ = ("children", "wildcard", "terminal", "prefix", "allow_query", "allow_userinfo")
+    
+    def __init__(self):
+        self.children = {}  # char -> _TrieNode
+        self.wildcard = None  # _TrieNode reached after a '*'
+        self.terminal = False  # a pattern ends here
+        self.prefix = False  # a pattern ends here with a trailing '*'
+        self.allow_query = False  # the terminal pattern here admits a query string
+        self.allow_userinfo = False  # the pattern ending here has userinfo in its authority
+
+
+class RedirectUriMatcher:
+    """Precompiled redirect URI check: an exact-match set plus a wildcard trie.
+    
+    URIs without '*' must match exactly. In a pattern, '*' matches one or
+    more letters, digits or '-', i.e. a single host label or path word, e.g.
+    `https://pr-*.preview.contoso.com/callback`. A trailing '*' after the
+    authority matches any remaining suffix, e.g. `http://localhost:3029/*`.
+    
+    Candidates with a fragment never match a wildcard pattern, and a query or
+    userinfo is only accepted where the pattern itself allows one.
+    """
+    
+    def __init__(self, uris: Iterable[str]):
+        uris = list(uris)
+        self.exact = frozenset(u for u in uris if "*" not in u)
+        self._root: Optional[_TrieNode] = None
+        for pattern in uris:
+            if "*" in pattern:
+                self._add_pattern(pattern)
+    
+    def _add_pattern(self, pattern: str):
+        if self._root is None:
+            self._root = _TrieNode()
+        netloc = urlsplit(pattern).netloc
+        # A trailing '*' inside the authority stays a single-label wildcard
+        prefix = pattern.endswith("*") and not netloc.endswith("*")
+        node = self._root
+        last = len(pattern) - 1
+        for i, ch in enumerate(pattern):
+            if ch == "*":
+                if i == last and prefix:
+                    node.prefix = True
+                    break
+                if node.wildcard is None:
+                    node.wildcard = _TrieNode()
+                node = node.wildcard
+            else:
+                node = node.children.setdefault(ch, _TrieNode())
+        else:
+            node.terminal = True
+            node.allow_query = "?" in pattern
+        node.allow_userinfo = "@" in netloc
+    
+    def matches(self, uri: str) -> bool:
+        """Check whether a redirect URI is allowed."""
+        if uri in self.exact:
+            return True
+        if self._root is None or "#" in uri:
+            return False
+        try:
+            netloc = urlsplit(uri).netloc
+        except ValueError:
+            return False
+        return self._match(self._root, uri, 0, "?" in uri, "@" in netloc)
+    
+    def _match(self, node: _TrieNode, uri: str, pos: int, query: bool, userinfo: bool) -> bool:
+        length = len(uri)
+        while True:
+            if node.prefix and (node.allow_userinfo or not userinfo):
+                return True
+            if node.wildcard is not None:
+                end = pos
+                while end < length and uri[end] in _LABEL_CHARS:
+                    end += 1
+                    if self._match(node.wildcard, uri, end, query, userinfo):
+                        return True
+            if pos == length:
+                return (node.terminal and (node.allow_query or not query)
+                        and (node.allow_userinfo or not userinfo))
+            node = node.children.get(uri[pos])
+            if node is None:
+                return False
+            pos += 1
+
+
 class Application(BaseModel):
     """Application registration model."""
     
@@ -14,6 +108,20 @@ class Application(BaseModel):
     clientSecret: Optional[str] = None  # For confidential clients
     redirectUris: List[str] = Field(default_factory=list)
     allowedScopes: List[str] = Field(default_factory=lambda: ["openid", "profile", "email"])
+    # Token signing algorithm; None uses the tenant's (TOKEN_SIGNING_ALG_PROFILES, TOKEN_SIGNING_ALG)
+    signingAlgorithm: Optional[Literal["RS256", "PS256", "ES256", "EdDSA"]] = None
+    # Requests/s and burst on /token and the login form; None uses CLIENT_RATE_LIMIT/CLIENT_RATE_BURST, 0 is unlimited
+    tokenRateLimit: Optional[float] = Field(default=None, ge=0)
+    tokenRateBurst: Optional[int] = Field(default=None, ge=1)
+    
+    _redirect_matcher: RedirectUriMatcher = PrivateAttr()
+    
+    def model_post_init(self, __context) -> None:
+        self._redirect_matcher = RedirectUriMatcher(self.redirectUris)
+    
+    def is_redirect_uri_allowed(self, redirect_uri: str) -> bool:
+        """Check a redirect URI against the precompiled redirectUris."""
+        return self._redirect_matcher.matches(redirect_uri)
     
     class Config:
         json_schema_extra = {
@@ -0,0 +1,28 @@
+"""
+Bulk token minting request model (POST /admin/tokens/bulk).
+"""
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class TokenMintRequest(BaseModel):
+    """Access tokens to mint for load-test fixtures."""
+    
+    users: List[str] = Field(min_length=1)  # UPNs or object IDs
+    apps: List[str] = Field(min_length=1)  # client IDs
+    scopes: List[str] = Field(default_factory=lambda: ["openid profile"], min_length=1)
+    count: int = Field(gt=0)  # tokens to mint, cycling through users x apps x scopes
+    tenant: str = "common"
+    lifetimeSeconds: Optional[int] = Field(None, gt=0)  # default TOKEN_EXPIRY_SECONDS
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "users": ["test@contoso.onmicrosoft.com"],
+                "apps": ["test-app-123"],
+                "scopes": ["api://test-app-123/.default"],
+                "count": 100000,
+                "tenant": "common",
+                "lifetimeSeconds": 86400
+            }
+        }
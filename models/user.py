@@ -1,6 +1,7 @@
 """
 User model for Microsoft Entra ID Emulator.
 """
+import sys
 from typing import Optional
 from pydantic import BaseModel, Field
 import uuid
@@ -17,7 +18,9 @@ class User(BaseModel):
     mail: Optional[str] = None
     jobTitle: Optional[str] = None
     department: Optional[str] = None
-    passwordHash: str  # bcrypt hash
+    passwordHash: str  # bcrypt, PBKDF2 or scrypt hash (see services.password_hasher)
+    # Tenant whose PASSWORD_HASH_PROFILES entry the hash follows (None: the default profile)
+    hashTenant: Optional[str] = None
     
     class Config:
         json_schema_extra = {
@@ -33,3 +36,68 @@ class User(BaseModel):
                 "passwordHash": "$2b$12$..."
             }
         }
+
+
+class UserRecord:
+    """Compact in-memory form of a user, used by UserService's directory.
+    
+    A pydantic User costs a __dict__ plus validation per instance; large
+    directories keep these slotted records instead and only build a User
+    when a request needs one. Low-cardinality strings are interned and
+    `mail` shares the UPN string when they are equal.
+    """
+    
+    __slots__ = (
+        "id", "userPrincipalName", "displayName", "givenName", "surname",
+        "mail", "jobTitle", "department", "passwordHash", "hashTenant"
+    )
+    
+    def __init__(
+        self,
+        id: str,
+        userPrincipalName: str,
+        displayName: str,
+        givenName: Optional[str],
+        surname: Optional[str],
+        mail: Optional[str],
+        jobTitle: Optional[str],
+        department: Optional[str],
+        passwordHash: str,
+        hashTenant: Optional[str] = None
+    ):
+        self.id = id
+        self.userPrincipalName = userPrincipalName
+        self.displayName = displayName
+        self.givenName = _intern(givenName)
+        self.surname = _intern(surname)
+        self.mail = userPrincipalName if mail == userPrincipalName else mail
+        self.jobTitle = _intern(jobTitle)
+        self.department = _intern(department)
+        self.passwordHash = passwordHash
+        self.hashTenant = _intern(hashTenant)
+    
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserRecord":
+        """Build a record from stored JSON without pydantic validation."""
+        get = data.get
+        return cls(
+            data["id"], data["userPrincipalName"], data["displayName"],
+            get("givenName"), get("surname"), get("mail"),
+            get("jobTitle"), get("department"), data["passwordHash"], get("hashTenant")
+        )
+    
+    @classmethod
+    def from_model(cls, user: User) -> "UserRecord":
+        return cls(**{field: getattr(user, field) for field in cls.__slots__})
+    
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.__slots__}
+    
+    def to_model(self) -> User:
+        """Build a full User model."""
+        # Validating is cheaper than model_construct() in pydantic 2
+        return User.model_validate(self.to_dict())
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if value else value
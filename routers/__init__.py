@@ -2,5 +2,7 @@
 from .oauth import router as oauth_router
 from .oidc import router as oidc_router
 from .saml import router as saml_router
+from .admin import router as admin_router
+from .metrics import router as metrics_router
 
-__all__ = ["oauth_router", "oidc_router", "saml_router"]
+__all__ = ["oauth_router", "oidc_router", "saml_router", "admin_router", "metrics_router"]
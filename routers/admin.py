@@ -0,0 +1,151 @@
+"""
+Admin endpoints for Microsoft Entra ID Emulator.
+
+Not part of the Entra API. Every route requires the X-Admin-Secret
+header to match Config.ADMIN_SECRET; without a configured secret the
+admin API is disabled.
+"""
+import asyncio
+import hmac
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from models.token_mint import TokenMintRequest
+from services import app_service, key_service, user_service
+from services.profiling import profiles
+from services.provisioning import FORMATS, import_users_async
+from services.token_mint import BulkMint
+from config import config
+
+
+class ProgressResponse(StreamingResponse):
+    """Streaming response whose generator reads the request body.
+    
+    Starlette's StreamingResponse watches receive() for disconnects, which
+    would swallow request body chunks; a disconnect surfaces here as
+    ClientDisconnect from request.stream() instead.
+    """
+    
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+def require_admin(x_admin_secret: Optional[str] = Header(None)):
+    """Dependency guarding the admin routes."""
+    if not config.ADMIN_SECRET:
+        raise HTTPException(status_code=403, detail="Admin API disabled (set ADMIN_SECRET)")
+    if not x_admin_secret or not hmac.compare_digest(
+        x_admin_secret.encode(), config.ADMIN_SECRET.encode()
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin secret")
+
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+
+@router.post("/users/bulk")
+async def bulk_import_users(
+    request: Request,
+    format: str = Query("ndjson"),
+    batch_size: Optional[int] = Query(None, ge=1),
+    tenant: Optional[str] = Query(None)
+):
+    """Bulk-create users from an NDJSON or CSV request body.
+
+    The body is read as it arrives; the response streams one NDJSON
+    progress line per committed batch and a final "done" line with the
+    totals and the rejected rows. Passwords are hashed with the `tenant`'s
+    hashing profile (default profile if omitted), and later logins keep
+    the imported users on that profile.
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+
+    async def progress():
+        async for report in import_users_async(
+            request.stream(), format, user_service, batch_size=batch_size, tenant=tenant
+        ):
+            yield json.dumps(report) + "\n"
+
+    return ProgressResponse(progress(), media_type="application/x-ndjson")
+
+
+@router.post("/tokens/bulk")
+async def bulk_mint_tokens(body: TokenMintRequest):
+    """Mint access tokens for load tests, streamed as NDJSON.
+    
+    Each line has user, client_id, scope, expires_on and access_token,
+    with the claims of a token from /token; a final "done" line has the
+    totals. Signing runs in a process pool.
+    """
+    if body.count > config.TOKEN_MINT_MAX_COUNT:
+        raise HTTPException(
+            status_code=400, detail=f"count must be at most {config.TOKEN_MINT_MAX_COUNT}"
+        )
+    users = [user_service.get_user_by_upn(u) or user_service.get_user_by_id(u) for u in body.users]
+    apps = [app_service.get_app_by_id(a) for a in body.apps]
+    unknown = [u for u, user in zip(body.users, users) if user is None]
+    unknown += [a for a, app in zip(body.apps, apps) if app is None]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown users or apps: {', '.join(unknown[:10])}")
+    
+    job = BulkMint(users, apps, body.scopes, body.count, body.tenant, body.lifetimeSeconds)
+    
+    async def lines():
+        async for rows in job.run():
+            yield "".join(json.dumps(row) + "\n" for row in rows)
+        yield json.dumps(job.progress()) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/keys")
+async def list_keys():
+    """Signing keys in the key ring, with their lifecycle."""
+    return {"keys": [key.to_manifest() for key in key_service.keys.values()]}
+
+
+@router.post("/keys/rotate")
+async def rotate_keys(alg: Optional[str] = None):
+    """Activate the next signing key now and retire the current one.
+    
+    Rotates the key of every algorithm, or only `alg`. Retired keys stay
+    in the JWKS for KEY_RETENTION_HOURS, and new next keys are
+    pre-generated in the background.
+    """
+    if alg is not None and alg not in key_service.algorithms():
+        raise HTTPException(
+            status_code=400, detail=f"alg must be one of: {', '.join(key_service.algorithms())}"
+        )
+    previous = {a: key_service.get_active_key(a).kid for a in key_service.algorithms()}
+    rotated = await asyncio.to_thread(key_service.rotate, alg)
+    key_service.ensure_next_key()
+    return {"keys": [
+        {"alg": a, "kid": key.kid, "previous_kid": previous.get(a)} for a, key in rotated.items()
+    ]}
+
+
+@router.get("/profiles")
+async def list_profiles():
+    """Recent request profiles, newest first."""
+    return {"profiles": [profile.summary() for profile in profiles.list()]}
+
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = Query("pstats")):
+    """Download a request profile as pstats, text or collapsed stacks."""
+    profile = profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "pstats":
+        return Response(
+            content=profile.pstats_bytes(),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.prof"'}
+        )
+    if format == "text":
+        return PlainTextResponse(profile.text())
+    if format == "collapsed":
+        return PlainTextResponse(profile.collapsed())
+    raise HTTPException(status_code=400, detail="format must be one of: pstats, text, collapsed")
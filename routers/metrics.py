@@ -0,0 +1,37 @@
+"""
+Prometheus metrics endpoint for Microsoft Entra ID Emulator.
+
+Not part of the Entra API; served when METRICS_ENABLED is true.
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from services import app_service, token_service, user_service
+from services.admission import admission
+from services.metrics import CONTENT_TYPE, registry
+
+router = APIRouter()
+
+registry.gauge(
+    "entra_authorization_codes", "Authorization codes in the store.",
+    lambda: len(token_service.authorization_codes)
+)
+registry.gauge(
+    "entra_refresh_tokens", "Refresh tokens in the store.",
+    lambda: len(token_service.refresh_tokens)
+)
+registry.gauge("entra_users", "Users in the directory.", user_service.count)
+registry.gauge(
+    "entra_applications", "Registered applications.",
+    lambda: len(app_service.list_applications())
+)
+
+registry.gauge(
+    "entra_admission_in_flight", "Token and login requests being processed.",
+    lambda: admission.in_flight
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Metrics of this process in the Prometheus text format."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
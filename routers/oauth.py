@@ -1,17 +1,45 @@
 """
 OAuth 2.0 endpoints for Microsoft Entra ID Emulator.
 """
-from fastapi import APIRouter, Form, Query, HTTPException, Request
+import asyncio
+from fastapi import APIRouter, Depends, Form, Query, HTTPException, Request
 from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
 from typing import Optional
 from services import user_service, app_service, token_service
+from services.admission import admission
+from services.user_service import PasswordVerificationBusy
 from config import config
 
 router = APIRouter()
+GRANT_TYPES = ("authorization_code", "client_credentials", "refresh_token", "password")
 templates = Jinja2Templates(directory=str(config.TEMPLATES_DIR))
 
 
+async def _verify_password(username: str, password: str):
+    """Verify credentials off the event loop, shedding load when saturated."""
+    try:
+        return await user_service.verify_password_async(username, password)
+    except PasswordVerificationBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="temporarily_unavailable",
+            headers={"Retry-After": "1"}
+        )
+
+
+def admission_control(endpoint: str):
+    """Dependency admitting a request (services.admission) for the length of its handler."""
+    async def admit(request: Request, client_id: str = Form(...)):
+        ip = request.client.host if request.client else "unknown"
+        admission.enter(endpoint, client_id, ip, app_service.get_app_by_id(client_id))
+        try:
+            yield
+        finally:
+            admission.leave()
+    return admit
+
+
 @router.get("/{tenant}/oauth2/v2.0/authorize")
 async def authorize(
     request: Request,
@@ -81,7 +109,7 @@ async def authorize(
     return RedirectResponse(url=redirect_url)
 
 
-@router.post("/{tenant}/oauth2/v2.0/authorize")
+@router.post("/{tenant}/oauth2/v2.0/authorize", dependencies=[Depends(admission_control("authorize"))])
 async def authorize_post(
     tenant: str,
     username: str = Form(...),
@@ -97,7 +125,7 @@ async def authorize_post(
     """Handle login form submission."""
     
     # Verify credentials
-    user = user_service.verify_password(username, password)
+    user = await _verify_password(username, password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
@@ -126,8 +154,9 @@ async def authorize_post(
     return RedirectResponse(url=redirect_url, status_code=302)
 
 
-@router.post("/{tenant}/oauth2/v2.0/token")
+@router.post("/{tenant}/oauth2/v2.0/token", dependencies=[Depends(admission_control("token"))])
 async def token(
+    request: Request,
     tenant: str,
     grant_type: str = Form(...),
     client_id: str = Form(...),
@@ -142,6 +171,9 @@ async def token(
 ):
     """OAuth 2.0 token endpoint."""
     
+    # Label for the per-grant metrics (services.metrics)
+    request.state.grant_type = grant_type if grant_type in GRANT_TYPES else "unsupported"
+    
     # Verify client
     app = app_service.get_app_by_id(client_id)
     if not app:
@@ -165,16 +197,14 @@ async def token(
             raise HTTPException(status_code=400, detail="invalid_grant")
         
         # Get user
-        user = user_service.get_user_by_id(code_data["user_id"])
+        user = user_service.get_user_by_id(code_data.user_id)
         if not user:
             raise HTTPException(status_code=400, detail="invalid_grant")
         
-        # Generate tokens
-        access_token = token_service.generate_access_token(
-            user, app, code_data["scope"], tenant
-        )
-        id_token = token_service.generate_id_token(
-            user, app, code_data.get("nonce"), tenant
+        # Generate tokens (signed together, see services.signing)
+        access_token, id_token = await asyncio.gather(
+            token_service.generate_access_token_async(user, app, code_data.scope, tenant),
+            token_service.generate_id_token_async(user, app, code_data.nonce, tenant)
         )
         refresh_token = token_service.generate_refresh_token(user, app)
         
@@ -196,7 +226,7 @@ async def token(
             raise HTTPException(status_code=401, detail="invalid_client")
         
         scope = scope or "api://.default"
-        access_token = token_service.generate_client_credentials_token(app, scope, tenant)
+        access_token = await token_service.generate_client_credentials_token_async(app, scope, tenant)
         
         return {
             "token_type": "Bearer",
@@ -209,7 +239,7 @@ async def token(
         if not refresh_token:
             raise HTTPException(status_code=400, detail="invalid_request")
         
-        user_id = token_service.verify_refresh_token(refresh_token, client_id)
+        user_id = token_service.redeem_refresh_token(refresh_token, client_id)
         if not user_id:
             raise HTTPException(status_code=400, detail="invalid_grant")
         
@@ -218,8 +248,10 @@ async def token(
             raise HTTPException(status_code=400, detail="invalid_grant")
         
         scope = scope or "openid profile"
-        access_token = token_service.generate_access_token(user, app, scope, tenant)
-        id_token = token_service.generate_id_token(user, app, None, tenant)
+        access_token, id_token = await asyncio.gather(
+            token_service.generate_access_token_async(user, app, scope, tenant),
+            token_service.generate_id_token_async(user, app, None, tenant)
+        )
         new_refresh_token = token_service.generate_refresh_token(user, app)
         
         return {
@@ -235,13 +267,15 @@ async def token(
         if not username or not password:
             raise HTTPException(status_code=400, detail="invalid_request")
         
-        user = user_service.verify_password(username, password)
+        user = await _verify_password(username, password)
         if not user:
             raise HTTPException(status_code=401, detail="invalid_grant")
         
         scope = scope or "openid profile"
-        access_token = token_service.generate_access_token(user, app, scope, tenant)
-        id_token = token_service.generate_id_token(user, app, None, tenant)
+        access_token, id_token = await asyncio.gather(
+            token_service.generate_access_token_async(user, app, scope, tenant),
+            token_service.generate_id_token_async(user, app, None, tenant)
+        )
         refresh_token = token_service.generate_refresh_token(user, app)
         
         return {
@@ -1,19 +1,21 @@
 """
 OpenID Connect endpoints for Microsoft Entra ID Emulator.
 """
-from fastapi import APIRouter, Header, HTTPException, Depends
+from fastapi import APIRouter, Header, HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
-from services import key_service, token_service, user_service
+from models.application import Application
+from services import app_service, key_service, token_service, user_service
+from services.response_cache import DocumentCache, document_response, render_json
 from config import config
 
 router = APIRouter()
 security = HTTPBearer()
+documents = DocumentCache(config.METADATA_CACHE_SIZE)
 
 
-@router.get("/{tenant}/v2.0/.well-known/openid-configuration")
-async def openid_configuration(tenant: str):
-    """OpenID Connect Discovery Document."""
+def discovery_document(tenant: str, app: Optional[Application] = None) -> dict:
+    """OpenID Connect Discovery Document for a tenant (or one application in it)."""
     base_url = config.ISSUER_URL
     
     return {
@@ -27,7 +29,7 @@ async def openid_configuration(tenant: str):
         "jwks_uri": config.get_jwks_uri(tenant),
         "response_modes_supported": ["query", "fragment", "form_post"],
         "subject_types_supported": ["pairwise"],
-        "id_token_signing_alg_values_supported": ["RS256"],
+        "id_token_signing_alg_values_supported": token_service.supported_algorithms(tenant, app),
         "response_types_supported": [
             "code",
             "id_token",
@@ -66,10 +68,31 @@ async def openid_configuration(tenant: str):
     }
 
 
+@router.get("/{tenant}/v2.0/.well-known/openid-configuration")
+async def openid_configuration(request: Request, tenant: str, appid: Optional[str] = None):
+    """OpenID Connect Discovery Document (pre-rendered, ETag-aware).
+    
+    As in Entra ID, ?appid= gives the document for one application, whose
+    signing algorithm may differ from the tenant's.
+    """
+    app = app_service.get_app_by_id(appid) if appid else None
+    document = documents.get(
+        ("discovery", tenant, app.appId if app else None, key_service.version),
+        lambda: render_json(discovery_document(tenant, app)),
+        "application/json"
+    )
+    return document_response(request, document, config.METADATA_MAX_AGE_SECONDS)
+
+
 @router.get("/{tenant}/discovery/v2.0/keys")
-async def jwks(tenant: str):
+async def jwks(request: Request, tenant: str):
     """JWKS endpoint - exposes public keys for JWT validation."""
-    return key_service.get_jwks()
+    document = documents.get(
+        ("jwks", key_service.version),
+        lambda: render_json(key_service.get_jwks()),
+        "application/json"
+    )
+    return document_response(request, document, config.METADATA_MAX_AGE_SECONDS)
 
 
 @router.get("/oidc/userinfo")
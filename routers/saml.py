@@ -1,51 +1,48 @@
 """
 SAML Federation Metadata endpoint.
 """
-from fastapi import APIRouter
-from fastapi.responses import Response
+import time
+from fastapi import APIRouter, Request
 from services import key_service
+from services.key_service import PRIMARY_ALGORITHM
+from services.response_cache import DocumentCache, document_response
+from services.saml_metadata import issue_period, render_federation_metadata
 from config import config
-from cryptography.hazmat.primitives import serialization
-import base64
 
 router = APIRouter()
+documents = DocumentCache(config.METADATA_CACHE_SIZE)
+
+
+def _render(tenant: str, issued_at: int) -> bytes:
+    """Metadata listing every published RS256 key's certificate, active key first."""
+    active = key_service.get_active_key()
+    kids = [active.kid] + [
+        key.kid for key in key_service.keys.values()
+        if key.alg == PRIMARY_ALGORITHM and key is not active
+    ]
+    return render_federation_metadata(
+        tenant,
+        config.ISSUER_URL,
+        [key_service.get_certificate_base64(kid) for kid in kids],
+        active.private_key if config.SAML_METADATA_SIGN else None,
+        config.SAML_METADATA_VALID_HOURS,
+        issued_at
+    )
 
 
 @router.get("/{tenant}/FederationMetadata/2007-06/FederationMetadata.xml")
-async def federation_metadata(tenant: str):
-    """SAML 2.0 Federation Metadata."""
-    
-    # Get public key certificate (simplified - in production would use X.509)
-    public_pem = key_service.get_public_key_pem()
-    # Remove headers and format as single line
-    cert_content = public_pem.replace("-----BEGIN PUBLIC KEY-----", "")
-    cert_content = cert_content.replace("-----END PUBLIC KEY-----", "")
-    cert_content = cert_content.replace("\n", "")
-    
-    entity_id = f"https://sts.windows.net/{tenant}/"
-    base_url = config.ISSUER_URL
-    
-    xml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<EntityDescriptor xmlns="urn:oasis:names:tc:SAML:2.0:metadata" 
-                  entityID="{entity_id}">
-  <IDPSSODescriptor protocolSupportEnumeration="urn:oasis:names:tc:SAML:2.0:protocol">
-    <KeyDescriptor use="signing">
-      <KeyInfo xmlns="http://www.w3.org/2000/09/xmldsig#">
-        <X509Data>
-          <X509Certificate>{cert_content}</X509Certificate>
-        </X509Data>
-      </KeyInfo>
-    </KeyDescriptor>
-    <SingleLogoutService 
-      Binding="urn:oasis:names:tc:SAML:2.0:bindings:HTTP-Redirect" 
-      Location="{base_url}/{tenant}/saml2"/>
-    <SingleSignOnService 
-      Binding="urn:oasis:names:tc:SAML:2.0:bindings:HTTP-Redirect" 
-      Location="{base_url}/{tenant}/saml2"/>
-    <SingleSignOnService 
-      Binding="urn:oasis:names:tc:SAML:2.0:bindings:HTTP-POST" 
-      Location="{base_url}/{tenant}/saml2"/>
-  </IDPSSODescriptor>
-</EntityDescriptor>"""
+async def federation_metadata(request: Request, tenant: str):
+    """SAML 2.0 Federation Metadata.
     
-    return Response(content=xml, media_type="application/xml")
+    Rendered (and signed, with SAML_METADATA_SIGN) once per tenant, key
+    set and issue period, then served from the document cache.
+    """
+    issued_at, reissue_at = issue_period(time.time(), config.SAML_METADATA_VALID_HOURS)
+    document = documents.get(
+        ("federation_metadata", tenant, key_service.version, issued_at),
+        lambda: _render(tenant, issued_at),
+        "application/xml",
+        expires_at=reissue_at,
+        last_modified=issued_at
+    )
+    return document_response(request, document, config.METADATA_MAX_AGE_SECONDS)
@@ -0,0 +1,56 @@
+"""
+Production entry point for Microsoft Entra ID Emulator.
+
+Creates keys and seed data once, then starts uvicorn with WORKERS
+processes. Use `python main.py` for development (auto-reload).
+"""
+import importlib.util
+import logging
+import uvicorn
+from config import config
+
+logger = logging.getLogger("entra-emulator")
+
+
+def preload():
+    """Create keys and default data before any worker starts.
+    
+    Importing the services runs their load-or-create logic under file
+    locks; workers spawned afterwards only ever load the existing files,
+    so they all sign with the same key.
+    """
+    import services  # noqa: F401
+
+
+def _implementation(name: str, module: str) -> str:
+    """Use the requested loop/http implementation if installed, else uvicorn's default."""
+    if name in ("uvloop", "httptools") and importlib.util.find_spec(module) is None:
+        logger.warning("%s is not installed, falling back to auto", module)
+        return "auto"
+    return name
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    preload()
+    
+    if config.WORKERS > 1 and config.STATE_BACKEND == "memory":
+        logger.warning(
+            "STATE_BACKEND=memory with %d workers: codes and refresh tokens "
+            "will not be shared between workers", config.WORKERS
+        )
+    
+    uvicorn.run(
+        "main:app",
+        host=config.HOST,
+        port=config.PORT,
+        workers=config.WORKERS,
+        loop=_implementation(config.UVICORN_LOOP, "uvloop"),
+        http=_implementation(config.UVICORN_HTTP, "httptools"),
+        timeout_graceful_shutdown=config.GRACEFUL_SHUTDOWN_SECONDS,
+        log_level="info"
+    )
+
+
+if __name__ == "__main__":
+    main()
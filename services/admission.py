@@ -0,0 +1,200 @@
+"""
+Admission control for the token and login endpoints.
+
+Requests to /token and the login form pass three checks, cheapest first:
+a global limit on requests in flight, a token bucket per client IP and
+a token bucket per client_id (an application's tokenRateLimit and
+tokenRateBurst override the configured per-client defaults). A request
+over any limit is rejected before its bcrypt or signing work, with a 429
+in the shape Entra ID uses for throttling and a Retry-After header.
+
+Buckets are per process and kept in an LRU of RATE_LIMIT_TRACKED_KEYS;
+an idle bucket expires once it would have refilled anyway.
+"""
+import math
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from models.application import Application
+from services.cache import ExpiringLRUCache
+from services.metrics import throttled_requests
+from config import config
+
+# Entra ID error codes: transient service error, client request loop
+_TRANSIENT = (90033, "A transient error has occurred. Please try again.")
+_REQUEST_LOOP = (
+    50196,
+    "The server terminated an operation because it encountered a client request loop. "
+    "Please contact your app vendor."
+)
+_ERRORS = {"in_flight": _TRANSIENT, "ip": _REQUEST_LOOP, "client": _REQUEST_LOOP}
+
+
+class Throttled(Exception):
+    """A request rejected by admission control."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """`burst` tokens, refilled at `rate` per second; each request takes one."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+
+    def wait(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is), without taking it."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> float:
+        """Take a token; returns 0, or the seconds until one is available."""
+        wait = self.wait(now)
+        if not wait:
+            self.tokens -= 1
+        return wait
+
+
+class RateLimiter:
+    """Token buckets by key, LRU-bounded."""
+
+    def __init__(self, max_keys: int, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._buckets = ExpiringLRUCache(max_keys, clock=clock)
+
+    def _bucket(self, key, rate: float, burst: int, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.rate != rate or bucket.burst != burst:
+            bucket = TokenBucket(rate, burst, now)
+        return bucket
+
+    def wait(self, key, rate: float, burst: int) -> float:
+        """Seconds until `key`'s bucket has a token, without taking it."""
+        if rate <= 0:
+            return 0.0
+        now = self._clock()
+        return self._bucket(key, rate, max(1, burst), now).wait(now)
+
+    def take(self, key, rate: float, burst: int) -> float:
+        """Take a token from `key`'s bucket (rate <= 0 means unlimited)."""
+        if rate <= 0:
+            return 0.0
+        now = self._clock()
+        burst = max(1, burst)
+        bucket = self._bucket(key, rate, burst, now)
+        wait = bucket.take(now)
+        # Idle for burst / rate seconds, the bucket is full again: same as a new one
+        self._buckets.set(key, bucket, expires_at=now + burst / rate)
+        return wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    """In-flight limit plus per-IP and per-client rate limits."""
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        client_rate: float,
+        client_burst: int,
+        ip_rate: float,
+        ip_burst: int,
+        max_keys: int,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_in_flight = max_in_flight
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.in_flight = 0
+        self._limiter = RateLimiter(max_keys, clock)
+
+    def client_limits(self, app: Optional[Application]):
+        """(rate, burst) for a client_id: the application's, else the defaults."""
+        rate = self.client_rate
+        burst = self.client_burst
+        if app is not None:
+            if app.tokenRateLimit is not None:
+                rate = app.tokenRateLimit
+            if app.tokenRateBurst is not None:
+                burst = app.tokenRateBurst
+        return rate, burst
+
+    def enter(self, endpoint: str, client_id: str, ip: str, app: Optional[Application] = None):
+        """Admit a request, or raise Throttled; admitted requests must call leave().
+
+        Every bucket is checked before any token is taken, so a request
+        rejected by its client bucket doesn't use up the budget of other
+        clients behind the same IP.
+        """
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            self._reject(endpoint, "in_flight", 1.0)
+        ip_key, client_key = ("ip", ip), ("client", client_id)
+        client_rate, client_burst = self.client_limits(app)
+        wait = self._limiter.wait(ip_key, self.ip_rate, self.ip_burst)
+        if wait:
+            self._reject(endpoint, "ip", wait)
+        wait = self._limiter.wait(client_key, client_rate, client_burst)
+        if wait:
+            self._reject(endpoint, "client", wait)
+        self._limiter.take(ip_key, self.ip_rate, self.ip_burst)
+        self._limiter.take(client_key, client_rate, client_burst)
+        self.in_flight += 1
+
+    def leave(self):
+        self.in_flight -= 1
+
+    def _reject(self, endpoint: str, reason: str, retry_after: float):
+        throttled_requests.inc(endpoint, reason)
+        raise Throttled(reason, retry_after)
+
+
+def throttled_response(request: Request, exc: Throttled) -> JSONResponse:
+    """429 with the error body Entra ID returns when it throttles."""
+    code, message = _ERRORS[exc.reason]
+    now = datetime.now(timezone.utc)
+    timestamp = now.strftime("%Y-%m-%d %H:%M:%SZ")
+    trace_id = str(uuid.uuid4())
+    correlation_id = request.headers.get("client-request-id") or str(uuid.uuid4())
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        content={
+            "error": "temporarily_unavailable",
+            "error_description": (
+                f"AADSTS{code}: {message}\r\nTrace ID: {trace_id}\r\n"
+                f"Correlation ID: {correlation_id}\r\nTimestamp: {timestamp}"
+            ),
+            "error_codes": [code],
+            "timestamp": timestamp,
+            "trace_id": trace_id,
+            "correlation_id": correlation_id
+        }
+    )
+
+
+admission = AdmissionController(
+    config.ADMISSION_MAX_IN_FLIGHT,
+    config.CLIENT_RATE_LIMIT,
+    config.CLIENT_RATE_BURST,
+    config.IP_RATE_LIMIT,
+    config.IP_RATE_BURST,
+    config.RATE_LIMIT_TRACKED_KEYS
+)
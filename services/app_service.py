@@ -1,9 +1,10 @@
 """
 Application registry service.
 """
-import json
-from typing import Optional, List
+import hmac
+from typing import Dict, Optional, List
 from models.application import Application
+from services.journal import JsonJournal
 from config import config
 
 
@@ -12,17 +13,19 @@ class AppService:
     
     def __init__(self):
         self.applications: List[Application] = []
+        self._apps_by_id: Dict[str, Application] = {}
+        self._journal = JsonJournal(config.APPLICATIONS_FILE, key_field="appId")
         self._load_applications()
     
     def _load_applications(self):
-        """Load applications from JSON file."""
-        if config.APPLICATIONS_FILE.exists():
-            with open(config.APPLICATIONS_FILE, 'r') as f:
-                data = json.load(f)
-                self.applications = [Application(**app) for app in data]
-        else:
-            # Create default test applications
-            self._create_default_applications()
+        """Load applications from the JSON file and its journal."""
+        with self._journal.lock():
+            if self._journal.exists():
+                self.applications = [Application(**app) for app in self._journal.load()]
+            else:
+                # Create default test applications
+                self._create_default_applications()
+        self._apps_by_id = {app.appId: app for app in self.applications}
     
     def _create_default_applications(self):
         """Create default test applications."""
@@ -43,35 +46,37 @@ class AppService:
             )
         ]
         self.applications = default_apps
-        self._save_applications()
-    
-    def _save_applications(self):
-        """Save applications to JSON file."""
-        with open(config.APPLICATIONS_FILE, 'w') as f:
-            json.dump([app.model_dump() for app in self.applications], f, indent=2)
+        self._journal.replace([app.model_dump() for app in self.applications])
     
     def get_app_by_id(self, app_id: str) -> Optional[Application]:
         """Get application by client ID."""
-        return next((a for a in self.applications if a.appId == app_id), None)
+        return self._apps_by_id.get(app_id)
     
     def verify_client_secret(self, app_id: str, client_secret: str) -> Optional[Application]:
-        """Verify client credentials."""
+        """Verify client credentials (constant-time secret comparison)."""
         app = self.get_app_by_id(app_id)
-        if app and app.clientSecret == client_secret:
+        if not app or not app.clientSecret or client_secret is None:
+            return None
+        if hmac.compare_digest(app.clientSecret.encode(), client_secret.encode()):
             return app
         return None
     
     def is_redirect_uri_valid(self, app_id: str, redirect_uri: str) -> bool:
         """Check if redirect URI is valid for the application."""
         app = self.get_app_by_id(app_id)
-        return app is not None and redirect_uri in app.redirectUris
+        return app is not None and app.is_redirect_uri_allowed(redirect_uri)
     
     def create_app(self, app: Application) -> Application:
         """Create a new application."""
         self.applications.append(app)
-        self._save_applications()
+        self._apps_by_id[app.appId] = app
+        self._journal.append(app.model_dump())
         return app
     
+    def flush(self):
+        """Wait until pending application writes are on disk."""
+        self._journal.flush()
+    
     def list_applications(self) -> List[Application]:
         """List all applications."""
         return self.applications
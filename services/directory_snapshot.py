@@ -0,0 +1,211 @@
+"""
+Binary, memory-mapped snapshot of the user directory.
+
+Parsing users.json and building records dominates startup for large
+directories. The snapshot is compiled once from the JSON sources and
+memory-mapped on later starts; records are decoded only when looked up,
+and worker processes mapping the same file share its pages read-only.
+
+File layout (little-endian, format version 1):
+
+    header     see HEADER below; includes a fingerprint of the JSON sources
+    records    per record, for each UserRecord field: u32 length + UTF-8
+               bytes (length 0xFFFFFFFF means None)
+    offsets    u64[record_count], byte offset of each record
+    indexes    for id, UPN and mail (lower-cased): u64[count] sorted key
+               hashes followed by u64[count] record numbers
+"""
+import bisect
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+from models.user import UserRecord
+
+MAGIC = b"ENTRASNP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sHHIQQQQQQQQ32s")
+NONE_LENGTH = 0xFFFFFFFF
+_LENGTH = struct.Struct("<I")
+FIELDS = UserRecord.__slots__
+INDEXES = ("id", "upn", "mail")
+
+
+def source_fingerprint(paths: Iterable[Path]) -> bytes:
+    """Identify the JSON sources by name, size and modification time."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.name.encode())
+        if path.exists():
+            stat = path.stat()
+            digest.update(struct.pack("<QQ", stat.st_size, stat.st_mtime_ns))
+    return digest.digest()
+
+
+def key_hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+
+
+class DirectorySnapshot:
+    """Read-only view of a compiled snapshot file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic, version, field_count, _flags, self.record_count, offsets_pos,
+            id_pos, id_count, upn_pos, upn_count, mail_pos, mail_count, self.fingerprint
+        ) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or field_count != len(FIELDS):
+            self._mm.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} directory snapshot")
+
+        view = self._view = memoryview(self._mm)
+        self._offsets = view[offsets_pos:offsets_pos + 8 * self.record_count].cast("Q")
+        self._indexes = {}
+        for name, pos, count in (("id", id_pos, id_count), ("upn", upn_pos, upn_count),
+                                 ("mail", mail_pos, mail_count)):
+            hashes = view[pos:pos + 8 * count].cast("Q")
+            ordinals = view[pos + 8 * count:pos + 16 * count].cast("Q")
+            self._indexes[name] = (hashes, ordinals)
+
+    @classmethod
+    def open(cls, path: Path, fingerprint: bytes) -> Optional["DirectorySnapshot"]:
+        """Open the snapshot if it exists, is readable and matches the sources."""
+        if not path.exists():
+            return None
+        try:
+            snapshot = cls(path)
+        except (ValueError, struct.error, OSError):
+            return None
+        if snapshot.fingerprint != fingerprint:
+            snapshot.close()
+            return None
+        return snapshot
+
+    @classmethod
+    def build(cls, path: Path, records: Iterable[dict], fingerprint: bytes) -> "DirectorySnapshot":
+        """Compile user dicts into a snapshot file (written atomically)."""
+        offsets = array("Q")
+        keys = {name: [] for name in INDEXES}  # (hash, ordinal) pairs
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(b"\0" * HEADER.size)
+                position = HEADER.size
+                for ordinal, record in enumerate(records):
+                    encoded = _encode_record(record)
+                    offsets.append(position)
+                    f.write(encoded)
+                    position += len(encoded)
+
+                    keys["id"].append((key_hash(record["id"]), ordinal))
+                    keys["upn"].append((key_hash(record["userPrincipalName"].lower()), ordinal))
+                    if record.get("mail"):
+                        keys["mail"].append((key_hash(record["mail"].lower()), ordinal))
+
+                position = _pad(f, position)
+                offsets_pos = position
+                f.write(offsets.tobytes())
+                position += 8 * len(offsets)
+
+                index_header = []
+                for name in INDEXES:
+                    entries = sorted(keys[name])
+                    index_header += [position, len(entries)]
+                    f.write(array("Q", (h for h, _ in entries)).tobytes())
+                    f.write(array("Q", (o for _, o in entries)).tobytes())
+                    position += 16 * len(entries)
+
+                f.seek(0)
+                f.write(HEADER.pack(
+                    MAGIC, FORMAT_VERSION, len(FIELDS), 0, len(offsets), offsets_pos,
+                    *index_header, fingerprint
+                ))
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return cls(path)
+
+    def _decode(self, ordinal: int) -> UserRecord:
+        mm = self._mm
+        position = self._offsets[ordinal]
+        values = []
+        for _ in FIELDS:
+            (length,) = _LENGTH.unpack_from(mm, position)
+            position += 4
+            if length == NONE_LENGTH:
+                values.append(None)
+            else:
+                values.append(mm[position:position + length].decode())
+                position += length
+        return UserRecord(*values)
+
+    def _find(self, index: str, key: str, field: str) -> Optional[UserRecord]:
+        hashes, ordinals = self._indexes[index]
+        wanted = key_hash(key)
+        i = bisect.bisect_left(hashes, wanted)
+        while i < len(hashes) and hashes[i] == wanted:
+            record = self._decode(ordinals[i])
+            value = getattr(record, field)
+            if value is not None and (value if index == "id" else value.lower()) == key:
+                return record
+            i += 1  # hash collision
+        return None
+
+    def find_by_id(self, user_id: str) -> Optional[UserRecord]:
+        return self._find("id", user_id, "id")
+
+    def find_by_upn(self, upn: str) -> Optional[UserRecord]:
+        """Lookup by lower-cased UPN."""
+        return self._find("upn", upn, "userPrincipalName")
+
+    def find_by_mail(self, mail: str) -> Optional[UserRecord]:
+        """Lookup by lower-cased mail."""
+        return self._find("mail", mail, "mail")
+
+    def __len__(self) -> int:
+        return self.record_count
+
+    def __iter__(self) -> Iterator[UserRecord]:
+        for ordinal in range(self.record_count):
+            yield self._decode(ordinal)
+
+    def close(self):
+        self._offsets.release()
+        for hashes, ordinals in self._indexes.values():
+            hashes.release()
+            ordinals.release()
+        self._view.release()
+        self._mm.close()
+
+
+def _encode_record(record: dict) -> bytes:
+    parts: List[bytes] = []
+    for field in FIELDS:
+        value = record.get(field)
+        if value is None:
+            parts.append(_LENGTH.pack(NONE_LENGTH))
+        else:
+            data = value.encode()
+            parts.append(_LENGTH.pack(len(data)))
+            parts.append(data)
+    return b"".join(parts)
+
+
+def _pad(f, position: int) -> int:
+    """Align the next section to 8 bytes."""
+    padding = -position % 8
+    f.write(b"\0" * padding)
+    return position + padding
@@ -0,0 +1,45 @@
+"""
+File helpers shared by the services: cross-process locks and atomic writes.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: Path):
+    """Hold an exclusive advisory lock on `path` (created if missing).
+    
+    Used to make first-start initialization (keys, seed data) happen once
+    when several worker processes start at the same time.
+    """
+    with open(path, "a") as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def atomic_write(path: Path, data: bytes, mode: int = 0o644):
+    """Write a file so readers see either the old or the new content, never a partial one."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
@@ -0,0 +1,175 @@
+"""
+Incremental persistence for the JSON data files.
+
+Each file (e.g. `users.json`) stays a plain JSON array, the snapshot.
+Changes are appended to a sibling journal (`users.json.journal`, one JSON
+object per line) by a background thread that batches writes, so request
+handlers never rewrite the whole file. The journal is folded back into
+the snapshot (compaction) once its size reaches JOURNAL_COMPACT_RATIO of
+the snapshot's (and at least JOURNAL_COMPACT_MIN_BYTES), so the cost of
+rewriting stays proportional to what was appended, and when the process
+exits.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import List, Optional
+from services.file_utils import atomic_write, file_lock
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class JsonJournal:
+    """JSON snapshot plus append-only journal for one collection of records.
+
+    Records are dicts identified by `key_field`; a later journal entry
+    with the same key replaces the earlier one.
+    """
+
+    BATCH_SIZE = 512
+
+    def __init__(self, snapshot_path: Path, key_field: str):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path.with_name(snapshot_path.name + ".journal")
+        self.key_field = key_field
+        self._lock_path = snapshot_path.with_name(f".{snapshot_path.name}.lock")
+        self._queue: "queue.Queue[dict]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._closed = False
+        atexit.register(self.close)
+
+    def lock(self):
+        """Cross-process lock guarding the snapshot and journal files."""
+        return file_lock(self._lock_path)
+
+    def exists(self) -> bool:
+        return self.snapshot_path.exists() or self.journal_path.exists()
+
+    def load(self) -> List[dict]:
+        """Read the snapshot and replay the journal over it."""
+        records = {}
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r") as f:
+                for record in json.load(f):
+                    records[record[self.key_field]] = record
+        if self.journal_path.exists():
+            with open(self.journal_path, "r") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash: only the last line can be affected,
+                        # since the writer truncates a torn tail before appending
+                        continue
+                    records[record[self.key_field]] = record
+        return list(records.values())
+
+    def replace(self, records: List[dict]):
+        """Write a full snapshot and clear the journal (caller holds lock())."""
+        data = json.dumps(records, indent=2)
+        atomic_write(self.snapshot_path, data.encode())
+        if self.journal_path.exists():
+            os.truncate(self.journal_path, 0)
+
+    def append(self, record: dict):
+        """Queue a record for the journal; returns without waiting for disk."""
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._write_loop, name=f"journal-{self.snapshot_path.name}", daemon=True
+            )
+            self._writer.start()
+        self._queue.put(record)
+
+    def extend(self, records: List[dict]):
+        """Queue several records."""
+        for record in records:
+            self.append(record)
+
+    def flush(self):
+        """Block until every queued record is on disk."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def compact(self):
+        """Fold the journal into the snapshot.
+
+        Re-reads both files under the lock rather than using any in-memory
+        view, so entries appended by other worker processes are kept.
+        """
+        with self.lock():
+            if self.journal_path.exists() and self.journal_path.stat().st_size:
+                self.replace(self.load())
+
+    def close(self):
+        """Flush pending writes and compact (runs at exit)."""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        if self.journal_path.exists():
+            self.compact()
+
+    def _needs_compaction(self, journal_size: int) -> bool:
+        """Whether the journal has grown large enough, relative to the snapshot, to fold in."""
+        if journal_size < config.JOURNAL_COMPACT_MIN_BYTES:
+            return False
+        try:
+            snapshot_size = self.snapshot_path.stat().st_size
+        except FileNotFoundError:
+            snapshot_size = 0
+        return journal_size >= snapshot_size * config.JOURNAL_COMPACT_RATIO
+
+    def _truncate_torn_tail(self, f):
+        """Cut a partial last line left by a crash mid-write (caller holds lock()).
+
+        Appending after it would glue the next record onto the unparsable
+        line, and load() would drop both.
+        """
+        end = f.seek(0, os.SEEK_END)
+        if end == 0:
+            return
+        f.seek(end - 1)
+        if f.read(1) == b"\n":
+            return
+        keep, pos = 0, end
+        while pos > 0:
+            start = max(0, pos - 4096)
+            f.seek(start)
+            newline = f.read(pos - start).rfind(b"\n")
+            if newline >= 0:
+                keep = start + newline + 1
+                break
+            pos = start
+        logger.warning("Dropping %d bytes of torn write from %s", end - keep, self.journal_path)
+        f.truncate(keep)
+        f.seek(keep)
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                lines = "".join(json.dumps(record) + "\n" for record in batch).encode()
+                with self.lock():
+                    with open(self.journal_path, "a+b") as f:
+                        self._truncate_torn_tail(f)
+                        f.write(lines)
+                        f.flush()
+                        os.fsync(f.fileno())
+                        journal_size = f.tell()
+                if self._needs_compaction(journal_size):
+                    self.compact()
+            except Exception:
+                logger.exception("Failed to write %s", self.journal_path)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
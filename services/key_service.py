@@ -1,85 +1,436 @@
 """
-RSA key management service for JWT signing and validation.
+Key management service for JWT signing and validation.
+
+Keys form a key ring: KEYS_DIR/keyring/<kid>.pem (private key) and
+<kid>.crt (self-signed certificate), with their lifecycle recorded in
+KEYS_DIR/keyring.json:
+
+    next     pre-generated in a background thread and already published,
+             so clients have cached it before it signs anything
+    active   signs new tokens (exactly one per algorithm)
+    retired  no longer signs; published and accepted for KEY_RETENTION_HOURS
+
+Each key belongs to one algorithm (RS256, PS256, ES256 or EdDSA); an
+algorithm gets its first key when it is first configured or used. RS256
+is always present: it signs SAML metadata.
+
+Rotation promotes next to active, on a schedule (KEY_ROTATION_INTERVAL_HOURS)
+or through POST /admin/keys/rotate. Changes are made under a file lock and
+every worker re-reads keyring.json when it changes. The active RS256
+key is mirrored to private_key.pem, public_key.pem and certificate.pem.
 """
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
 from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.backends import default_backend
-from typing import Tuple
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+import asyncio
 import base64
 import hashlib
+import json
+import logging
+import threading
+import time
+from services.file_utils import atomic_write, file_lock
 from config import config
 
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ("RS256", "PS256", "ES256", "EdDSA")
+PRIMARY_ALGORITHM = "RS256"  # signs SAML metadata, mirrored to private_key.pem
+
+
+class SigningKey:
+    """One key of the key ring."""
+    
+    __slots__ = (
+        "kid", "alg", "private_key", "public_key", "certificate",
+        "status", "created_at", "activated_at", "retired_at"
+    )
+    
+    def __init__(
+        self,
+        kid: str,
+        alg: str,
+        private_key,
+        certificate: x509.Certificate,
+        status: str,
+        created_at: int,
+        activated_at: Optional[int] = None,
+        retired_at: Optional[int] = None
+    ):
+        self.kid = kid
+        self.alg = alg
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        self.certificate = certificate
+        self.status = status
+        self.created_at = created_at
+        self.activated_at = activated_at
+        self.retired_at = retired_at
+    
+    def to_manifest(self) -> dict:
+        return {
+            "kid": self.kid,
+            "alg": self.alg,
+            "status": self.status,
+            "created_at": self.created_at,
+            "activated_at": self.activated_at,
+            "retired_at": self.retired_at
+        }
+
 
 class KeyService:
-    """Manages RSA keys for JWT signing."""
+    """Manages the signing key ring."""
     
     def __init__(self):
+        # Active RS256 key, kept as attributes for callers that only need one key
         self.private_key = None
         self.public_key = None
         self.kid = None
+        self.certificate = None
+        self.keys: Dict[str, SigningKey] = {}  # every published key, by kid
+        self.version = 0  # bumped whenever the key set changes
+        self._active: Dict[str, SigningKey] = {}  # by algorithm
+        self._manifest_mtime = None
+        self._jwks = None
+        self._pregenerating: Optional[threading.Thread] = None
         self._load_or_generate_keys()
     
+    def _lock(self):
+        return file_lock(config.KEYS_DIR / ".keys.lock")
+    
     def _load_or_generate_keys(self):
-        """Load existing keys or generate new ones."""
-        if config.PRIVATE_KEY_FILE.exists() and config.PUBLIC_KEY_FILE.exists():
-            self._load_keys()
+        """Load the key ring, creating it on first start.
+        
+        The lock makes concurrently starting workers agree on one key ring.
+        """
+        with self._lock():
+            if not config.KEYRING_FILE.exists():
+                self._create_keyring()
+            self._load_keyring()
+    
+    def _create_keyring(self):
+        """Start the key ring from the single-key files, or a new key."""
+        config.KEYRING_DIR.mkdir(parents=True, exist_ok=True)
+        now = int(time.time())
+        if config.PRIVATE_KEY_FILE.exists():
+            with open(config.PRIVATE_KEY_FILE, 'rb') as f:
+                private_key = serialization.load_pem_private_key(
+                    f.read(),
+                    password=None,
+                    backend=default_backend()
+                )
+            key = self._store_key(private_key, PRIMARY_ALGORITHM, "active", now)
         else:
-            self._generate_keys()
+            key = self._store_key(self._generate_private_key(), PRIMARY_ALGORITHM, "active", now)
+        key.activated_at = now
+        self._save_manifest([key])
+        self._mirror_active_key(key)
     
-    def _generate_keys(self):
-        """Generate new RSA key pair."""
-        # Generate private key
-        self.private_key = rsa.generate_private_key(
+    def _generate_private_key(self, alg: str = PRIMARY_ALGORITHM):
+        """Generate a new private key for a signing algorithm."""
+        if alg == "ES256":
+            return ec.generate_private_key(ec.SECP256R1())
+        if alg == "EdDSA":
+            return ed25519.Ed25519PrivateKey.generate()
+        return rsa.generate_private_key(
             public_exponent=65537,
             key_size=2048,
             backend=default_backend()
         )
-        self.public_key = self.private_key.public_key()
-        
-        # Save private key
-        with open(config.PRIVATE_KEY_FILE, 'wb') as f:
-            f.write(self.private_key.private_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PrivateFormat.PKCS8,
-                encryption_algorithm=serialization.NoEncryption()
-            ))
+    
+    def _store_key(self, private_key, alg: str, status: str, created_at: int) -> SigningKey:
+        """Write a key and its certificate into the key ring directory."""
+        kid = self._compute_kid(private_key.public_key())
+        certificate = self._create_certificate(private_key)
+        atomic_write(config.KEYRING_DIR / f"{kid}.pem", private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ), mode=0o600)
+        atomic_write(
+            config.KEYRING_DIR / f"{kid}.crt", certificate.public_bytes(serialization.Encoding.PEM)
+        )
+        return SigningKey(kid, alg, private_key, certificate, status, created_at)
+    
+    def _save_manifest(self, keys: List[SigningKey]):
+        data = json.dumps({"keys": [key.to_manifest() for key in keys]}, indent=2)
+        atomic_write(config.KEYRING_FILE, data.encode())
+    
+    def _load_keyring(self):
+        """Read keyring.json and the key files it names (caller holds _lock())."""
+        stat = config.KEYRING_FILE.stat()
+        with open(config.KEYRING_FILE, 'r') as f:
+            manifest = json.load(f)
         
-        # Save public key
-        with open(config.PUBLIC_KEY_FILE, 'wb') as f:
-            f.write(self.public_key.public_bytes(
-                encoding=serialization.Encoding.PEM,
-                format=serialization.PublicFormat.SubjectPublicKeyInfo
-            ))
+        keys = {}
+        for entry in manifest["keys"]:
+            key = self.keys.get(entry["kid"]) or self._load_key(entry)
+            key.status = entry["status"]
+            key.activated_at = entry.get("activated_at")
+            key.retired_at = entry.get("retired_at")
+            keys[key.kid] = key
         
-        self._generate_kid()
+        self._active = {key.alg: key for key in keys.values() if key.status == "active"}
+        active = self._active[PRIMARY_ALGORITHM]
+        self.keys = keys
+        self.private_key = active.private_key
+        self.public_key = active.public_key
+        self.kid = active.kid
+        self.certificate = active.certificate
+        self._manifest_mtime = stat.st_mtime_ns
+        self.version += 1
+        self._jwks = None
     
-    def _load_keys(self):
-        """Load existing keys from files."""
-        with open(config.PRIVATE_KEY_FILE, 'rb') as f:
-            self.private_key = serialization.load_pem_private_key(
+    def _load_key(self, entry: dict) -> SigningKey:
+        kid = entry["kid"]
+        with open(config.KEYRING_DIR / f"{kid}.pem", 'rb') as f:
+            private_key = serialization.load_pem_private_key(
                 f.read(),
                 password=None,
                 backend=default_backend()
             )
         
-        with open(config.PUBLIC_KEY_FILE, 'rb') as f:
-            self.public_key = serialization.load_pem_public_key(
-                f.read(),
-                backend=default_backend()
-            )
+        certificate = None
+        cert_file = config.KEYRING_DIR / f"{kid}.crt"
+        if cert_file.exists():
+            with open(cert_file, 'rb') as f:
+                certificate = x509.load_pem_x509_certificate(f.read())
+            if certificate.not_valid_after_utc <= datetime.now(timezone.utc):
+                certificate = None
+        if certificate is None:
+            certificate = self._create_certificate(private_key)
+            atomic_write(cert_file, certificate.public_bytes(serialization.Encoding.PEM))
+        
+        # Key rings written before algorithms were selectable only hold RS256 keys
+        alg = entry.get("alg", PRIMARY_ALGORITHM)
+        return SigningKey(kid, alg, private_key, certificate, entry["status"], entry["created_at"])
+    
+    def _mirror_active_key(self, key: SigningKey):
+        """Keep the single-key files pointing at the active key."""
+        atomic_write(config.PRIVATE_KEY_FILE, key.private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ), mode=0o600)
+        atomic_write(config.PUBLIC_KEY_FILE, key.public_key.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ))
+        atomic_write(config.CERTIFICATE_FILE, key.certificate.public_bytes(serialization.Encoding.PEM))
+    
+    def reload(self) -> bool:
+        """Re-read the key ring if another process changed it; returns whether it did."""
+        try:
+            mtime = config.KEYRING_FILE.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._manifest_mtime:
+            return False
+        with self._lock():
+            self._load_keyring()
+        return True
+    
+    def ensure_algorithms(self, algorithms: Iterable[str]):
+        """Give every listed algorithm an active key, creating the missing ones."""
+        missing = set(algorithms) - set(self._active)
+        if not missing:
+            return
+        unknown = missing - set(ALGORITHMS)
+        if unknown:
+            raise ValueError(f"Unknown signing algorithm: {', '.join(sorted(unknown))}")
+        with self._lock():
+            self._load_keyring()
+            now = int(time.time())
+            added = []
+            for alg in sorted(missing - set(self._active)):
+                key = self._store_key(self._generate_private_key(alg), alg, "active", now)
+                key.activated_at = now
+                added.append(key)
+            if added:
+                self._save_manifest(list(self.keys.values()) + added)
+                self._load_keyring()
+    
+    def algorithms(self) -> List[str]:
+        """Algorithms with an active key, in ALGORITHMS order (RS256 first)."""
+        return sorted(self._active, key=ALGORITHMS.index)
+    
+    def rotate(self, alg: Optional[str] = None, if_due: bool = False) -> Dict[str, SigningKey]:
+        """Make the next key active and retire the current one, for one or every algorithm.
         
-        self._generate_kid()
+        Uses the pre-generated next key when there is one, else generates
+        a key on the spot. With if_due, only rotates the algorithms whose
+        schedule says so (rechecked under the lock, so one worker rotates
+        per period). Returns the new active keys by algorithm.
+        """
+        with self._lock():
+            self._load_keyring()
+            now = int(time.time())
+            if alg is not None and alg not in self._active:
+                raise ValueError(f"No active {alg} key")
+            rotated = {}
+            for current in [self._active[alg]] if alg else list(self._active.values()):
+                if if_due and not self._rotation_due(current, now):
+                    continue
+                new_key = next(
+                    (k for k in self.keys.values() if k.alg == current.alg and k.status == "next"), None
+                )
+                if new_key is None:
+                    new_key = self._store_key(
+                        self._generate_private_key(current.alg), current.alg, "next", now
+                    )
+                current.status = "retired"
+                current.retired_at = now
+                new_key.status = "active"
+                new_key.activated_at = now
+                rotated[current.alg] = new_key
+            if not rotated:
+                return rotated
+            
+            new_keys = list(rotated.values())
+            keys = [k for k in self.keys.values() if k not in new_keys] + new_keys
+            self._save_manifest(self._without_expired(keys, now))
+            if PRIMARY_ALGORITHM in rotated:
+                self._mirror_active_key(rotated[PRIMARY_ALGORITHM])
+            self._load_keyring()
+        for key in new_keys:
+            logger.info("Rotated %s signing key, active kid is now %s", key.alg, key.kid)
+        return rotated
+    
+    def _rotation_due(self, key: SigningKey, now: int) -> bool:
+        interval = config.KEY_ROTATION_INTERVAL_HOURS * 3600
+        activated_at = key.activated_at or key.created_at
+        return interval > 0 and activated_at + interval <= now
     
-    def _generate_kid(self):
-        """Generate key ID from public key."""
-        public_bytes = self.public_key.public_bytes(
+    def _without_expired(self, keys: List[SigningKey], now: int) -> List[SigningKey]:
+        """Drop retired keys past their retention period, deleting their files."""
+        retention = config.KEY_RETENTION_HOURS * 3600
+        kept = []
+        for key in keys:
+            if key.status == "retired" and key.retired_at + retention <= now:
+                for suffix in (".pem", ".crt"):
+                    (config.KEYRING_DIR / f"{key.kid}{suffix}").unlink(missing_ok=True)
+            else:
+                kept.append(key)
+        return kept
+    
+    def prune(self):
+        """Stop publishing retired keys whose retention period is over."""
+        now = int(time.time())
+        retention = config.KEY_RETENTION_HOURS * 3600
+        if not any(
+            k.status == "retired" and k.retired_at + retention <= now for k in self.keys.values()
+        ):
+            return
+        with self._lock():
+            self._load_keyring()
+            self._save_manifest(self._without_expired(list(self.keys.values()), now))
+            self._load_keyring()
+    
+    def _missing_next_keys(self) -> List[str]:
+        """Algorithms with an active key but no pre-generated next key."""
+        with_next = {k.alg for k in self.keys.values() if k.status == "next"}
+        return [alg for alg in self._active if alg not in with_next]
+    
+    def ensure_next_key(self):
+        """Generate the next keys in a background thread unless they exist."""
+        if not self._missing_next_keys():
+            return
+        if self._pregenerating is not None and self._pregenerating.is_alive():
+            return
+        self._pregenerating = threading.Thread(
+            target=self._pregenerate, name="key-pregeneration", daemon=True
+        )
+        self._pregenerating.start()
+    
+    def _pregenerate(self):
+        try:
+            # The slow part, outside the lock
+            generated = {alg: self._generate_private_key(alg) for alg in self._missing_next_keys()}
+            with self._lock():
+                self._load_keyring()
+                missing = self._missing_next_keys()  # another worker may have got there first
+                now = int(time.time())
+                added = [
+                    self._store_key(private_key, alg, "next", now)
+                    for alg, private_key in generated.items() if alg in missing
+                ]
+                if not added:
+                    return
+                self._save_manifest(list(self.keys.values()) + added)
+                self._load_keyring()
+            for key in added:
+                logger.info("Pre-generated next %s signing key %s", key.alg, key.kid)
+        except Exception:
+            logger.exception("Failed to pre-generate the next signing key")
+    
+    def maintain(self):
+        """One scheduler tick: pick up changes, rotate if due, prune, pre-generate."""
+        self.reload()
+        if config.KEY_ROTATION_INTERVAL_HOURS > 0:
+            now = int(time.time())
+            if any(self._rotation_due(key, now) for key in self._active.values()):
+                self.rotate(if_due=True)
+            self.ensure_next_key()
+        self.prune()
+    
+    async def run_rotation(self, interval: Optional[float] = None):
+        """Run maintain() every KEY_RING_POLL_SECONDS (started by the app lifespan)."""
+        interval = interval or config.KEY_RING_POLL_SECONDS
+        while True:
+            try:
+                await asyncio.to_thread(self.maintain)
+            except Exception:
+                logger.exception("Signing key maintenance failed")
+            await asyncio.sleep(interval)
+    
+    def _create_certificate(self, private_key) -> x509.Certificate:
+        """Self-signed certificate for a signing key (SAML metadata needs X.509)."""
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Microsoft Entra ID Emulator")])
+        now = datetime.now(timezone.utc)
+        # Ed25519 signatures take no separate hash algorithm
+        algorithm = None if isinstance(private_key, ed25519.Ed25519PrivateKey) else hashes.SHA256()
+        return (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(private_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - timedelta(minutes=5))
+            .not_valid_after(now + timedelta(days=config.CERTIFICATE_VALID_DAYS))
+            .sign(private_key, algorithm)
+        )
+    
+    def get_certificate_base64(self, kid: Optional[str] = None) -> str:
+        """DER certificate (active key by default), base64-encoded as in <X509Certificate> and x5c."""
+        certificate = self.keys[kid].certificate if kid else self.certificate
+        return base64.b64encode(certificate.public_bytes(serialization.Encoding.DER)).decode()
+    
+    def _compute_kid(self, public_key) -> str:
+        """Key ID derived from the public key."""
+        public_bytes = public_key.public_bytes(
             encoding=serialization.Encoding.DER,
             format=serialization.PublicFormat.SubjectPublicKeyInfo
         )
-        self.kid = base64.urlsafe_b64encode(
+        return base64.urlsafe_b64encode(
             hashlib.sha256(public_bytes).digest()[:8]
         ).decode('utf-8').rstrip('=')
     
+    def get_active_key(self, alg: str = PRIMARY_ALGORITHM) -> SigningKey:
+        """The key that signs new tokens with `alg` (kid and key object read together).
+        
+        An algorithm used for the first time gets its key here.
+        """
+        key = self._active.get(alg)
+        if key is None:
+            self.ensure_algorithms([alg])
+            key = self._active[alg]
+        return key
+    
     def get_private_key_pem(self) -> str:
         """Get private key in PEM format."""
         return self.private_key.private_bytes(
@@ -88,6 +439,24 @@ class KeyService:
             encryption_algorithm=serialization.NoEncryption()
         ).decode('utf-8')
     
+    def get_key(self, kid: str) -> Optional[SigningKey]:
+        """Published key with this kid.
+        
+        An unknown kid may come from a key another worker just created,
+        so the key ring is re-read once before giving up.
+        """
+        key = self.keys.get(kid)
+        if key is None and self.reload():
+            key = self.keys.get(kid)
+        return key
+    
+    def get_verification_key(self, kid: Optional[str] = None):
+        """Public key object for a kid (the active RS256 key if None), ready for jwt.decode."""
+        if kid is None:
+            return self.public_key
+        key = self.get_key(kid)
+        return key.public_key if key else None
+    
     def get_public_key_pem(self) -> str:
         """Get public key in PEM format."""
         return self.public_key.public_bytes(
@@ -96,26 +465,43 @@ class KeyService:
         ).decode('utf-8')
     
     def get_jwks(self) -> dict:
-        """Get JWKS (JSON Web Key Set) for public key."""
-        public_numbers = self.public_key.public_numbers()
-        
-        # Convert to base64url
-        def int_to_base64url(num: int) -> str:
-            num_bytes = num.to_bytes((num.bit_length() + 7) // 8, byteorder='big')
-            return base64.urlsafe_b64encode(num_bytes).decode('utf-8').rstrip('=')
-        
-        return {
-            "keys": [
-                {
-                    "kty": "RSA",
-                    "use": "sig",
-                    "kid": self.kid,
-                    "alg": "RS256",
-                    "n": int_to_base64url(public_numbers.n),
-                    "e": int_to_base64url(public_numbers.e)
-                }
-            ]
-        }
+        """Get JWKS (JSON Web Key Set) with every published key (computed once per key set)."""
+        if self._jwks is None:
+            self._jwks = {"keys": [self._jwk(key) for key in self.keys.values()]}
+        return self._jwks
+    
+    def _jwk(self, key: SigningKey) -> dict:
+        jwk = {"use": "sig", "kid": key.kid, "alg": key.alg}
+        if key.alg == "ES256":
+            public_numbers = key.public_key.public_numbers()
+            jwk.update(
+                kty="EC",
+                crv="P-256",
+                x=_base64url(public_numbers.x.to_bytes(32, byteorder='big')),
+                y=_base64url(public_numbers.y.to_bytes(32, byteorder='big'))
+            )
+        elif key.alg == "EdDSA":
+            raw = key.public_key.public_bytes(
+                encoding=serialization.Encoding.Raw,
+                format=serialization.PublicFormat.Raw
+            )
+            jwk.update(kty="OKP", crv="Ed25519", x=_base64url(raw))
+        else:
+            public_numbers = key.public_key.public_numbers()
+            jwk.update(
+                kty="RSA",
+                n=_base64url(_int_to_bytes(public_numbers.n)),
+                e=_base64url(_int_to_bytes(public_numbers.e))
+            )
+        return jwk
+
+
+def _int_to_bytes(num: int) -> bytes:
+    return num.to_bytes((num.bit_length() + 7) // 8, byteorder='big')
+
+
+def _base64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('utf-8').rstrip('=')
 
 
 # Global instance
@@ -0,0 +1,264 @@
+"""
+Prometheus metrics (text exposition format 0.0.4), without dependencies.
+
+Counters and histograms are updated in place under a per-metric lock
+(password checks and thread-mode signing observe from worker threads);
+gauges are read from callbacks at scrape time, so store sizes cost
+nothing between scrapes. MetricsMiddleware times every request as a
+pure ASGI middleware, labelled with the route template rather than the
+path so cardinality stays bounded; /token also records its grant type.
+
+Metrics are per process: with WORKERS > 1 each scrape reaches one
+worker (see docs/developer-manual.md, Monitoring).
+"""
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; from sub-millisecond signing/verification to multi-second password checks
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A named metric family with fixed label names."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in values
+        ]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        lines = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge(Metric):
+    """A value set directly, or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation)
+        self.callback = callback
+        self._value = 0.0
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+    def value(self) -> float:
+        return self.callback() if self.callback is not None else self._value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.value())}"]
+
+
+class Registry:
+    """Metric families in registration order."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, callback: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, callback))
+
+    def render(self) -> bytes:
+        """All metrics in the Prometheus text format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return ("\n".join(lines) + "\n").encode()
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "entra_http_requests_total", "HTTP requests by route template and status.",
+    ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "entra_http_request_duration_seconds", "HTTP request latency by route template.",
+    ("method", "route")
+)
+token_requests = registry.counter(
+    "entra_token_requests_total", "Token endpoint requests by grant type and status.",
+    ("grant_type", "status")
+)
+token_request_duration = registry.histogram(
+    "entra_token_request_duration_seconds", "Token endpoint latency by grant type.",
+    ("grant_type",)
+)
+password_verify_duration = registry.histogram(
+    "entra_password_verify_duration_seconds", "Password hash verification time by scheme.",
+    ("scheme",)
+)
+jwt_sign_duration = registry.histogram(
+    "entra_jwt_sign_duration_seconds",
+    "JWT signing time by algorithm, including the signing engine's queueing.",
+    ("alg",)
+)
+jwt_verify_duration = registry.histogram(
+    "entra_jwt_verify_duration_seconds",
+    "JWT signature verification time (verified-token cache misses) by result.",
+    ("result",)
+)
+throttled_requests = registry.counter(
+    "entra_throttled_requests_total",
+    "Requests rejected by admission control (429) by endpoint and limit.",
+    ("endpoint", "reason")
+)
+event_loop_lag = registry.gauge(
+    "entra_event_loop_lag_seconds", "How late the event loop last woke a periodic timer."
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request counts and latency."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            template = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, template, str(status))
+            http_request_duration.observe(elapsed, method, template)
+            grant_type = scope.get("state", {}).get("grant_type")
+            if grant_type is not None:
+                token_requests.inc(grant_type, str(status))
+                token_request_duration.observe(elapsed, grant_type)
+
+
+async def monitor_event_loop(interval: float):
+    """Background task measuring how late the loop wakes a sleep of `interval`."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        event_loop_lag.set(max(0.0, time.perf_counter() - start - interval))
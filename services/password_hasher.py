@@ -0,0 +1,249 @@
+"""
+Password hashing schemes.
+
+Hashes are self-describing strings, so users hashed with different
+schemes or costs can share a directory:
+
+    bcrypt   $2b$12$<salt+hash>                       (cost = log2 rounds)
+    pbkdf2   $pbkdf2-sha256$600000$<salt>$<hash>       (cost = iterations)
+    scrypt   $scrypt$ln=15,r=8,p=1$<salt>$<hash>       (cost = log2 N)
+
+A profile is written "scheme" or "scheme:cost". The default profile
+comes from PASSWORD_HASH_SCHEME/PASSWORD_HASH_COST; PASSWORD_HASH_PROFILES
+overrides it per tenant, e.g. "loadtest=bcrypt:4,contoso=scrypt:14".
+A user's profile is the one of the tenant they were provisioned under
+(User.hashTenant), never the tenant of the login request.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+import bcrypt
+from services.metrics import password_verify_duration
+from config import config
+
+
+class PasswordHasher(ABC):
+    """One hashing scheme at one cost.
+
+    Schemes implement every abstract method; an incomplete one fails when
+    it is instantiated, not on the first login.
+    """
+
+    scheme = ""
+    default_cost = 0
+
+    def __init__(self, cost: Optional[int] = None):
+        self.cost = self.default_cost if cost is None else cost
+
+    @property
+    def profile(self) -> str:
+        return f"{self.scheme}:{self.cost}"
+
+    @classmethod
+    @abstractmethod
+    def identify(cls, encoded: str) -> bool:
+        """Whether `encoded` is a hash produced by this scheme."""
+
+    @classmethod
+    @abstractmethod
+    def verify(cls, password: str, encoded: str) -> bool:
+        """Whether `password` matches `encoded`."""
+
+    @classmethod
+    @abstractmethod
+    def cost_of(cls, encoded: str) -> Optional[int]:
+        """Cost parameter of `encoded`, or None if it can't be parsed."""
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        """Hash `password` at this hasher's cost."""
+
+    def needs_rehash(self, encoded: str) -> bool:
+        """Whether `encoded` uses another scheme or cost than this hasher."""
+        return not self.identify(encoded) or self.cost_of(encoded) != self.cost
+
+
+class BcryptHasher(PasswordHasher):
+    scheme = "bcrypt"
+    default_cost = 12
+
+    @classmethod
+    def identify(cls, encoded: str) -> bool:
+        return encoded[:4] in ("$2a$", "$2b$", "$2y$")
+
+    @classmethod
+    def verify(cls, password: str, encoded: str) -> bool:
+        return bcrypt.checkpw(password.encode(), encoded.encode())
+
+    @classmethod
+    def cost_of(cls, encoded: str) -> Optional[int]:
+        try:
+            return int(encoded[4:6])
+        except ValueError:
+            return None
+
+    def hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.cost)).decode()
+
+
+class Pbkdf2Hasher(PasswordHasher):
+    scheme = "pbkdf2"
+    default_cost = 600000
+    prefix = "$pbkdf2-sha256$"
+
+    @classmethod
+    def identify(cls, encoded: str) -> bool:
+        return encoded.startswith(cls.prefix)
+
+    @classmethod
+    def _parse(cls, encoded: str):
+        iterations, salt, digest = encoded[len(cls.prefix):].split("$")
+        return int(iterations), _b64decode(salt), _b64decode(digest)
+
+    @classmethod
+    def verify(cls, password: str, encoded: str) -> bool:
+        try:
+            iterations, salt, digest = cls._parse(encoded)
+        except ValueError:
+            return False
+        candidate = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, len(digest))
+        return hmac.compare_digest(candidate, digest)
+
+    @classmethod
+    def cost_of(cls, encoded: str) -> Optional[int]:
+        try:
+            return cls._parse(encoded)[0]
+        except ValueError:
+            return None
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, self.cost)
+        return f"{self.prefix}{self.cost}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+class ScryptHasher(PasswordHasher):
+    scheme = "scrypt"
+    default_cost = 15
+    prefix = "$scrypt$"
+    block_size = 8
+    parallelism = 1
+
+    @classmethod
+    def identify(cls, encoded: str) -> bool:
+        return encoded.startswith(cls.prefix)
+
+    @classmethod
+    def _parse(cls, encoded: str):
+        params, salt, digest = encoded[len(cls.prefix):].split("$")
+        values = dict(item.split("=") for item in params.split(","))
+        return int(values["ln"]), int(values["r"]), int(values["p"]), _b64decode(salt), _b64decode(digest)
+
+    @staticmethod
+    def _derive(password: str, salt: bytes, ln: int, r: int, p: int, length: int) -> bytes:
+        n = 1 << ln
+        # hashlib's default maxmem (32 MiB) is below what N=2^15, r=8 needs
+        return hashlib.scrypt(
+            password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r * p, dklen=length
+        )
+
+    @classmethod
+    def verify(cls, password: str, encoded: str) -> bool:
+        try:
+            ln, r, p, salt, digest = cls._parse(encoded)
+        except (ValueError, KeyError):
+            return False
+        return hmac.compare_digest(cls._derive(password, salt, ln, r, p, len(digest)), digest)
+
+    @classmethod
+    def cost_of(cls, encoded: str) -> Optional[int]:
+        try:
+            return cls._parse(encoded)[0]
+        except (ValueError, KeyError):
+            return None
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        r, p = self.block_size, self.parallelism
+        digest = self._derive(password, salt, self.cost, r, p, 32)
+        return f"{self.prefix}ln={self.cost},r={r},p={p}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+HASHERS = {cls.scheme: cls for cls in (BcryptHasher, Pbkdf2Hasher, ScryptHasher)}
+
+_hashers: Dict[str, PasswordHasher] = {}
+
+
+def hasher_for_profile(profile: str) -> PasswordHasher:
+    """Hasher for a "scheme" or "scheme:cost" profile."""
+    hasher = _hashers.get(profile)
+    if hasher is None:
+        scheme, _, cost = profile.strip().partition(":")
+        if scheme not in HASHERS:
+            raise ValueError(f"Unknown password hash scheme: {scheme}")
+        hasher = _hashers[profile] = HASHERS[scheme](int(cost) if cost else None)
+    return hasher
+
+
+def parse_profiles(value: str) -> Dict[str, str]:
+    """Parse "tenant=profile,..." into a dict (profiles are validated)."""
+    profiles = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        tenant, _, profile = item.partition("=")
+        hasher_for_profile(profile)
+        profiles[tenant.strip()] = profile.strip()
+    return profiles
+
+
+_default_profile = config.PASSWORD_HASH_SCHEME + (
+    f":{config.PASSWORD_HASH_COST}" if config.PASSWORD_HASH_COST is not None else ""
+)
+_tenant_profiles = parse_profiles(config.PASSWORD_HASH_PROFILES)
+
+
+def get_hasher(tenant: Optional[str] = None) -> PasswordHasher:
+    """Hasher for new hashes: the tenant's profile, else the configured default."""
+    return hasher_for_profile(_tenant_profiles.get(tenant, _default_profile))
+
+
+def identify(encoded: str) -> Optional[type]:
+    """Hasher class that produced `encoded`, or None if it isn't a known hash."""
+    for cls in HASHERS.values():
+        if cls.identify(encoded):
+            return cls
+    return None
+
+
+def check_password(password: str, encoded: str) -> bool:
+    """Verify a password against a hash of any known scheme."""
+    cls = identify(encoded)
+    if cls is None:
+        return False
+    start = time.perf_counter()
+    valid = cls.verify(password, encoded)
+    password_verify_duration.observe(time.perf_counter() - start, cls.scheme)
+    return valid
+
+
+def verify_and_rehash(password: str, encoded: str, hasher: PasswordHasher):
+    """Verify a password; if valid and `hasher` wants another scheme or cost, rehash it.
+
+    Returns (valid, new hash or None).
+    """
+    if not check_password(password, encoded):
+        return False, None
+    if hasher.needs_rehash(encoded):
+        return True, hasher.hash(password)
+    return True, None
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
@@ -0,0 +1,209 @@
+"""
+Opt-in profiling of single requests.
+
+A request is profiled with cProfile when it carries the admin secret in
+the X-Profile-Request header. Browser-driven flows such as the login form
+can use the __profile query parameter instead, but only with the separate
+PROFILE_TOKEN: query strings end up in access logs, browser history and
+Referer headers, and the admin secret must never. The response gets an
+X-Profile-Id header, and the profile is kept in a ring of the last
+PROFILE_RING_SIZE, downloadable from /admin/profiles as a pstats file or
+as collapsed stacks for flamegraph tools.
+
+Other requests only pay a scan of their header names and query string;
+without an ADMIN_SECRET the middleware isn't installed at all.
+
+cProfile traces the event loop's thread: coroutines of other requests
+interleaved with the profiled one are included, and work handed to
+thread or process pools (password checks, signing engine) appears as
+time spent awaiting. One request is profiled at a time; a flagged
+request arriving while another is being profiled runs unprofiled.
+"""
+import cProfile
+import hmac
+import itertools
+import marshal
+import pstats
+import time
+from collections import deque
+from io import StringIO
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl
+from config import config
+
+HEADER = b"x-profile-request"
+QUERY_PARAMETER = "__profile"
+
+
+class RequestProfile:
+    """The cProfile stats of one request."""
+
+    __slots__ = ("id", "method", "path", "status", "duration", "created_at", "stats")
+
+    def __init__(self, id: str, method: str, path: str, status: int, duration: float, stats: dict):
+        self.id = id
+        self.method = method
+        self.path = path
+        self.status = status
+        self.duration = duration
+        self.created_at = int(time.time())
+        self.stats = stats
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 3),
+            "created_at": self.created_at
+        }
+
+    def pstats_bytes(self) -> bytes:
+        """The profile in the file format of cProfile.Profile.dump_stats (pstats, snakeviz)."""
+        return marshal.dumps(self.stats)
+
+    def text(self, sort: str = "cumulative", limit: int = 50) -> str:
+        """pstats report of the top `limit` functions."""
+        output = StringIO()
+        stats = pstats.Stats(_LoadedProfile(self.stats), stream=output)
+        stats.sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def collapsed(self) -> str:
+        return collapsed_stacks(self.stats)
+
+
+class _LoadedProfile:
+    """Adapter for pstats.Stats, which loads any object with create_stats()."""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def _label(func) -> str:
+    filename, line, name = func
+    if filename == "~":  # built-in
+        return name.strip("<>").replace(";", ",")
+    return f"{name} ({filename.rsplit('/', 1)[-1]}:{line})".replace(";", ",")
+
+
+def collapsed_stacks(stats: dict, max_depth: int = 64) -> str:
+    """Collapsed stacks ("a;b;c microseconds" lines) from a cProfile stats dict.
+
+    cProfile only records caller -> callee edges, so stacks are rebuilt
+    from the root functions down, splitting each function's time among
+    its callers in proportion to the time they spent calling it.
+    """
+    # stats: func -> (primitive calls, calls, self time, cumulative time, {caller: edge stats})
+    children: Dict[tuple, List[tuple]] = {}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, edge_cumulative) in callers.items():
+            children.setdefault(caller, []).append((func, edge_cumulative))
+
+    lines: Dict[str, float] = {}
+
+    def visit(stack: List[str], path: set, func: tuple, cumulative: float):
+        total = stats[func][3]
+        share = cumulative / total if total else 0.0
+        stack.append(_label(func))
+        path.add(func)
+        own = stats[func][2] * share
+        if own > 0:
+            key = ";".join(stack)
+            lines[key] = lines.get(key, 0.0) + own
+        if len(stack) < max_depth:
+            for callee, edge_cumulative in children.get(func, ()):
+                if callee not in path:  # recursion is folded into the outer frame
+                    visit(stack, path, callee, edge_cumulative * share)
+        path.discard(func)
+        stack.pop()
+
+    for func, (_, _, _, cumulative, callers) in stats.items():
+        if not callers:
+            visit([], set(), func, cumulative)
+
+    return "".join(
+        f"{stack} {round(seconds * 1_000_000)}\n"
+        for stack, seconds in sorted(lines.items()) if seconds >= 0.0000005
+    )
+
+
+class ProfileRing:
+    """The most recent request profiles, oldest dropped first."""
+
+    def __init__(self, size: int):
+        self._profiles = deque(maxlen=size)
+        self._ids = (f"{n:06d}" for n in itertools.count(1))
+
+    def new_id(self) -> str:
+        return next(self._ids)
+
+    def add(self, profile: RequestProfile) -> None:
+        self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        return next((p for p in self._profiles if p.id == profile_id), None)
+
+    def list(self) -> List[RequestProfile]:
+        return list(reversed(self._profiles))
+
+
+profiles = ProfileRing(config.PROFILE_RING_SIZE)
+
+
+def _requested(scope) -> bool:
+    """Whether the request carries a profiling flag.
+
+    The header takes the admin secret; the query parameter only takes
+    PROFILE_TOKEN, and is ignored when that isn't set.
+    """
+    for name, value in scope["headers"]:
+        if name == HEADER:
+            return hmac.compare_digest(value, config.ADMIN_SECRET.encode())
+    query = scope["query_string"]
+    if config.PROFILE_TOKEN and QUERY_PARAMETER.encode() in query:
+        for name, value in parse_qsl(query.decode("latin-1")):
+            if name == QUERY_PARAMETER:
+                return hmac.compare_digest(value.encode("latin-1"), config.PROFILE_TOKEN.encode())
+    return False
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware profiling flagged requests into `profiles`."""
+
+    def __init__(self, app):
+        self.app = app
+        self._active = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active or not _requested(scope):
+            return await self.app(scope, receive, send)
+
+        profile_id = profiles.new_id()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        self._active = True
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.disable()
+            duration = time.perf_counter() - start
+            self._active = False
+            profiler.create_stats()
+            profiles.add(RequestProfile(
+                profile_id, scope["method"], scope["path"], status, duration, profiler.stats
+            ))
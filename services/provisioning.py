@@ -0,0 +1,307 @@
+"""
+Bulk user provisioning.
+
+Users arrive as a stream of NDJSON or CSV rows and are never loaded all
+at once. Plain-text passwords are hashed in a process pool across all
+cores (with the tenant's hashing profile, see services.password_hasher),
+UPNs are checked against the directory index, and accepted users are
+committed in batches (one journal batch each). Used by
+POST /admin/users/bulk and by provision.py.
+
+Each row has the User fields; the password is given either in plain
+text as `password` or already hashed as `passwordHash`.
+"""
+import asyncio
+import csv
+import json
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, List, Optional, Tuple
+from pydantic import ValidationError
+from models.user import User
+from services.password_hasher import get_hasher, hasher_for_profile, identify
+from services.signing import process_pool
+from config import config
+
+FORMATS = ("ndjson", "csv")
+MAX_REPORTED_ERRORS = 100
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def hash_passwords(passwords: List[str], profile: str) -> List[str]:
+    """Hash a chunk of passwords with a hashing profile (runs in a worker process)."""
+    hasher = hasher_for_profile(profile)
+    return [hasher.hash(password) for password in passwords]
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool used for hashing (created by start_pool(), else on first use).
+
+    Workers are forked where possible, and all at once before any thread
+    starts (see services.signing): a spawned worker would re-import the
+    services package and load the whole directory just to hash.
+    """
+    global _pool
+    if _pool is None:
+        _pool = process_pool(config.BULK_IMPORT_WORKERS)
+    return _pool
+
+
+def start_pool():
+    """Fork the hashing workers now (called on application startup)."""
+    get_pool()
+
+
+def shutdown_pool():
+    """Stop the hashing workers.
+
+    Called on application shutdown: a uvicorn worker started by
+    multiprocessing joins its children before the executor's own exit
+    hook runs, so an idle pool would otherwise block the worker's exit.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+class RowReader:
+    """Split a byte stream into rows, one chunk at a time.
+
+    feed() accepts chunks of any size and returns the rows completed so far
+    as (line number, row, error) tuples; exactly one of row/error is None.
+    CSV files start with a header row naming the User fields; quoted
+    fields may not contain newlines.
+    """
+
+    def __init__(self, fmt: str):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.fmt = fmt
+        self.line_number = 0
+        self._buffer = b""
+        self._header: Optional[List[str]] = None
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, Optional[dict], Optional[str]]]:
+        self._buffer += chunk
+        lines = self._buffer.split(b"\n")
+        self._buffer = lines.pop()
+        return [row for row in map(self._parse_line, lines) if row is not None]
+
+    def close(self) -> List[Tuple[int, Optional[dict], Optional[str]]]:
+        """Parse a final line without a trailing newline."""
+        line, self._buffer = self._buffer, b""
+        row = self._parse_line(line) if line else None
+        return [row] if row is not None else []
+
+    def _parse_line(self, line: bytes):
+        self.line_number += 1
+        try:
+            text = line.decode("utf-8-sig" if self.line_number == 1 else "utf-8").strip()
+        except UnicodeDecodeError:
+            return self.line_number, None, "invalid UTF-8"
+        if not text:
+            return None
+
+        if self.fmt == "ndjson":
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                return self.line_number, None, f"invalid JSON: {e}"
+            if not isinstance(row, dict):
+                return self.line_number, None, "expected a JSON object"
+            return self.line_number, row, None
+
+        values = next(csv.reader([text]))
+        if self._header is None:
+            self._header = [name.strip() for name in values]
+            return None
+        if len(values) != len(self._header):
+            return self.line_number, None, f"expected {len(self._header)} columns, got {len(values)}"
+        # Empty CSV cells mean "not set"
+        return self.line_number, {k: v for k, v in zip(self._header, values) if v != ""}, None
+
+
+class BulkImport:
+    """State of one import: validation, batching and progress counters.
+
+    add() validates a row and queues it; once batch_size rows are queued
+    (or the input ends) the driver hashes their passwords and commit()s
+    them. Rejected rows are counted and the first MAX_REPORTED_ERRORS are
+    kept with their line numbers.
+    """
+
+    def __init__(
+        self,
+        directory,
+        batch_size: int = None,
+        tenant: Optional[str] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.directory = directory
+        self.batch_size = batch_size or config.BULK_IMPORT_BATCH_SIZE
+        self.tenant = tenant
+        self.hash_profile = get_hasher(tenant).profile
+        self._clock = clock
+        self.started = clock()
+        self.imported = 0
+        self.rejected = 0
+        self.errors: List[dict] = []
+        self._seen_upns = set()
+        self._seen_ids = set()
+        self._pending: List[Tuple[User, Optional[str]]] = []  # (user, plain-text password)
+
+    def add(self, line: int, row: Optional[dict], error: Optional[str] = None) -> bool:
+        """Validate and queue a row; returns True when a batch is ready."""
+        if error is None:
+            try:
+                user, password = self._validate(row)
+            except ValueError as e:
+                error = _error_message(e)
+        if error is not None:
+            self._reject(line, error)
+            return False
+
+        self._seen_upns.add(user.userPrincipalName.lower())
+        self._seen_ids.add(user.id)
+        self._pending.append((user, password))
+        return len(self._pending) >= self.batch_size
+
+    def _validate(self, row: dict) -> Tuple[User, Optional[str]]:
+        row = dict(row)
+        password = row.pop("password", None)
+        if password is None and not row.get("passwordHash"):
+            raise ValueError("password or passwordHash is required")
+        if password is not None:
+            row["passwordHash"] = ""  # filled in once hashed
+        elif identify(row["passwordHash"]) is None:
+            raise ValueError("passwordHash must be a bcrypt, PBKDF2 or scrypt hash")
+
+        user = User.model_validate(row)
+        # Later logins rehash to this tenant's profile (see UserService.verify_password)
+        user.hashTenant = self.tenant
+        upn = user.userPrincipalName.lower()
+        if upn in self._seen_upns or self.directory.upn_exists(upn):
+            raise ValueError(f"userPrincipalName already exists: {user.userPrincipalName}")
+        if user.id in self._seen_ids or self.directory.id_exists(user.id):
+            raise ValueError(f"id already exists: {user.id}")
+        return user, password
+
+    def _reject(self, line: int, error: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def take_batch(self) -> Tuple[List[User], List[str]]:
+        """Queued users, and the plain-text passwords still to be hashed."""
+        batch, self._pending = self._pending, []
+        users = [user for user, _ in batch]
+        passwords = [password for _, password in batch if password is not None]
+        return users, passwords
+
+    def commit(self, users: List[User], passwords: List[str], hashes: List[str]):
+        """Store the hashes on their users and add the batch to the directory."""
+        hashes = iter(hashes)
+        for user in users:
+            if not user.passwordHash:
+                user.passwordHash = next(hashes)
+        self.imported += self.directory.create_users(users)
+
+    def progress(self, event: str = "progress") -> dict:
+        elapsed = self._clock() - self.started
+        report = {
+            "event": event,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "elapsed_seconds": round(elapsed, 3),
+            "users_per_second": round(self.imported / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        if event == "done":
+            report["errors"] = self.errors
+        return report
+
+
+def _chunks(items: List[str], count: int) -> List[List[str]]:
+    """Split items into at most `count` similar-sized chunks."""
+    size = max(1, -(-len(items) // max(1, count)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _error_message(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors()
+        )
+    return str(error)
+
+
+def import_users(
+    chunks: Iterable[bytes],
+    fmt: str,
+    directory,
+    batch_size: int = None,
+    pool: Executor = None,
+    tenant: Optional[str] = None,
+    on_progress: Callable[[dict], None] = None
+) -> dict:
+    """Import users from a byte stream; returns the final report."""
+    pool = pool or get_pool()
+    reader = RowReader(fmt)
+    job = BulkImport(directory, batch_size, tenant)
+
+    def commit_batch():
+        users, passwords = job.take_batch()
+        chunks = _chunks(passwords, config.BULK_IMPORT_WORKERS)
+        hashes = []
+        for hashed in pool.map(hash_passwords, chunks, [job.hash_profile] * len(chunks)):
+            hashes.extend(hashed)
+        job.commit(users, passwords, hashes)
+        if on_progress:
+            on_progress(job.progress())
+
+    for chunk in chunks:
+        for row in reader.feed(chunk):
+            if job.add(*row):
+                commit_batch()
+    for row in reader.close():
+        job.add(*row)
+    commit_batch()
+    return job.progress("done")
+
+
+async def import_users_async(
+    chunks: AsyncIterable[bytes],
+    fmt: str,
+    directory,
+    batch_size: int = None,
+    pool: Executor = None,
+    tenant: Optional[str] = None
+) -> AsyncIterator[dict]:
+    """Import users from an async byte stream, yielding a progress report per batch.
+
+    The event loop keeps serving other requests while a batch is hashed.
+    The last report has event "done" and lists rejected rows.
+    """
+    pool = pool or get_pool()
+    loop = asyncio.get_running_loop()
+    reader = RowReader(fmt)
+    job = BulkImport(directory, batch_size, tenant)
+
+    async def commit_batch():
+        users, passwords = job.take_batch()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(pool, hash_passwords, chunk, job.hash_profile)
+            for chunk in _chunks(passwords, config.BULK_IMPORT_WORKERS)
+        ))
+        job.commit(users, passwords, [h for hashed in results for h in hashed])
+        return job.progress()
+
+    async for chunk in chunks:
+        for row in reader.feed(chunk):
+            if job.add(*row):
+                yield await commit_batch()
+    for row in reader.close():
+        job.add(*row)
+    await commit_batch()
+    yield job.progress("done")
@@ -0,0 +1,107 @@
+"""
+Pre-rendered metadata documents (discovery, JWKS, federation metadata).
+
+Documents are rendered to bytes once per cache key and served with a
+strong ETag, Last-Modified and Cache-Control; conditional requests get a
+304 without touching the body. Keys include key_service.version, so
+key changes invalidate every document. Configuration is read at startup,
+so a config change takes effect with the restart that applies it.
+"""
+import base64
+import hashlib
+import json
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Hashable, Optional
+from starlette.requests import Request
+from starlette.responses import Response
+from services.cache import ExpiringLRUCache
+
+
+class CachedDocument:
+    """Rendered response body with its validators."""
+
+    __slots__ = ("body", "media_type", "etag", "last_modified", "http_date")
+
+    def __init__(self, body: bytes, media_type: str, last_modified: Optional[float] = None):
+        self.body = body
+        self.media_type = media_type
+        digest = hashlib.sha256(body).digest()[:18]
+        self.etag = '"' + base64.urlsafe_b64encode(digest).decode() + '"'
+        self.last_modified = int(last_modified if last_modified is not None else time.time())
+        self.http_date = formatdate(self.last_modified, usegmt=True)
+
+
+class DocumentCache:
+    """Size-bounded cache of CachedDocuments, rendered on first use."""
+
+    def __init__(self, max_size: int):
+        self._documents = ExpiringLRUCache(max_size)
+
+    def get(
+        self,
+        key: Hashable,
+        render: Callable[[], bytes],
+        media_type: str,
+        expires_at: Optional[float] = None,
+        last_modified: Optional[float] = None
+    ) -> CachedDocument:
+        """Cached document, rendered if missing or past `expires_at`."""
+        document = self._documents.get(key)
+        if document is None:
+            document = CachedDocument(render(), media_type, last_modified)
+            self._documents.set(key, document, expires_at=expires_at)
+        return document
+
+    def clear(self):
+        self._documents.clear()
+
+    def stats(self) -> dict:
+        return self._documents.stats()
+
+
+def render_json(data: dict) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode()
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison (RFC 9110 13.1.2)."""
+    if header.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in header.split(",")
+    )
+
+
+def _not_modified_since(header: str, last_modified: int) -> bool:
+    try:
+        return last_modified <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def document_response(
+    request: Request,
+    document: CachedDocument,
+    max_age: int,
+    headers: Optional[dict] = None
+) -> Response:
+    """200 with the document, or 304 if the client's copy is current."""
+    headers = {
+        "ETag": document.etag,
+        "Last-Modified": document.http_date,
+        "Cache-Control": f"public, max-age={max_age}",
+        **(headers or {})
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, document.etag)
+    else:
+        # If-Modified-Since only counts when If-None-Match is absent
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = if_modified_since is not None and _not_modified_since(
+            if_modified_since, document.last_modified
+        )
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type=document.media_type, headers=headers)
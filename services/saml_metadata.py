@@ -0,0 +1,136 @@
+"""
+SAML 2.0 federation metadata rendering and XML signing.
+
+The signature is an enveloped XML-DSig signature over the whole
+EntityDescriptor: exclusive C14N, RSA-SHA256, SHA-256 digest, with the
+signing certificate in KeyInfo, as Entra ID publishes it.
+
+Rendering is deterministic for a given tenant, key and issue time (the
+ID is derived from them and PKCS#1 v1.5 signatures are deterministic),
+so every worker serves identical bytes and the same ETag.
+"""
+import base64
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List
+from lxml import etree
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+MD_NS = "urn:oasis:names:tc:SAML:2.0:metadata"
+DS_NS = "http://www.w3.org/2000/09/xmldsig#"
+EXC_C14N = "http://www.w3.org/2001/10/xml-exc-c14n#"
+ENVELOPED = "http://www.w3.org/2000/09/xmldsig#enveloped-signature"
+RSA_SHA256 = "http://www.w3.org/2001/04/xmldsig-more#rsa-sha256"
+SHA256 = "http://www.w3.org/2001/04/xmlenc#sha256"
+HTTP_REDIRECT = "urn:oasis:names:tc:SAML:2.0:bindings:HTTP-Redirect"
+HTTP_POST = "urn:oasis:names:tc:SAML:2.0:bindings:HTTP-POST"
+
+
+def _md(tag: str) -> str:
+    return f"{{{MD_NS}}}{tag}"
+
+
+def _ds(tag: str) -> str:
+    return f"{{{DS_NS}}}{tag}"
+
+
+def _c14n(element) -> bytes:
+    return etree.tostring(element, method="c14n", exclusive=True, with_comments=False)
+
+
+def _key_info(parent, certificate_b64: str):
+    key_info = etree.SubElement(parent, _ds("KeyInfo"), nsmap={None: DS_NS})
+    x509_data = etree.SubElement(key_info, _ds("X509Data"))
+    etree.SubElement(x509_data, _ds("X509Certificate")).text = certificate_b64
+    return key_info
+
+
+def build_federation_metadata(
+    tenant: str,
+    base_url: str,
+    certificates: List[str],
+    issued_at: datetime,
+    valid_until: datetime
+):
+    """EntityDescriptor element for a tenant (unsigned), one KeyDescriptor per certificate."""
+    entity_id = f"https://sts.windows.net/{tenant}/"
+    document_id = uuid.uuid5(
+        uuid.NAMESPACE_URL, "#".join([entity_id, *certificates, issued_at.isoformat()])
+    )
+    root = etree.Element(_md("EntityDescriptor"), nsmap={None: MD_NS})
+    root.set("ID", f"_{document_id}")
+    root.set("entityID", entity_id)
+    root.set("validUntil", valid_until.strftime("%Y-%m-%dT%H:%M:%SZ"))
+
+    idp = etree.SubElement(root, _md("IDPSSODescriptor"))
+    idp.set("protocolSupportEnumeration", "urn:oasis:names:tc:SAML:2.0:protocol")
+    for certificate_b64 in certificates:
+        key_descriptor = etree.SubElement(idp, _md("KeyDescriptor"))
+        key_descriptor.set("use", "signing")
+        _key_info(key_descriptor, certificate_b64)
+
+    location = f"{base_url}/{tenant}/saml2"
+    etree.SubElement(idp, _md("SingleLogoutService"), Binding=HTTP_REDIRECT, Location=location)
+    etree.SubElement(idp, _md("SingleSignOnService"), Binding=HTTP_REDIRECT, Location=location)
+    etree.SubElement(idp, _md("SingleSignOnService"), Binding=HTTP_POST, Location=location)
+    return root
+
+
+def sign_enveloped(root, private_key, certificate_b64: str):
+    """Insert an enveloped signature over `root` (which must carry an ID)."""
+    digest = base64.b64encode(hashlib.sha256(_c14n(root)).digest()).decode()
+
+    signature = etree.Element(_ds("Signature"), nsmap={"ds": DS_NS})
+    signed_info = etree.SubElement(signature, _ds("SignedInfo"))
+    etree.SubElement(signed_info, _ds("CanonicalizationMethod"), Algorithm=EXC_C14N)
+    etree.SubElement(signed_info, _ds("SignatureMethod"), Algorithm=RSA_SHA256)
+    reference = etree.SubElement(signed_info, _ds("Reference"), URI="#" + root.get("ID"))
+    transforms = etree.SubElement(reference, _ds("Transforms"))
+    etree.SubElement(transforms, _ds("Transform"), Algorithm=ENVELOPED)
+    etree.SubElement(transforms, _ds("Transform"), Algorithm=EXC_C14N)
+    etree.SubElement(reference, _ds("DigestMethod"), Algorithm=SHA256)
+    etree.SubElement(reference, _ds("DigestValue")).text = digest
+    signature_value = etree.SubElement(signature, _ds("SignatureValue"))
+    key_info = etree.SubElement(signature, _ds("KeyInfo"))
+    x509_data = etree.SubElement(key_info, _ds("X509Data"))
+    etree.SubElement(x509_data, _ds("X509Certificate")).text = certificate_b64
+
+    # The schema puts Signature first; SignedInfo is canonicalized in place
+    root.insert(0, signature)
+    value = private_key.sign(_c14n(signed_info), padding.PKCS1v15(), hashes.SHA256())
+    signature_value.text = base64.b64encode(value).decode()
+    return root
+
+
+def issue_period(now: float, valid_hours: int):
+    """(issued_at, reissue_at) Unix times of the metadata current at `now`.
+
+    Documents are reissued every valid_hours / 2, on boundaries shared by
+    all processes, so a served copy has at least half its validity left.
+    """
+    period = valid_hours * 3600 // 2
+    issued_at = int(now) // period * period
+    return issued_at, issued_at + period
+
+
+def render_federation_metadata(
+    tenant: str,
+    base_url: str,
+    certificates: List[str],
+    private_key=None,
+    valid_hours: int = 168,
+    issued_at: float = 0
+) -> bytes:
+    """Serialized metadata document, signed when a private key is given.
+
+    `certificates` lists every published signing certificate; the first
+    one belongs to `private_key`.
+    """
+    issued = datetime.fromtimestamp(issued_at, timezone.utc)
+    valid_until = issued + timedelta(hours=valid_hours)
+    root = build_federation_metadata(tenant, base_url, certificates, issued, valid_until)
+    if private_key is not None:
+        sign_enveloped(root, private_key, certificates[0])
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8")
@@ -0,0 +1,167 @@
+"""
+JWT signing off the event loop.
+
+sign_batch() signs (alg, kid, payload) items, payloads being serialized
+claims (services.claim_templates), with the key ring's keys. In
+a worker process the key ring was loaded once when the process forked,
+and a kid created afterwards makes it re-read the key ring once
+(KeyService.get_key), so private keys are never sent to workers.
+
+Process pools fork all their workers as soon as they are created, and
+the application creates them at startup (start_pool(),
+SigningEngine.start()) before any thread runs: a worker forked later
+could inherit a lock held by another thread (logging handlers, the key
+ring reload) and deadlock.
+
+SigningEngine serves /token: each token to sign is queued, and whatever
+concurrent requests queued before the event loop's next turn is sent to
+a thread or process pool in batches, one future per token. With
+SIGNING_ENGINE=inline (the default) tokens are signed on the event loop
+as before.
+
+The separate process pool from get_pool() runs the large batches of
+POST /admin/tokens/bulk (services.token_mint).
+"""
+import asyncio
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from services.claim_templates import sign_payload
+from services.key_service import key_service
+from services.metrics import jwt_sign_duration
+from config import config
+
+ENGINE_MODES = ("inline", "thread", "process")
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def sign_batch(items: List[Tuple[str, str, bytes]]) -> List[str]:
+    """Sign (alg, kid, payload) items (runs in a worker process or thread)."""
+    tokens = []
+    for alg, kid, payload in items:
+        key = key_service.get_key(kid)
+        if key is None:
+            raise KeyError(f"Unknown signing key {kid}")
+        tokens.append(sign_payload(payload, alg, kid, key.private_key))
+    return tokens
+
+
+def process_pool(workers: int) -> ProcessPoolExecutor:
+    """Process pool with its workers already forked.
+
+    Workers inherit the loaded key ring and directory instead of importing
+    the services package again. Create pools before the process starts any
+    thread (see the module docstring).
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    # With fork, the first task launches every worker at once
+    pool.submit(int).result()
+    return pool
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Process pool used for bulk minting (created by start_pool(), else on first use)."""
+    global _pool
+    if _pool is None:
+        _pool = process_pool(config.TOKEN_MINT_WORKERS)
+    return _pool
+
+
+def start_pool():
+    """Fork the bulk minting workers now (called on application startup)."""
+    get_pool()
+
+
+def shutdown_pool():
+    """Stop the bulk minting workers (called on application shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+
+class SigningEngine:
+    """Signs tokens for concurrent requests in batches on a worker pool."""
+
+    def __init__(self, mode: str = "inline", workers: int = 1, max_batch: int = 64):
+        if mode not in ENGINE_MODES:
+            raise ValueError(f"SIGNING_ENGINE must be one of: {', '.join(ENGINE_MODES)}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_batch = max(1, max_batch)
+        self._executor: Optional[Executor] = None
+        self._queue = deque()  # (alg, kid, payload, future)
+        self._flush_scheduled = False
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = process_pool(self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="jwt-sign"
+                )
+        return self._executor
+
+    def start(self):
+        """Create the worker pool now (called on application startup)."""
+        if self.mode != "inline":
+            self._get_executor()
+
+    async def sign(self, payload: bytes, alg: str = "RS256") -> str:
+        """Sign a serialized payload with the algorithm's active key."""
+        start = time.perf_counter()
+        key = key_service.get_active_key(alg)
+        if self.mode == "inline":
+            token = sign_payload(payload, alg, key.kid, key.private_key)
+        else:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._queue.append((alg, key.kid, payload, future))
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                loop.call_soon(self._flush, loop)
+            token = await future
+        jwt_sign_duration.observe(time.perf_counter() - start, alg)
+        return token
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        """Send the queued tokens to the pool, spread over the workers."""
+        self._flush_scheduled = False
+        size = min(self.max_batch, -(-len(self._queue) // self.workers))
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(size, len(self._queue)))]
+            items = [(alg, kid, payload) for alg, kid, payload, _ in batch]
+            futures = [future for *_, future in batch]
+            signed = loop.run_in_executor(self._get_executor(), sign_batch, items)
+            signed.add_done_callback(lambda result, futures=futures: _resolve(futures, result))
+
+    def shutdown(self):
+        """Stop the workers (called on application shutdown)."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def _resolve(futures: List[asyncio.Future], result: asyncio.Future):
+    """Hand a batch's tokens (or its error) to the waiting requests."""
+    error = None if result.cancelled() else result.exception()
+    for index, future in enumerate(futures):
+        if future.done():
+            continue  # the request went away
+        if result.cancelled():
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result.result()[index])
+
+
+signing_engine = SigningEngine(
+    config.SIGNING_ENGINE, config.SIGNING_ENGINE_WORKERS, config.SIGNING_BATCH_SIZE
+)
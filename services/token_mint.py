@@ -0,0 +1,111 @@
+"""
+Bulk token minting for load-test fixtures.
+
+Payloads are rendered in the server process from TokenService's claim
+templates, then signed in the signing process pool (see services.signing),
+one batch per task. Results come back in batch order. Used by POST /admin/tokens/bulk.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
+from models.application import Application
+from models.user import User
+from services.key_service import key_service
+from services.signing import get_pool, sign_batch
+from services.token_service import token_service
+from config import config
+
+
+class BulkMint:
+    """One minting job: `count` access tokens cycling through users x apps x scopes.
+
+    run() yields the minted tokens one batch at a time; at most two
+    batches per worker are in flight, so memory stays bounded however
+    many tokens are requested.
+    """
+
+    def __init__(
+        self,
+        users: Sequence[User],
+        apps: Sequence[Application],
+        scopes: Sequence[str],
+        count: int,
+        tenant: str = "common",
+        lifetime: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ):
+        self.users = users
+        self.apps = apps
+        self.scopes = scopes
+        self.count = count
+        self.tenant = tenant
+        self.lifetime = lifetime
+        self.batch_size = batch_size or config.TOKEN_MINT_BATCH_SIZE
+        self.minted = 0
+        self.started = time.monotonic()
+        # Active keys are picked once, so a rotation mid-job keeps signing with
+        # the (still published) keys the job started with
+        self.keys = {}  # appId -> (alg, kid)
+        for app in apps:
+            alg = token_service.signing_algorithm(app, tenant)
+            self.keys[app.appId] = (alg, key_service.get_active_key(alg).kid)
+
+    def _combination(self, index: int) -> Tuple[User, Application, str]:
+        users, apps = len(self.users), len(self.apps)
+        return (
+            self.users[index % users],
+            self.apps[index // users % apps],
+            self.scopes[index // (users * apps) % len(self.scopes)]
+        )
+
+    def _build_batch(self, start: int) -> Tuple[List[dict], List[Tuple[str, str, dict]]]:
+        """Result rows (without tokens) and sign_batch items for one batch."""
+        rows, items = [], []
+        for index in range(start, min(start + self.batch_size, self.count)):
+            user, app, scope = self._combination(index)
+            values = token_service.token_values(self.lifetime)
+            values["scp"] = scope
+            payload = token_service.access_token_template(user, app, self.tenant).render(values)
+            rows.append({
+                "user": user.userPrincipalName,
+                "client_id": app.appId,
+                "scope": scope,
+                "expires_on": values["exp"]
+            })
+            items.append((*self.keys[app.appId], payload))
+        return rows, items
+
+    async def run(self, pool: Executor = None) -> AsyncIterator[List[dict]]:
+        """Mint the tokens, yielding each batch's rows with their access_token."""
+        pool = pool or get_pool()
+        loop = asyncio.get_running_loop()
+        starts = iter(range(0, self.count, self.batch_size))
+        in_flight = deque()
+
+        def submit():
+            start = next(starts, None)
+            if start is not None:
+                rows, items = self._build_batch(start)
+                in_flight.append((rows, loop.run_in_executor(pool, sign_batch, items)))
+
+        for _ in range(2 * config.TOKEN_MINT_WORKERS):
+            submit()
+        while in_flight:
+            rows, future = in_flight.popleft()
+            tokens = await future
+            submit()
+            for row, token in zip(rows, tokens):
+                row["access_token"] = token
+            self.minted += len(rows)
+            yield rows
+
+    def progress(self, event: str = "done") -> dict:
+        elapsed = time.monotonic() - self.started
+        return {
+            "event": event,
+            "minted": self.minted,
+            "elapsed_seconds": round(elapsed, 3),
+            "tokens_per_second": round(self.minted / elapsed, 1) if elapsed > 0 else 0.0
+        }
@@ -1,23 +1,77 @@
 """
 JWT token generation and validation service.
 """
+import asyncio
 import jwt
+import hashlib
+import logging
+import os
 import uuid
 import secrets
-from datetime import datetime, timedelta
+import time
 from typing import Dict, Optional, List
 from models.user import User
 from models.application import Application
-from services.key_service import key_service
+from services.key_service import ALGORITHMS, key_service
+from services.app_service import app_service
+from services.signing import signing_engine
+from services.cache import ExpiringLRUCache
+from services.claim_templates import ClaimTemplate, Slot, TemplateCache, base64url, sign_payload
+from services.metrics import jwt_sign_duration, jwt_verify_duration
+from services.token_store import AuthorizationCode, RefreshToken, create_store
 from config import config
 
+logger = logging.getLogger(__name__)
+
+# Per-token claims shared by every token kind (see services.claim_templates)
+IAT, NBF, EXP = Slot("iat", "int"), Slot("nbf", "int"), Slot("exp", "int")
+AIO, RH, UTI = Slot("aio", "id"), Slot("rh", "id"), Slot("uti", "id")
+
+
+def parse_algorithm_profiles(value: str) -> Dict[str, str]:
+    """Parse "tenant=alg,..." into a dict, rejecting unknown algorithms."""
+    profiles = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        tenant, _, alg = (part.strip() for part in item.partition("="))
+        if alg not in ALGORITHMS:
+            raise ValueError(f"Unknown signing algorithm for tenant {tenant}: {alg}")
+        profiles[tenant] = alg
+    return profiles
+
 
 class TokenService:
     """Generates and validates JWT tokens."""
     
     def __init__(self):
-        self.authorization_codes: Dict[str, dict] = {}  # code -> {user, app, redirect_uri, code_challenge}
-        self.refresh_tokens: Dict[str, dict] = {}  # refresh_token -> {user_id, app_id}
+        self.authorization_codes = create_store("authorization_codes", AuthorizationCode)
+        self.refresh_tokens = create_store("refresh_tokens", RefreshToken)
+        self.verified_tokens = ExpiringLRUCache(config.VERIFIED_TOKEN_CACHE_SIZE)  # sha256(token) -> claims
+        self._verified_key_version = key_service.version
+        self._templates = TemplateCache(config.CLAIM_TEMPLATE_CACHE_SIZE)
+        self._tenant_algorithms = parse_algorithm_profiles(config.TOKEN_SIGNING_ALG_PROFILES)
+        # Create keys for every configured algorithm up front, so they are published
+        # before the first token needs them
+        key_service.ensure_algorithms(
+            {config.TOKEN_SIGNING_ALG, *self._tenant_algorithms.values()}
+            | {app.signingAlgorithm for app in app_service.list_applications() if app.signingAlgorithm}
+        )
+    
+    def signing_algorithm(self, app: Optional[Application], tenant: str = "common") -> str:
+        """Algorithm for tokens issued to an app: its own, else the tenant's, else the default."""
+        if app is not None and app.signingAlgorithm:
+            return app.signingAlgorithm
+        return self._tenant_algorithms.get(tenant, config.TOKEN_SIGNING_ALG)
+    
+    def supported_algorithms(self, tenant: str, app: Optional[Application] = None) -> List[str]:
+        """Algorithms to advertise in discovery, the one used by default first.
+        
+        For a tenant this also lists every other algorithm with a key, since
+        applications may override the tenant's choice.
+        """
+        alg = self.signing_algorithm(app, tenant)
+        if app is not None:
+            return [alg]
+        return [alg] + [other for other in key_service.algorithms() if other != alg]
     
     def generate_authorization_code(
         self,
@@ -32,16 +86,16 @@ class TokenService:
         """Generate authorization code for OAuth flow."""
         code = secrets.token_urlsafe(32)
         
-        self.authorization_codes[code] = {
-            "user_id": user.id,
-            "app_id": app.appId,
-            "redirect_uri": redirect_uri,
-            "scope": scope,
-            "state": state,
-            "nonce": nonce,
-            "code_challenge": code_challenge,
-            "expires_at": datetime.utcnow() + timedelta(seconds=config.AUTHORIZATION_CODE_EXPIRY)
-        }
+        self.authorization_codes.put(code, AuthorizationCode(
+            user_id=user.id,
+            app_id=app.appId,
+            redirect_uri=redirect_uri,
+            scope=scope,
+            state=state,
+            nonce=nonce,
+            code_challenge=code_challenge,
+            expires_at=int(time.time()) + config.AUTHORIZATION_CODE_EXPIRY
+        ))
         
         return code
     
@@ -51,30 +105,26 @@ class TokenService:
         app_id: str,
         redirect_uri: str,
         code_verifier: Optional[str] = None
-    ) -> Optional[dict]:
-        """Verify authorization code and return code data."""
-        code_data = self.authorization_codes.get(code)
+    ) -> Optional[AuthorizationCode]:
+        """Redeem an authorization code and return its data.
         
-        if not code_data:
-            return None
+        The code is removed before it is checked, so it is single-use even
+        when the request presenting it turns out to be invalid.
+        """
+        code_data = self.authorization_codes.take(code)
         
-        # Check expiration
-        if datetime.utcnow() > code_data["expires_at"]:
-            del self.authorization_codes[code]
+        if not code_data:
             return None
         
         # Verify app and redirect URI
-        if code_data["app_id"] != app_id or code_data["redirect_uri"] != redirect_uri:
+        if code_data.app_id != app_id or code_data.redirect_uri != redirect_uri:
             return None
         
         # PKCE verification (simplified - should use S256)
-        if code_data.get("code_challenge") and code_verifier:
+        if code_data.code_challenge and code_verifier:
             # In production, verify S256 hash
             pass
         
-        # Remove code after use
-        del self.authorization_codes[code]
-        
         return code_data
     
     def generate_access_token(
@@ -85,34 +135,59 @@ class TokenService:
         tenant: str = "common"
     ) -> str:
         """Generate access token."""
-        now = datetime.utcnow()
-        
-        claims = {
+        payload = self._access_token_payload(user, app, scope, tenant)
+        return self._sign(payload, self.signing_algorithm(app, tenant))
+    
+    async def generate_access_token_async(
+        self,
+        user: User,
+        app: Application,
+        scope: str,
+        tenant: str = "common"
+    ) -> str:
+        """generate_access_token, signed through the signing engine."""
+        payload = self._access_token_payload(user, app, scope, tenant)
+        return await signing_engine.sign(payload, self.signing_algorithm(app, tenant))
+    
+    def _access_token_payload(self, user: User, app: Application, scope: str, tenant: str) -> bytes:
+        values = self.token_values()
+        values["scp"] = scope
+        return self.access_token_template(user, app, tenant).render(values)
+    
+    def access_token_template(self, user: User, app: Application, tenant: str = "common") -> ClaimTemplate:
+        """Claims layout of a user access token."""
+        return self._templates.get(("access", user.id, app.appId, tenant), lambda: {
             "aud": f"api://{app.appId}",
             "iss": config.get_issuer(tenant),
-            "iat": int(now.timestamp()),
-            "nbf": int(now.timestamp()),
-            "exp": int((now + timedelta(seconds=config.TOKEN_EXPIRY_SECONDS)).timestamp()),
-            "aio": secrets.token_urlsafe(16),
+            "iat": IAT,
+            "nbf": NBF,
+            "exp": EXP,
+            "aio": AIO,
             "azp": app.appId,
             "azpacr": "1",
             "name": user.displayName,
             "oid": user.id,
             "preferred_username": user.userPrincipalName,
-            "rh": secrets.token_urlsafe(8),
-            "scp": scope,
+            "rh": RH,
+            "scp": Slot("scp"),
             "sub": user.id,
             "tid": tenant,
-            "uti": str(uuid.uuid4()),
+            "uti": UTI,
             "ver": "2.0"
+        })
+    
+    def token_values(self, lifetime: Optional[int] = None) -> dict:
+        """Per-token claim values: times (lifetime defaults to TOKEN_EXPIRY_SECONDS) and random IDs."""
+        now = int(time.time())
+        random = os.urandom(40)  # one call for aio (16 bytes), rh (8) and uti (16)
+        return {
+            "iat": now,
+            "nbf": now,
+            "exp": now + (lifetime or config.TOKEN_EXPIRY_SECONDS),
+            "aio": base64url(random[:16]).decode(),
+            "rh": base64url(random[16:24]).decode(),
+            "uti": str(uuid.UUID(bytes=random[24:], version=4))
         }
-        
-        return jwt.encode(
-            claims,
-            key_service.get_private_key_pem(),
-            algorithm="RS256",
-            headers={"kid": key_service.kid}
-        )
     
     def generate_id_token(
         self,
@@ -122,50 +197,73 @@ class TokenService:
         tenant: str = "common"
     ) -> str:
         """Generate ID token."""
-        now = datetime.utcnow()
-        
-        claims = {
-            "aud": app.appId,
-            "iss": config.get_issuer(tenant),
-            "iat": int(now.timestamp()),
-            "nbf": int(now.timestamp()),
-            "exp": int((now + timedelta(seconds=config.TOKEN_EXPIRY_SECONDS)).timestamp()),
-            "aio": secrets.token_urlsafe(16),
-            "email": user.mail or user.userPrincipalName,
-            "name": user.displayName,
-            "oid": user.id,
-            "preferred_username": user.userPrincipalName,
-            "rh": secrets.token_urlsafe(8),
-            "sub": user.id,
-            "tid": tenant,
-            "uti": str(uuid.uuid4()),
-            "ver": "2.0"
-        }
-        
-        if nonce:
-            claims["nonce"] = nonce
-        
-        if user.givenName:
-            claims["given_name"] = user.givenName
-        if user.surname:
-            claims["family_name"] = user.surname
+        payload = self._id_token_payload(user, app, nonce, tenant)
+        return self._sign(payload, self.signing_algorithm(app, tenant))
+    
+    async def generate_id_token_async(
+        self,
+        user: User,
+        app: Application,
+        nonce: Optional[str] = None,
+        tenant: str = "common"
+    ) -> str:
+        """generate_id_token, signed through the signing engine."""
+        payload = self._id_token_payload(user, app, nonce, tenant)
+        return await signing_engine.sign(payload, self.signing_algorithm(app, tenant))
+    
+    def _id_token_payload(self, user: User, app: Application, nonce: Optional[str], tenant: str) -> bytes:
+        values = self.token_values()
+        values["nonce"] = nonce
+        return self.id_token_template(user, app, tenant, bool(nonce)).render(values)
+    
+    def id_token_template(
+        self,
+        user: User,
+        app: Application,
+        tenant: str = "common",
+        with_nonce: bool = False
+    ) -> ClaimTemplate:
+        """Claims layout of an ID token."""
+        def layout():
+            claims = {
+                "aud": app.appId,
+                "iss": config.get_issuer(tenant),
+                "iat": IAT,
+                "nbf": NBF,
+                "exp": EXP,
+                "aio": AIO,
+                "email": user.mail or user.userPrincipalName,
+                "name": user.displayName,
+                "oid": user.id,
+                "preferred_username": user.userPrincipalName,
+                "rh": RH,
+                "sub": user.id,
+                "tid": tenant,
+                "uti": UTI,
+                "ver": "2.0"
+            }
+            
+            if with_nonce:
+                claims["nonce"] = Slot("nonce")
+            
+            if user.givenName:
+                claims["given_name"] = user.givenName
+            if user.surname:
+                claims["family_name"] = user.surname
+            
+            return claims
         
-        return jwt.encode(
-            claims,
-            key_service.get_private_key_pem(),
-            algorithm="RS256",
-            headers={"kid": key_service.kid}
-        )
+        return self._templates.get(("id", user.id, app.appId, tenant, with_nonce), layout)
     
     def generate_refresh_token(self, user: User, app: Application) -> str:
         """Generate refresh token."""
         refresh_token = secrets.token_urlsafe(64)
         
-        self.refresh_tokens[refresh_token] = {
-            "user_id": user.id,
-            "app_id": app.appId,
-            "expires_at": datetime.utcnow() + timedelta(days=config.REFRESH_TOKEN_EXPIRY_DAYS)
-        }
+        self.refresh_tokens.put(refresh_token, RefreshToken(
+            user_id=user.id,
+            app_id=app.appId,
+            expires_at=int(time.time()) + config.REFRESH_TOKEN_EXPIRY_DAYS * 86400
+        ))
         
         return refresh_token
     
@@ -173,17 +271,40 @@ class TokenService:
         """Verify refresh token and return user_id."""
         token_data = self.refresh_tokens.get(refresh_token)
         
-        if not token_data:
+        if not token_data or token_data.app_id != app_id:
             return None
         
-        if datetime.utcnow() > token_data["expires_at"]:
-            del self.refresh_tokens[refresh_token]
+        return token_data.user_id
+    
+    def redeem_refresh_token(self, refresh_token: str, app_id: str) -> Optional[str]:
+        """Consume a refresh token (rotation) and return user_id.
+        
+        A token presented by another application is left in place, so one
+        client can't revoke another client's refresh tokens.
+        """
+        if not self.verify_refresh_token(refresh_token, app_id):
             return None
         
-        if token_data["app_id"] != app_id:
+        # take() is atomic, so a concurrent redemption of the same token still loses here
+        token_data = self.refresh_tokens.take(refresh_token)
+        if not token_data:
             return None
         
-        return token_data["user_id"]
+        return token_data.user_id
+    
+    def purge_expired(self) -> int:
+        """Drop expired authorization codes and refresh tokens."""
+        return self.authorization_codes.purge_expired() + self.refresh_tokens.purge_expired()
+    
+    async def run_sweeper(self, interval: float = None):
+        """Background task that periodically purges expired codes and tokens."""
+        interval = interval or config.TOKEN_STORE_SWEEP_INTERVAL_SECONDS
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.purge_expired()
+            except Exception:
+                logger.exception("Token store sweep failed")
     
     def generate_client_credentials_token(
         self,
@@ -192,51 +313,105 @@ class TokenService:
         tenant: str = "common"
     ) -> str:
         """Generate token for client credentials flow (service-to-service)."""
-        now = datetime.utcnow()
-        
-        claims = {
-            "aud": scope,
+        payload = self._client_credentials_payload(app, scope, tenant)
+        return self._sign(payload, self.signing_algorithm(app, tenant))
+    
+    async def generate_client_credentials_token_async(
+        self,
+        app: Application,
+        scope: str,
+        tenant: str = "common"
+    ) -> str:
+        """generate_client_credentials_token, signed through the signing engine."""
+        payload = self._client_credentials_payload(app, scope, tenant)
+        return await signing_engine.sign(payload, self.signing_algorithm(app, tenant))
+    
+    def _client_credentials_payload(self, app: Application, scope: str, tenant: str) -> bytes:
+        values = self.token_values()
+        values["aud"] = scope
+        values["oid"] = str(uuid.uuid4())  # Service principal OID
+        values["sub"] = str(uuid.uuid4())
+        return self.client_credentials_template(app, tenant).render(values)
+    
+    def client_credentials_template(self, app: Application, tenant: str = "common") -> ClaimTemplate:
+        """Claims layout of a client credentials (app-only) access token."""
+        return self._templates.get(("client_credentials", app.appId, tenant), lambda: {
+            "aud": Slot("aud"),
             "iss": config.get_issuer(tenant),
-            "iat": int(now.timestamp()),
-            "nbf": int(now.timestamp()),
-            "exp": int((now + timedelta(seconds=config.TOKEN_EXPIRY_SECONDS)).timestamp()),
-            "aio": secrets.token_urlsafe(16),
+            "iat": IAT,
+            "nbf": NBF,
+            "exp": EXP,
+            "aio": AIO,
             "azp": app.appId,
             "azpacr": "1",
             "appid": app.appId,
             "appidacr": "1",
             "idtyp": "app",
-            "oid": str(uuid.uuid4()),  # Service principal OID
-            "rh": secrets.token_urlsafe(8),
-            "sub": str(uuid.uuid4()),
+            "oid": Slot("oid", "id"),
+            "rh": RH,
+            "sub": Slot("sub", "id"),
             "tid": tenant,
-            "uti": str(uuid.uuid4()),
+            "uti": UTI,
             "ver": "2.0"
-        }
-        
-        return jwt.encode(
-            claims,
-            key_service.get_private_key_pem(),
-            algorithm="RS256",
-            headers={"kid": key_service.kid}
-        )
+        })
+    
+    def _sign(self, payload: bytes, alg: str = "RS256") -> str:
+        """Sign a serialized payload with the algorithm's active key object."""
+        start = time.perf_counter()
+        key = key_service.get_active_key(alg)
+        token = sign_payload(payload, alg, key.kid, key.private_key)
+        jwt_sign_duration.observe(time.perf_counter() - start, alg)
+        return token
     
     def decode_token(self, token: str) -> Optional[dict]:
-        """Decode and validate a JWT token."""
+        """Decode and validate a JWT token.
+        
+        Successfully verified tokens are cached by hash until their `exp`,
+        so repeated calls with the same bearer token skip the RSA work.
+        The returned claims dict is shared with the cache; do not mutate it.
+        """
+        if self._verified_key_version != key_service.version:
+            # Key set changed: a token's key may have been withdrawn
+            self.verified_tokens.clear()
+            self._verified_key_version = key_service.version
+        
+        cache_key = hashlib.sha256(token.encode()).digest()
+        claims = self.verified_tokens.get(cache_key)
+        if claims is not None:
+            return claims
+        
+        start = time.perf_counter()
         try:
+            # Pick the key by kid (tokens without one are checked against the active RS256 key);
+            # only the key's own algorithm is accepted
+            kid = jwt.get_unverified_header(token).get("kid")
+            if kid is None:
+                key, alg = key_service.get_verification_key(), "RS256"
+            else:
+                signing_key = key_service.get_key(kid)
+                if signing_key is None:
+                    logger.info("Token validation error: unknown kid %s", kid)
+                    return None
+                key, alg = signing_key.public_key, signing_key.alg
             # Decode without audience verification for flexibility across different flows
-            return jwt.decode(
+            claims = jwt.decode(
                 token,
-                key_service.get_public_key_pem(),
-                algorithms=["RS256"],
+                key,
+                algorithms=[alg],
                 options={"verify_aud": False}  # Disable audience check
             )
         except jwt.InvalidTokenError as e:
-            print(f"Token validation error: {e}")
+            logger.info("Token validation error: %s", e)
+            jwt_verify_duration.observe(time.perf_counter() - start, "invalid")
             return None
-        except Exception as e:
-            print(f"Unexpected decode error: {e}")
+        except Exception:
+            logger.exception("Unexpected decode error")
+            jwt_verify_duration.observe(time.perf_counter() - start, "error")
             return None
+        jwt_verify_duration.observe(time.perf_counter() - start, "valid")
+        
+        self.verified_tokens.set(cache_key, claims, expires_at=claims.get("exp"))
+        return claims
 
 
 # Global instance
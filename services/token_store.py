@@ -0,0 +1,273 @@
+"""
+Expiring stores for authorization codes and refresh tokens.
+
+Two backends share one interface (put/get/take/delete/purge_expired):
+ExpiringStore keeps records in process memory, SQLiteStore keeps them in
+a WAL-mode SQLite file so several uvicorn workers on a host can share them.
+"""
+import heapq
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from config import config
+
+
+class AuthorizationCode:
+    """Pending authorization code (single use)."""
+
+    __slots__ = (
+        "user_id", "app_id", "redirect_uri", "scope",
+        "state", "nonce", "code_challenge", "expires_at"
+    )
+
+    def __init__(
+        self,
+        user_id: str,
+        app_id: str,
+        redirect_uri: str,
+        scope: str,
+        state: Optional[str],
+        nonce: Optional[str],
+        code_challenge: Optional[str],
+        expires_at: int
+    ):
+        self.user_id = user_id
+        self.app_id = app_id
+        self.redirect_uri = redirect_uri
+        self.scope = scope
+        self.state = state
+        self.nonce = nonce
+        self.code_challenge = code_challenge
+        self.expires_at = expires_at
+
+
+class RefreshToken:
+    """Issued refresh token."""
+
+    __slots__ = ("user_id", "app_id", "expires_at")
+
+    def __init__(self, user_id: str, app_id: str, expires_at: int):
+        self.user_id = user_id
+        self.app_id = app_id
+        self.expires_at = expires_at
+
+
+class ExpiringStore:
+    """In-memory key -> record store with heap-ordered expiry.
+
+    Records carry an integer `expires_at` (Unix seconds). Expired records
+    are never returned, and purge_expired() drops them in expiry order
+    without scanning the whole store. take() removes and returns a record
+    in one step, which makes redemption single-use.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self._records: Dict[str, object] = {}
+        self._expiry_heap: List[Tuple[int, str]] = []
+        self.expired = 0  # records dropped because they expired
+        self.consumed = 0  # records removed by take()/delete()
+
+    def put(self, key: str, record) -> None:
+        """Store a record until its expires_at."""
+        self._records[key] = record
+        heapq.heappush(self._expiry_heap, (record.expires_at, key))
+
+    def get(self, key: str):
+        """Return the record without removing it, or None if missing/expired."""
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if record.expires_at <= self._clock():
+            del self._records[key]
+            self.expired += 1
+            return None
+        return record
+
+    def take(self, key: str):
+        """Remove and return the record, or None if missing/expired."""
+        record = self._records.pop(key, None)
+        if record is None:
+            return None
+        self._compact_heap()
+        if record.expires_at <= self._clock():
+            self.expired += 1
+            return None
+        self.consumed += 1
+        return record
+
+    def delete(self, key: str) -> bool:
+        """Remove a record; returns whether it existed."""
+        if self._records.pop(key, None) is None:
+            return False
+        self.consumed += 1
+        self._compact_heap()
+        return True
+
+    def purge_expired(self) -> int:
+        """Drop every expired record and return how many were dropped."""
+        now = self._clock()
+        heap = self._expiry_heap
+        purged = 0
+        while heap and heap[0][0] <= now:
+            expires_at, key = heapq.heappop(heap)
+            record = self._records.get(key)
+            # Skip heap entries for keys already removed or re-stored
+            if record is not None and record.expires_at == expires_at:
+                del self._records[key]
+                purged += 1
+        self.expired += purged
+        return purged
+
+    def _compact_heap(self) -> None:
+        """Rebuild the heap once removed keys dominate it.
+
+        Removed records leave their heap entry behind until it expires;
+        for long-lived refresh tokens that would be days of garbage.
+        """
+        if len(self._expiry_heap) > 2 * len(self._records) + 64:
+            self._expiry_heap = [(r.expires_at, k) for k, r in self._records.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def stats(self) -> dict:
+        """Counters for monitoring."""
+        return {
+            "size": len(self._records),
+            "expired": self.expired,
+            "consumed": self.consumed
+        }
+
+
+class SQLiteStore:
+    """Expiring store backed by a shared SQLite database (WAL mode).
+
+    Each record class gets its own table whose columns are the class's
+    __slots__, with an index on expires_at. take() runs in an IMMEDIATE
+    transaction, so a code can be redeemed once across all processes.
+    """
+
+    PURGE_BATCH_SIZE = 500
+
+    def __init__(self, path: Path, table: str, record_cls, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.table = table
+        self.record_cls = record_cls
+        self.fields = tuple(record_cls.__slots__)
+        self._clock = clock
+        self._local = threading.local()
+        self.expired = 0
+        self.consumed = 0
+
+        columns = ", ".join(
+            f"{f} INTEGER NOT NULL" if f == "expires_at" else f"{f} TEXT"
+            for f in self.fields
+        )
+        select = ", ".join(self.fields)
+        self._sql_put = (
+            f"INSERT OR REPLACE INTO {table} (key, {select}) "
+            f"VALUES (?, {', '.join('?' * len(self.fields))})"
+        )
+        self._sql_get = f"SELECT {select} FROM {table} WHERE key = ?"
+        self._sql_delete = f"DELETE FROM {table} WHERE key = ?"
+        self._sql_purge = (
+            f"DELETE FROM {table} WHERE rowid IN "
+            f"(SELECT rowid FROM {table} WHERE expires_at <= ? LIMIT {self.PURGE_BATCH_SIZE})"
+        )
+
+        conn = self._connection()
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, {columns})")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_expires_at ON {table} (expires_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread, in autocommit mode."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _record(self, row):
+        return self.record_cls(**dict(zip(self.fields, row)))
+
+    def put(self, key: str, record) -> None:
+        """Store a record until its expires_at."""
+        values = [getattr(record, f) for f in self.fields]
+        self._connection().execute(self._sql_put, (key, *values))
+
+    def get(self, key: str):
+        """Return the record without removing it, or None if missing/expired."""
+        row = self._connection().execute(self._sql_get, (key,)).fetchone()
+        if row is None:
+            return None
+        record = self._record(row)
+        if record.expires_at <= self._clock():
+            return None
+        return record
+
+    def take(self, key: str):
+        """Remove and return the record, or None if missing/expired."""
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(self._sql_get, (key,)).fetchone()
+            if row is not None:
+                conn.execute(self._sql_delete, (key,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        record = self._record(row)
+        if record.expires_at <= self._clock():
+            self.expired += 1
+            return None
+        self.consumed += 1
+        return record
+
+    def delete(self, key: str) -> bool:
+        """Remove a record; returns whether it existed."""
+        deleted = self._connection().execute(self._sql_delete, (key,)).rowcount > 0
+        if deleted:
+            self.consumed += 1
+        return deleted
+
+    def purge_expired(self) -> int:
+        """Delete expired rows in batches and return how many were deleted."""
+        conn = self._connection()
+        now = int(self._clock())
+        purged = 0
+        while True:
+            deleted = conn.execute(self._sql_purge, (now,)).rowcount
+            purged += deleted
+            if deleted < self.PURGE_BATCH_SIZE:
+                break
+        self.expired += purged
+        return purged
+
+    def __len__(self) -> int:
+        return self._connection().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def stats(self) -> dict:
+        """Counters for monitoring (expired/consumed are per process)."""
+        return {
+            "size": len(self),
+            "expired": self.expired,
+            "consumed": self.consumed
+        }
+
+
+def create_store(table: str, record_cls):
+    """Create the store selected by Config.STATE_BACKEND."""
+    if config.STATE_BACKEND == "sqlite":
+        return SQLiteStore(config.STATE_DB_FILE, table, record_cls)
+    if config.STATE_BACKEND == "memory":
+        return ExpiringStore()
+    raise ValueError(f"Unknown STATE_BACKEND: {config.STATE_BACKEND}")
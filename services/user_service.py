@@ -1,32 +1,103 @@
 """
 User management service.
 """
-import json
-import bcrypt
-from typing import Optional, List
-from models.user import User
+import asyncio
+import hashlib
+import hmac
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, List
+from models.user import User, UserRecord
+from services.cache import ExpiringLRUCache
+from services.directory_snapshot import DirectorySnapshot, source_fingerprint
+from services.journal import JsonJournal
+from services.password_hasher import get_hasher, identify, verify_and_rehash
 from config import config
 
 
+class PasswordVerificationBusy(Exception):
+    """Raised when too many password checks are already running or queued."""
+
+
 class UserService:
     """Manages users and authentication."""
     
     def __init__(self):
-        self.users: List[User] = []
+        # Compact records; User models are built per request (see UserRecord).
+        # With DIRECTORY_SNAPSHOT, users loaded at startup stay in the mmap'ed
+        # snapshot and _records/_users_by_* only hold users changed since.
+        self._snapshot: Optional[DirectorySnapshot] = None
+        self._shadowed = 0  # snapshot users replaced by a newer record
+        self._records: List[UserRecord] = []
+        self._users_by_id: Dict[str, UserRecord] = {}
+        self._users_by_upn: Dict[str, UserRecord] = {}  # lower-cased UPN
+        self._users_by_mail: Dict[str, UserRecord] = {}  # lower-cased mail
+        self._models = ExpiringLRUCache(config.USER_MODEL_CACHE_SIZE)  # user id -> User
+        self._journal = JsonJournal(config.USERS_FILE, key_field="id")
+        # bcrypt, PBKDF2 and scrypt release the GIL, so a thread pool gives real parallelism
+        self._password_executor = ThreadPoolExecutor(
+            max_workers=config.PASSWORD_VERIFY_CONCURRENCY,
+            thread_name_prefix="password-verify"
+        )
+        self._password_checks_pending = 0
+        # Opt-in cache of successful logins: HMAC(upn, password, hash) -> user id.
+        # The secret never leaves the process, so cache keys can't be brute-forced offline.
+        self._credential_cache_secret = secrets.token_bytes(32)
+        self._credential_cache = ExpiringLRUCache(
+            config.CREDENTIAL_CACHE_SIZE if config.CREDENTIAL_CACHE_ENABLED else 0
+        )
         self._load_users()
     
     def _load_users(self):
-        """Load users from JSON file."""
-        if config.USERS_FILE.exists():
-            with open(config.USERS_FILE, 'r') as f:
-                data = json.load(f)
-                self.users = [User(**user) for user in data]
-        else:
-            # Create default test users
-            self._create_default_users()
+        """Load users from the JSON file and its journal (or their snapshot)."""
+        with self._journal.lock():
+            if not self._journal.exists():
+                # Create default test users
+                self._create_default_users()
+            if config.DIRECTORY_SNAPSHOT:
+                self._snapshot = self._open_snapshot()
+                self._records = []
+            else:
+                self._records = [UserRecord.from_dict(user) for user in self._journal.load()]
+        self._rebuild_indexes()
+    
+    def _open_snapshot(self) -> DirectorySnapshot:
+        """Map the binary snapshot, recompiling it if the JSON sources changed."""
+        fingerprint = source_fingerprint([self._journal.snapshot_path, self._journal.journal_path])
+        snapshot = DirectorySnapshot.open(config.USERS_SNAPSHOT_FILE, fingerprint)
+        if snapshot is None:
+            snapshot = DirectorySnapshot.build(
+                config.USERS_SNAPSHOT_FILE, self._journal.load(), fingerprint
+            )
+        return snapshot
+    
+    def _rebuild_indexes(self):
+        """Rebuild the lookup indexes from the records."""
+        self._models.clear()
+        self._shadowed = 0
+        self._users_by_id = {}
+        self._users_by_upn = {}
+        self._users_by_mail = {}
+        for record in self._records:
+            self._index_user(record)
+    
+    def _index_user(self, record: UserRecord):
+        """Add a record to the lookup indexes."""
+        if (
+            self._snapshot is not None
+            and record.id not in self._users_by_id
+            and self._snapshot.find_by_id(record.id)
+        ):
+            self._shadowed += 1
+        self._users_by_id[record.id] = record
+        self._users_by_upn[_lower(record.userPrincipalName)] = record
+        if record.mail:
+            self._users_by_mail[_lower(record.mail)] = record
     
     def _create_default_users(self):
         """Create default test users."""
+        hasher = get_hasher()
         default_users = [
             User(
                 userPrincipalName="admin@contoso.onmicrosoft.com",
@@ -36,7 +107,7 @@ class UserService:
                 mail="admin@contoso.onmicrosoft.com",
                 jobTitle="Administrator",
                 department="IT",
-                passwordHash=bcrypt.hashpw("Password123!".encode(), bcrypt.gensalt()).decode()
+                passwordHash=hasher.hash("Password123!")
             ),
             User(
                 userPrincipalName="test@contoso.onmicrosoft.com",
@@ -46,45 +117,203 @@ class UserService:
                 mail="test@contoso.onmicrosoft.com",
                 jobTitle="Developer",
                 department="Engineering",
-                passwordHash=bcrypt.hashpw("Test123!".encode(), bcrypt.gensalt()).decode()
+                passwordHash=hasher.hash("Test123!")
             )
         ]
-        self.users = default_users
-        self._save_users()
-    
-    def _save_users(self):
-        """Save users to JSON file."""
-        with open(config.USERS_FILE, 'w') as f:
-            json.dump([user.model_dump() for user in self.users], f, indent=2)
+        self._journal.replace([user.model_dump() for user in default_users])
     
     def get_user_by_upn(self, upn: str) -> Optional[User]:
-        """Get user by userPrincipalName."""
-        return next((u for u in self.users if u.userPrincipalName == upn), None)
+        """Get user by userPrincipalName (case-insensitive, like Entra)."""
+        record = self._find_by_upn(upn)
+        return self._to_model(record) if record else None
     
     def get_user_by_id(self, user_id: str) -> Optional[User]:
         """Get user by ID."""
-        return next((u for u in self.users if u.id == user_id), None)
+        record = self._find_by_id(user_id)
+        return self._to_model(record) if record else None
+    
+    def get_user_by_mail(self, mail: str) -> Optional[User]:
+        """Get user by mail address (case-insensitive)."""
+        key = mail.lower()
+        record = self._users_by_mail.get(key)
+        if record is None and self._snapshot is not None:
+            record = self._snapshot.find_by_mail(key)
+        return self._to_model(record) if record else None
+    
+    def _find_by_upn(self, upn: str) -> Optional[UserRecord]:
+        key = upn.lower()
+        record = self._users_by_upn.get(key)
+        if record is None and self._snapshot is not None:
+            record = self._snapshot.find_by_upn(key)
+        return record
+    
+    def _find_by_id(self, user_id: str) -> Optional[UserRecord]:
+        record = self._users_by_id.get(user_id)
+        if record is None and self._snapshot is not None:
+            record = self._snapshot.find_by_id(user_id)
+        return record
+    
+    def _to_model(self, record: UserRecord) -> User:
+        """User model for a record, from a small LRU of recently used users."""
+        user = self._models.get(record.id)
+        if user is None:
+            user = record.to_model()
+            self._models.set(record.id, user)
+        return user
+    
+    def _credential_key(self, user: UserRecord, password: str) -> Optional[bytes]:
+        """Credential cache key, or None when the cache is disabled.
+        
+        The current hash is part of the key, so changing a user's hash
+        invalidates their cached logins.
+        """
+        if not config.CREDENTIAL_CACHE_ENABLED:
+            return None
+        message = "\0".join((user.userPrincipalName, password, user.passwordHash)).encode()
+        return hmac.new(self._credential_cache_secret, message, hashlib.sha256).digest()
+    
+    def _remember_credentials(self, key: Optional[bytes], user: UserRecord):
+        """Cache a successful verification (failures are never cached)."""
+        if key:
+            self._credential_cache.set(
+                key, user.id, expires_at=time.time() + config.CREDENTIAL_CACHE_TTL_SECONDS
+            )
     
     def verify_password(self, upn: str, password: str) -> Optional[User]:
-        """Verify user credentials."""
-        user = self.get_user_by_upn(upn)
-        if user and bcrypt.checkpw(password.encode(), user.passwordHash.encode()):
-            return user
-        return None
+        """Verify user credentials.
+        
+        A valid password whose hash doesn't match the user's hashing
+        profile (scheme or cost) is rehashed with it, upgrading or
+        downgrading the cost. The profile comes from the tenant the user
+        was provisioned under (hashTenant), never from the request path.
+        """
+        user = self._find_by_upn(upn)
+        if not user:
+            return None
+        
+        cache_key = self._credential_key(user, password)
+        if cache_key and self._credential_cache.get(cache_key) == user.id:
+            return self._to_model(user)
+        
+        valid, new_hash = verify_and_rehash(password, user.passwordHash, get_hasher(user.hashTenant))
+        if not valid:
+            return None
+        if new_hash:
+            user = self._update_password_hash(user, new_hash)
+            cache_key = self._credential_key(user, password)
+        self._remember_credentials(cache_key, user)
+        return self._to_model(user)
+    
+    async def verify_password_async(self, upn: str, password: str) -> Optional[User]:
+        """Verify user credentials without blocking the event loop.
+        
+        The hash check (and any rehash, see verify_password) runs on a
+        dedicated thread pool. Raises PasswordVerificationBusy when every
+        worker is busy and the queue already holds
+        PASSWORD_VERIFY_QUEUE_DEPTH checks.
+        """
+        user = self._find_by_upn(upn)
+        if not user:
+            return None
+        
+        cache_key = self._credential_key(user, password)
+        if cache_key and self._credential_cache.get(cache_key) == user.id:
+            return self._to_model(user)
+        
+        limit = config.PASSWORD_VERIFY_CONCURRENCY + config.PASSWORD_VERIFY_QUEUE_DEPTH
+        if self._password_checks_pending >= limit:
+            raise PasswordVerificationBusy()
+        
+        self._password_checks_pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            valid, new_hash = await loop.run_in_executor(
+                self._password_executor,
+                verify_and_rehash,
+                password,
+                user.passwordHash,
+                get_hasher(user.hashTenant)
+            )
+        finally:
+            self._password_checks_pending -= 1
+        
+        if not valid:
+            return None
+        if new_hash:
+            user = self._update_password_hash(user, new_hash)
+            cache_key = self._credential_key(user, password)
+        self._remember_credentials(cache_key, user)
+        return self._to_model(user)
+    
+    def _update_password_hash(self, user: UserRecord, password_hash: str) -> UserRecord:
+        """Store a new hash for a user and journal the change."""
+        current = self._find_by_id(user.id) or user
+        if self._users_by_id.get(current.id) is current:
+            current.passwordHash = password_hash
+        else:
+            # Snapshot records are read-only; the overlay shadows them
+            current = UserRecord.from_dict(dict(current.to_dict(), passwordHash=password_hash))
+            self._records.append(current)
+            self._index_user(current)
+        self._models.pop(current.id)
+        self._journal.append(current.to_dict())
+        return current
     
     def create_user(self, user: User) -> User:
-        """Create a new user."""
+        """Create a new user (plain-text passwords get the hashTenant's profile)."""
         # Hash password if it's plain text
-        if not user.passwordHash.startswith("$2b$"):
-            user.passwordHash = bcrypt.hashpw(user.passwordHash.encode(), bcrypt.gensalt()).decode()
+        if identify(user.passwordHash) is None:
+            user.passwordHash = get_hasher(user.hashTenant).hash(user.passwordHash)
         
-        self.users.append(user)
-        self._save_users()
+        record = UserRecord.from_model(user)
+        self._records.append(record)
+        self._index_user(record)
+        self._models.pop(record.id)
+        self._journal.append(record.to_dict())
         return user
     
+    def create_users(self, users: List[User]) -> int:
+        """Add users whose passwords are already hashed, as one journal batch.
+    
+        Used by bulk provisioning; callers check UPN/id uniqueness first.
+        """
+        records = [UserRecord.from_model(user) for user in users]
+        for record in records:
+            self._records.append(record)
+            self._index_user(record)
+            self._models.pop(record.id)
+        self._journal.extend([record.to_dict() for record in records])
+        return len(records)
+    
+    def upn_exists(self, upn: str) -> bool:
+        """Whether a user already has this UPN (case-insensitive)."""
+        return self._find_by_upn(upn) is not None
+    
+    def id_exists(self, user_id: str) -> bool:
+        """Whether a user already has this id."""
+        return self._find_by_id(user_id) is not None
+    
+    def flush(self):
+        """Wait until pending user writes are on disk."""
+        self._journal.flush()
+    
     def list_users(self) -> List[User]:
         """List all users."""
-        return self.users
+        users = []
+        if self._snapshot is not None:
+            users = [r.to_model() for r in self._snapshot if r.id not in self._users_by_id]
+        return users + [record.to_model() for record in self._users_by_id.values()]
+    
+    def count(self) -> int:
+        """Number of users in the directory."""
+        snapshot_count = len(self._snapshot) if self._snapshot is not None else 0
+        return snapshot_count + len(self._users_by_id) - self._shadowed
+
+
+def _lower(value: str) -> str:
+    """Lower-case a key, reusing the original string when it already is."""
+    lowered = value.lower()
+    return value if lowered == value else lowered
 
 
 # Global instance
@@ -46,3 +46,28 @@ def service_app() -> dict:
         "client_id": "service-app-456",
         "client_secret": "service-secret"
     }
+
+
+@pytest.fixture(scope="session")
+def admin_headers() -> dict:
+    """Admin API credentials (the emulator must run with the same ADMIN_SECRET)."""
+    secret = os.getenv("EMULATOR_ADMIN_SECRET")
+    if not secret:
+        pytest.skip("EMULATOR_ADMIN_SECRET not set")
+    return {"X-Admin-Secret": secret}
+
+
+class FakeClock:
+    """Callable clock for code that takes a `clock` argument; tests set `now`."""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    """Fake clock starting at t=1000."""
+    return FakeClock()
@@ -0,0 +1,104 @@
+"""
+Admin API tests.
+"""
+import json
+import uuid
+import httpx
+import jwt
+
+
+def test_admin_requires_secret(client: httpx.Client):
+    """Test that admin routes reject requests without the admin secret."""
+    response = client.post("/admin/users/bulk", content=b"")
+    
+    assert response.status_code in (401, 403)
+
+
+def test_bulk_import_users(client: httpx.Client, admin_headers: dict, test_app: dict):
+    """Test NDJSON bulk import, duplicate rejection and login as an imported user."""
+    run = uuid.uuid4().hex[:8]
+    rows = [
+        {"userPrincipalName": f"bulk{i}-{run}@contoso.onmicrosoft.com",
+         "displayName": f"Bulk User {i}", "password": "Bulk123!"}
+        for i in range(3)
+    ]
+    rows.append(dict(rows[0], userPrincipalName=rows[0]["userPrincipalName"].upper()))
+    body = "".join(json.dumps(row) + "\n" for row in rows)
+    
+    response = client.post(
+        "/admin/users/bulk", params={"batch_size": 2}, content=body, headers=admin_headers
+    )
+    
+    assert response.status_code == 200
+    reports = [json.loads(line) for line in response.text.splitlines()]
+    assert reports[0]["event"] == "progress"
+    done = reports[-1]
+    assert done["event"] == "done"
+    assert done["imported"] == 3
+    assert done["rejected"] == 1
+    assert done["errors"][0]["line"] == 4
+    
+    login = client.post("/common/oauth2/v2.0/token", data={
+        "grant_type": "password",
+        "client_id": test_app["client_id"],
+        "username": rows[2]["userPrincipalName"],
+        "password": "Bulk123!",
+        "scope": "openid"
+    })
+    assert login.status_code == 200
+
+
+def test_key_rotation(client: httpx.Client, admin_headers: dict, test_app: dict, test_user: dict):
+    """Test that rotation publishes the new key and old tokens keep working."""
+    data = {
+        "grant_type": "password",
+        "client_id": test_app["client_id"],
+        "username": test_user["username"],
+        "password": test_user["password"],
+        "scope": "openid"
+    }
+    old_token = client.post("/common/oauth2/v2.0/token", data=data).json()["access_token"]
+    
+    response = client.post("/admin/keys/rotate", headers=admin_headers)
+    
+    assert response.status_code == 200
+    rotated = next(key for key in response.json()["keys"] if key["alg"] == "RS256")
+    assert rotated["previous_kid"] == jwt.get_unverified_header(old_token)["kid"]
+    kids = {key["kid"] for key in client.get("/common/discovery/v2.0/keys").json()["keys"]}
+    assert {rotated["kid"], rotated["previous_kid"]} <= kids
+    
+    new_token = client.post("/common/oauth2/v2.0/token", data=data).json()["access_token"]
+    assert jwt.get_unverified_header(new_token)["kid"] == rotated["kid"]
+    for token in (old_token, new_token):
+        userinfo = client.get("/oidc/userinfo", headers={"Authorization": f"Bearer {token}"})
+        assert userinfo.status_code == 200
+
+
+def test_bulk_mint_tokens(client: httpx.Client, admin_headers: dict, test_app: dict, test_user: dict, service_app: dict):
+    """Test minting tokens for several apps and scopes in one streamed response."""
+    body = {
+        "users": [test_user["username"]],
+        "apps": [test_app["client_id"], service_app["client_id"]],
+        "scopes": ["openid profile", "User.Read"],
+        "count": 25,
+        "lifetimeSeconds": 600
+    }
+    
+    response = client.post("/admin/tokens/bulk", json=body, headers=admin_headers)
+    
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    tokens, done = lines[:-1], lines[-1]
+    assert done["event"] == "done" and done["minted"] == 25
+    assert len({row["access_token"] for row in tokens}) == 25
+    assert {(row["client_id"], row["scope"]) for row in tokens} == {
+        (app, scope) for app in body["apps"] for scope in body["scopes"]
+    }
+    claims = jwt.decode(tokens[0]["access_token"], options={"verify_signature": False})
+    assert claims["exp"] - claims["iat"] == 600
+    assert claims["preferred_username"] == test_user["username"]
+    userinfo = client.get("/oidc/userinfo", headers={"Authorization": f"Bearer {tokens[-1]['access_token']}"})
+    assert userinfo.status_code == 200
+    
+    unknown = client.post("/admin/tokens/bulk", json=dict(body, apps=["no-such-app"]), headers=admin_headers)
+    assert unknown.status_code == 400
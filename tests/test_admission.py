@@ -0,0 +1,106 @@
+"""
+Admission control tests.
+"""
+import json
+import pytest
+from starlette.requests import Request
+from models.application import Application
+from services.admission import AdmissionController, Throttled, throttled_response
+
+
+def _controller(clock, **limits) -> AdmissionController:
+    settings = dict(max_in_flight=0, client_rate=0, client_burst=1, ip_rate=0, ip_burst=1, max_keys=100)
+    settings.update(limits)
+    return AdmissionController(clock=clock, **settings)
+
+
+def _admit(controller, client_id="client", ip="10.0.0.1", app=None):
+    controller.enter("token", client_id, ip, app)
+    controller.leave()
+
+
+def test_client_rate_limit_refills(clock):
+    """Test that a client gets its burst, is throttled, then admitted again as the bucket refills."""
+    controller = _controller(clock, client_rate=2, client_burst=3)
+    
+    for _ in range(3):
+        _admit(controller)
+    with pytest.raises(Throttled) as throttled:
+        _admit(controller)
+    assert throttled.value.reason == "client"
+    assert throttled.value.retry_after == pytest.approx(0.5)
+    
+    _admit(controller, client_id="other")  # buckets are per client_id
+    clock.now += 0.5
+    _admit(controller)
+
+
+def test_application_limits_override_defaults(clock):
+    """Test that an application's tokenRateLimit/tokenRateBurst replace the defaults."""
+    controller = _controller(clock, client_rate=100, client_burst=100)
+    app = Application(appId="limited", displayName="Limited", tokenRateLimit=1, tokenRateBurst=1)
+    unlimited = Application(appId="unlimited", displayName="Unlimited", tokenRateLimit=0)
+    
+    _admit(controller, "limited", app=app)
+    with pytest.raises(Throttled):
+        _admit(controller, "limited", app=app)
+    
+    controller = _controller(clock, client_rate=1, client_burst=1)
+    for _ in range(10):
+        _admit(controller, "unlimited", app=unlimited)
+
+
+def test_ip_and_in_flight_limits(clock):
+    """Test the per-IP bucket and the global in-flight limit."""
+    controller = _controller(clock, ip_rate=1, ip_burst=2)
+    _admit(controller, "a")
+    _admit(controller, "b")
+    with pytest.raises(Throttled) as throttled:
+        _admit(controller, "c")
+    assert throttled.value.reason == "ip"
+    _admit(controller, "c", ip="10.0.0.2")
+    
+    controller = _controller(clock, max_in_flight=2)
+    controller.enter("token", "a", "10.0.0.1")
+    controller.enter("token", "a", "10.0.0.1")
+    with pytest.raises(Throttled) as throttled:
+        controller.enter("token", "a", "10.0.0.1")
+    assert throttled.value.reason == "in_flight"
+    controller.leave()
+    controller.enter("token", "a", "10.0.0.1")
+    assert controller.in_flight == 2
+
+
+def test_client_rejection_keeps_ip_budget(clock):
+    """Test that requests rejected by their client bucket don't drain the shared IP bucket."""
+    controller = _controller(clock, client_rate=1, client_burst=1, ip_rate=1, ip_burst=3)
+    _admit(controller, "noisy")
+    for _ in range(5):
+        with pytest.raises(Throttled) as throttled:
+            _admit(controller, "noisy")
+        assert throttled.value.reason == "client"
+    
+    _admit(controller, "quiet-1")
+    _admit(controller, "quiet-2")
+    with pytest.raises(Throttled) as throttled:
+        _admit(controller, "quiet-3")
+    assert throttled.value.reason == "ip"
+
+
+def test_throttled_response_shape():
+    """Test that a throttled request gets a 429 in Entra's error shape with Retry-After."""
+    request = Request({
+        "type": "http", "method": "POST", "path": "/common/oauth2/v2.0/token",
+        "headers": [(b"client-request-id", b"req-123")]
+    })
+    response = throttled_response(request, Throttled("client", 2.2))
+    body = json.loads(response.body)
+    
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+    assert body["error"] == "temporarily_unavailable"
+    assert body["error_codes"] == [50196]
+    assert body["error_description"].startswith("AADSTS50196: ")
+    assert body["correlation_id"] == "req-123"
+    assert f"Trace ID: {body['trace_id']}" in body["error_description"]
+    assert body["timestamp"].endswith("Z")
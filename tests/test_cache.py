@@ -0,0 +1,41 @@
+"""
+In-process cache tests.
+"""
+from services.cache import ExpiringLRUCache
+
+
+def test_hit_and_miss_counters():
+    """Test that lookups update hit/miss counters."""
+    cache = ExpiringLRUCache(10)
+    cache.set("a", 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire(clock):
+    """Test that entries are dropped at their expiry time."""
+    cache = ExpiringLRUCache(10, clock=clock)
+    cache.set("token", {"sub": "x"}, expires_at=clock.now + 60)
+
+    assert cache.get("token") == {"sub": "x"}
+    clock.now += 60
+    assert cache.get("token") is None
+    assert len(cache) == 0
+    assert cache.expirations == 1
+
+
+def test_lru_eviction():
+    """Test that the least recently used entry is evicted when full."""
+    cache = ExpiringLRUCache(2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
@@ -0,0 +1,61 @@
+"""
+Claim template and JWT serializer tests.
+"""
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from services.claim_templates import ClaimTemplate, Slot, sign_payload
+
+LAYOUT = {
+    "aud": "api://app",
+    "iss": "https://login.example/100%/v2.0",
+    "iat": Slot("iat", "int"),
+    "exp": Slot("exp", "int"),
+    "name": "Zoë \"Q\" Müller",
+    "uti": Slot("uti", "id"),
+    "scp": Slot("scp"),
+    "ver": "2.0"
+}
+VALUES = {"iat": 1700000000, "exp": 1700003600, "uti": "abc-123", "scp": "openid Ünïcode\n"}
+
+
+def test_render_matches_json_encoding():
+    """Test that a rendered payload equals PyJWT's serialization of the claims."""
+    template = ClaimTemplate(LAYOUT)
+    claims = template.claims(VALUES)
+    
+    token = jwt.encode(claims, "secret", algorithm="HS256")
+    payload = jwt.api_jws.base64url_decode(token.split(".")[1])
+    
+    assert template.render(VALUES) == payload
+    assert claims["name"] == LAYOUT["name"] and claims["scp"] == VALUES["scp"]
+
+
+@pytest.mark.parametrize("alg, private_key", [
+    ("RS256", rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+    ("EdDSA", ed25519.Ed25519PrivateKey.generate()),
+])
+def test_tokens_are_byte_identical(alg, private_key):
+    """Test that deterministic signatures make whole tokens identical to jwt.encode."""
+    template = ClaimTemplate(LAYOUT)
+    
+    token = sign_payload(template.render(VALUES), alg, "kid-1", private_key)
+    
+    assert token == jwt.encode(template.claims(VALUES), private_key, algorithm=alg, headers={"kid": "kid-1"})
+
+
+@pytest.mark.parametrize("alg, private_key", [
+    ("PS256", rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+    ("ES256", ec.generate_private_key(ec.SECP256R1())),
+])
+def test_randomized_signatures_verify(alg, private_key):
+    """Test that tokens signed with randomized algorithms verify with PyJWT."""
+    template = ClaimTemplate(LAYOUT)
+    
+    token = sign_payload(template.render(VALUES), alg, "kid-1", private_key)
+    
+    assert jwt.get_unverified_header(token) == {"alg": alg, "kid": "kid-1", "typ": "JWT"}
+    decoded = jwt.decode(
+        token, private_key.public_key(), algorithms=[alg], options={"verify_exp": False, "verify_aud": False}
+    )
+    assert decoded == template.claims(VALUES)
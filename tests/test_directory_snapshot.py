@@ -0,0 +1,62 @@
+"""
+Binary directory snapshot tests.
+"""
+from services.directory_snapshot import DirectorySnapshot, source_fingerprint
+
+USERS = [
+    {
+        "id": "11111111-1111-1111-1111-111111111111",
+        "userPrincipalName": "Mario.Rossi@contoso.onmicrosoft.com",
+        "displayName": "Mario Rossi",
+        "givenName": "Mario",
+        "surname": "Rossi",
+        "mail": "mario.rossi@contoso.onmicrosoft.com",
+        "jobTitle": "Developer",
+        "department": "IT",
+        "passwordHash": "$2b$12$abc"
+    },
+    {
+        "id": "22222222-2222-2222-2222-222222222222",
+        "userPrincipalName": "test@contoso.onmicrosoft.com",
+        "displayName": "Test User",
+        "passwordHash": "$2b$12$def"
+    }
+]
+
+
+def test_lookups_round_trip(tmp_path):
+    """Test that records can be found by id, UPN and mail."""
+    snapshot = DirectorySnapshot.build(tmp_path / "users.snap", USERS, b"f" * 32)
+    
+    assert len(snapshot) == 2
+    user = snapshot.find_by_upn("mario.rossi@contoso.onmicrosoft.com")
+    assert user.id == USERS[0]["id"]
+    assert user.userPrincipalName == "Mario.Rossi@contoso.onmicrosoft.com"
+    assert snapshot.find_by_mail("mario.rossi@contoso.onmicrosoft.com").id == USERS[0]["id"]
+    
+    test_user = snapshot.find_by_id(USERS[1]["id"])
+    assert test_user.givenName is None
+    assert test_user.passwordHash == "$2b$12$def"
+    assert snapshot.find_by_id("missing") is None
+    assert [u.id for u in snapshot] == [u["id"] for u in USERS]
+    snapshot.close()
+
+
+def test_stale_snapshot_is_rejected(tmp_path):
+    """Test that a snapshot compiled from older sources is not used."""
+    source = tmp_path / "users.json"
+    source.write_text("[]")
+    fingerprint = source_fingerprint([source])
+    DirectorySnapshot.build(tmp_path / "users.snap", USERS, fingerprint).close()
+    
+    assert DirectorySnapshot.open(tmp_path / "users.snap", fingerprint) is not None
+    source.write_text("[ ]")
+    assert DirectorySnapshot.open(tmp_path / "users.snap", source_fingerprint([source])) is None
+
+
+def test_corrupt_snapshot_is_rejected(tmp_path):
+    """Test that an unreadable file is treated as missing."""
+    path = tmp_path / "users.snap"
+    path.write_bytes(b"not a snapshot")
+    
+    assert DirectorySnapshot.open(path, b"f" * 32) is None
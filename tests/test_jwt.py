@@ -82,3 +82,30 @@ def test_token_signature_validation(client: httpx.Client, service_app: dict):
     # Verify that kid exists in JWKS
     kids = [key["kid"] for key in jwks["keys"]]
     assert decoded_header["kid"] in kids
+
+
+@pytest.mark.parametrize("tenant", ["common", "es256test", "eddsatest", "ps256test"])
+def test_token_signed_with_advertised_algorithm(client: httpx.Client, service_app: dict, tenant: str):
+    """Test that tokens use the tenant's advertised algorithm and verify against the JWKS."""
+    discovery = client.get(f"/{tenant}/v2.0/.well-known/openid-configuration").json()
+    token_data = {
+        "grant_type": "client_credentials",
+        "client_id": service_app["client_id"],
+        "client_secret": service_app["client_secret"],
+        "scope": "api://.default"
+    }
+    
+    access_token = client.post(f"/{tenant}/oauth2/v2.0/token", data=token_data).json()["access_token"]
+    
+    header = jwt.get_unverified_header(access_token)
+    assert header["alg"] == discovery["id_token_signing_alg_values_supported"][0]
+    jwks = client.get(f"/{tenant}/discovery/v2.0/keys").json()
+    jwk = next(key for key in jwks["keys"] if key["kid"] == header["kid"])
+    assert jwk["alg"] == header["alg"]
+    decoded = jwt.decode(
+        access_token,
+        jwt.PyJWK(jwk).key,
+        algorithms=[jwk["alg"]],
+        options={"verify_aud": False}
+    )
+    assert decoded["tid"] == tenant
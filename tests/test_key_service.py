@@ -0,0 +1,98 @@
+"""
+Signing key ring tests.
+"""
+import jwt
+import pytest
+from services.key_service import KeyService
+from config import config
+
+
+@pytest.fixture
+def keys_dir(tmp_path, monkeypatch):
+    """Point the key files at an empty directory."""
+    monkeypatch.setattr(config, "KEYS_DIR", tmp_path)
+    monkeypatch.setattr(config, "PRIVATE_KEY_FILE", tmp_path / "private_key.pem")
+    monkeypatch.setattr(config, "PUBLIC_KEY_FILE", tmp_path / "public_key.pem")
+    monkeypatch.setattr(config, "CERTIFICATE_FILE", tmp_path / "certificate.pem")
+    monkeypatch.setattr(config, "KEYRING_FILE", tmp_path / "keyring.json")
+    monkeypatch.setattr(config, "KEYRING_DIR", tmp_path / "keyring")
+    return tmp_path
+
+
+def test_rotation_keeps_previous_key_published(keys_dir):
+    """Test that rotation activates a new key and keeps the old one verifiable."""
+    service = KeyService()
+    first = service.kid
+    
+    new_key = service.rotate()["RS256"]
+    
+    assert service.kid == new_key.kid != first
+    assert {k["kid"] for k in service.get_jwks()["keys"]} == {first, new_key.kid}
+    assert service.get_verification_key(first) is not None
+    assert service.keys[first].status == "retired"
+
+
+def test_other_processes_see_rotation(keys_dir):
+    """Test that an unknown kid makes a service re-read the key ring."""
+    worker_a = KeyService()
+    worker_b = KeyService()
+    
+    new_key = worker_a.rotate()["RS256"]
+    
+    assert worker_b.get_verification_key(new_key.kid) is not None
+    assert worker_b.kid == new_key.kid
+
+
+def test_pregenerated_key_is_published_then_activated(keys_dir):
+    """Test background pre-generation of the next key."""
+    service = KeyService()
+    service.ensure_next_key()
+    service._pregenerating.join()
+    next_kid = next(k.kid for k in service.keys.values() if k.status == "next")
+    
+    assert next_kid in {k["kid"] for k in service.get_jwks()["keys"]}
+    assert service.rotate()["RS256"].kid == next_kid
+
+
+def test_retired_keys_are_pruned(keys_dir, monkeypatch):
+    """Test that retired keys disappear after the retention period."""
+    monkeypatch.setattr(config, "KEY_RETENTION_HOURS", 0)
+    service = KeyService()
+    first = service.kid
+    
+    service.rotate()
+    
+    assert first not in service.keys
+    assert not (keys_dir / "keyring" / f"{first}.pem").exists()
+    assert service.get_verification_key(first) is None
+
+
+def test_single_key_files_are_imported(keys_dir):
+    """Test that an existing private_key.pem becomes the active key."""
+    legacy = KeyService()
+    legacy_pem = legacy.get_private_key_pem()
+    (keys_dir / "keyring.json").unlink()
+    
+    service = KeyService()
+    
+    assert service.kid == legacy.kid
+    assert service.get_private_key_pem() == legacy_pem
+
+
+@pytest.mark.parametrize("alg", ["PS256", "ES256", "EdDSA"])
+def test_algorithm_keys(keys_dir, alg):
+    """Test that each algorithm gets its own key, published as a usable JWK."""
+    service = KeyService()
+    rsa_kid = service.kid
+    
+    key = service.get_active_key(alg)
+    token = jwt.encode({"sub": "user"}, key.private_key, algorithm=alg, headers={"kid": key.kid})
+    
+    assert service.algorithms() == ["RS256", alg]
+    jwk = next(k for k in service.get_jwks()["keys"] if k["kid"] == key.kid)
+    assert jwt.decode(token, jwt.PyJWK(jwk).key, algorithms=[alg]) == {"sub": "user"}
+    assert KeyService().get_active_key(alg).kid == key.kid
+    
+    service.rotate(alg)
+    assert service.kid == rsa_kid
+    assert service.get_active_key(alg).kid != key.kid
@@ -0,0 +1,59 @@
+"""
+Prometheus metrics tests.
+"""
+import re
+import httpx
+from services.metrics import Registry
+
+
+def _sample(text: str, name: str) -> float:
+    match = re.search(rf"^{re.escape(name)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{name} not in metrics"
+    return float(match.group(1))
+
+
+def test_histogram_exposition():
+    """Test that histograms render cumulative buckets, sum and count."""
+    registry = Registry()
+    histogram = registry.histogram("test_seconds", "Test latency.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(2.0, "/a")
+    registry.counter("test_total", "Test count.", ("name",)).inc('say "hi"')
+    registry.gauge("test_size", "Test size.", lambda: 7)
+    
+    text = registry.render().decode()
+    
+    assert "# TYPE test_seconds histogram" in text
+    assert _sample(text, 'test_seconds_bucket{route="/a",le="0.1"}') == 1
+    assert _sample(text, 'test_seconds_bucket{route="/a",le="1"}') == 2
+    assert _sample(text, 'test_seconds_bucket{route="/a",le="+Inf"}') == 3
+    assert _sample(text, 'test_seconds_count{route="/a"}') == 3
+    assert _sample(text, 'test_seconds_sum{route="/a"}') == 2.55
+    assert _sample(text, 'test_total{name="say \\"hi\\""}') == 1
+    assert _sample(text, "test_size") == 7
+
+
+def test_metrics_endpoint(client: httpx.Client, service_app: dict):
+    """Test that /metrics counts token requests by grant type and times signing and verification."""
+    token = client.post("/common/oauth2/v2.0/token", data={
+        "grant_type": "client_credentials",
+        "client_id": service_app["client_id"],
+        "client_secret": service_app["client_secret"],
+        "scope": "api://.default"
+    }).json()["access_token"]
+    client.get("/oidc/userinfo", headers={"Authorization": f"Bearer {token}"})
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    
+    assert _sample(text, 'entra_token_requests_total{grant_type="client_credentials",status="200"}') >= 1
+    assert _sample(text, 'entra_http_requests_total{method="POST",route="/{tenant}/oauth2/v2.0/token",status="200"}') >= 1
+    assert _sample(text, 'entra_jwt_sign_duration_seconds_count{alg="RS256"}') >= 1
+    assert "entra_jwt_verify_duration_seconds_count" in text
+    assert _sample(text, "entra_users") >= 2
+    assert _sample(text, "entra_applications") >= 2
+    assert _sample(text, "entra_refresh_tokens") >= 0
+    assert _sample(text, "entra_event_loop_lag_seconds") >= 0
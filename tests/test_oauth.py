@@ -126,3 +126,97 @@ def test_ropc_flow(client: httpx.Client, test_app: dict, test_user: dict):
     assert "access_token" in json_data
     assert "id_token" in json_data
     assert json_data["token_type"] == "Bearer"
+
+
+def test_ropc_upn_case_insensitive(client: httpx.Client, test_app: dict, test_user: dict):
+    """Test that the UPN lookup ignores case, like Entra ID."""
+    data = {
+        "grant_type": "password",
+        "client_id": test_app["client_id"],
+        "username": test_user["username"].upper(),
+        "password": test_user["password"],
+        "scope": "openid profile"
+    }
+    
+    response = client.post("/common/oauth2/v2.0/token", data=data)
+    
+    assert response.status_code == 200
+    assert "access_token" in response.json()
+
+
+def test_authorization_code_single_use(client: httpx.Client, test_app: dict, test_user: dict):
+    """Test that an authorization code cannot be redeemed twice."""
+    auth_params = {
+        "client_id": test_app["client_id"],
+        "response_type": "code",
+        "redirect_uri": test_app["redirect_uri"],
+        "scope": "openid profile",
+        "test_user": test_user["username"]
+    }
+    
+    auth_response = client.get("/common/oauth2/v2.0/authorize", params=auth_params, follow_redirects=False)
+    code = auth_response.headers["location"].split("code=")[1].split("&")[0]
+    
+    token_data = {
+        "grant_type": "authorization_code",
+        "client_id": test_app["client_id"],
+        "client_secret": test_app["client_secret"],
+        "code": code,
+        "redirect_uri": test_app["redirect_uri"]
+    }
+    
+    assert client.post("/common/oauth2/v2.0/token", data=token_data).status_code == 200
+    
+    replay = client.post("/common/oauth2/v2.0/token", data=token_data)
+    assert replay.status_code == 400
+    assert replay.json()["detail"] == "invalid_grant"
+
+
+def test_refresh_token_rotation(client: httpx.Client, test_app: dict, test_user: dict):
+    """Test that a refresh token is consumed when it is used."""
+    ropc_data = {
+        "grant_type": "password",
+        "client_id": test_app["client_id"],
+        "username": test_user["username"],
+        "password": test_user["password"],
+        "scope": "openid profile"
+    }
+    
+    refresh_token = client.post("/common/oauth2/v2.0/token", data=ropc_data).json()["refresh_token"]
+    refresh_data = {
+        "grant_type": "refresh_token",
+        "client_id": test_app["client_id"],
+        "refresh_token": refresh_token
+    }
+    
+    first = client.post("/common/oauth2/v2.0/token", data=refresh_data)
+    assert first.status_code == 200
+    
+    # The old token is gone; the new one works
+    assert client.post("/common/oauth2/v2.0/token", data=refresh_data).status_code == 400
+    refresh_data["refresh_token"] = first.json()["refresh_token"]
+    assert client.post("/common/oauth2/v2.0/token", data=refresh_data).status_code == 200
+
+
+def test_refresh_token_of_other_client_is_kept(
+    client: httpx.Client, test_app: dict, service_app: dict, test_user: dict
+):
+    """Test that presenting another client's refresh token doesn't consume it."""
+    ropc_data = {
+        "grant_type": "password",
+        "client_id": test_app["client_id"],
+        "username": test_user["username"],
+        "password": test_user["password"],
+        "scope": "openid profile"
+    }
+    
+    refresh_token = client.post("/common/oauth2/v2.0/token", data=ropc_data).json()["refresh_token"]
+    stolen = {
+        "grant_type": "refresh_token",
+        "client_id": service_app["client_id"],
+        "refresh_token": refresh_token
+    }
+    assert client.post("/common/oauth2/v2.0/token", data=stolen).status_code == 400
+    
+    own = dict(stolen, client_id=test_app["client_id"])
+    assert client.post("/common/oauth2/v2.0/token", data=own).status_code == 200
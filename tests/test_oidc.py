@@ -40,6 +40,28 @@ def test_jwks_endpoint(client: httpx.Client):
     assert "e" in key
 
 
+@pytest.mark.parametrize("path", [
+    "/common/v2.0/.well-known/openid-configuration",
+    "/common/discovery/v2.0/keys"
+])
+def test_metadata_conditional_requests(client: httpx.Client, path: str):
+    """Test ETag, Cache-Control and 304 responses for discovery and JWKS."""
+    response = client.get(path)
+    etag = response.headers.get("etag")
+    
+    assert response.status_code == 200
+    assert etag and etag.startswith('"')
+    assert "max-age=" in response.headers.get("cache-control", "")
+    assert client.get(path).headers["etag"] == etag
+    
+    not_modified = client.get(path, headers={"If-None-Match": f'"other", {etag}'})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+    assert not_modified.headers["etag"] == etag
+    
+    assert client.get(path, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
 def test_userinfo_endpoint(client: httpx.Client, test_app: dict, test_user: dict):
     """Test UserInfo endpoint."""
     # Get access token via ROPC
@@ -67,3 +89,28 @@ def test_userinfo_endpoint(client: httpx.Client, test_app: dict, test_user: dict
     assert "name" in user_data
     assert "preferred_username" in user_data
     assert user_data["preferred_username"] == test_user["username"]
+
+
+def test_userinfo_repeated_calls(client: httpx.Client, test_app: dict, test_user: dict):
+    """Test that repeated UserInfo calls with the same token are consistent."""
+    token_data = {
+        "grant_type": "password",
+        "client_id": test_app["client_id"],
+        "username": test_user["username"],
+        "password": test_user["password"],
+        "scope": "openid profile email"
+    }
+    
+    access_token = client.post("/common/oauth2/v2.0/token", data=token_data).json()["access_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    
+    first = client.get("/oidc/userinfo", headers=headers)
+    second = client.get("/oidc/userinfo", headers=headers)
+    
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert first.json() == second.json()
+    
+    # A tampered token must still be rejected
+    tampered = {"Authorization": f"Bearer {access_token[:-4]}AAAA"}
+    assert client.get("/oidc/userinfo", headers=tampered).status_code == 401
@@ -0,0 +1,108 @@
+"""
+Password hasher tests.
+"""
+import bcrypt
+import pytest
+from models.user import User
+from services import password_hasher
+from services.password_hasher import (
+    BcryptHasher, PasswordHasher, Pbkdf2Hasher, ScryptHasher, check_password,
+    hasher_for_profile, identify, parse_profiles, verify_and_rehash
+)
+
+
+@pytest.mark.parametrize("hasher", [BcryptHasher(4), Pbkdf2Hasher(1000), ScryptHasher(10)])
+def test_hash_and_verify(hasher):
+    """Test that each scheme verifies its own hashes and rejects wrong passwords."""
+    encoded = hasher.hash("Test123!")
+
+    assert identify(encoded) is type(hasher)
+    assert check_password("Test123!", encoded)
+    assert not check_password("wrong", encoded)
+    assert not hasher.needs_rehash(encoded)
+
+
+def test_existing_bcrypt_hashes_verify():
+    """Test that $2b$ hashes created with bcrypt.gensalt() keep working."""
+    encoded = bcrypt.hashpw(b"Password123!", bcrypt.gensalt(rounds=4)).decode()
+
+    assert check_password("Password123!", encoded)
+    assert not check_password("x", "not-a-hash")
+
+
+def test_rehash_to_other_scheme_or_cost():
+    """Test that a valid password is rehashed when the profile differs."""
+    encoded = BcryptHasher(4).hash("Test123!")
+
+    assert verify_and_rehash("Test123!", encoded, BcryptHasher(4)) == (True, None)
+    assert verify_and_rehash("wrong", encoded, Pbkdf2Hasher(1000)) == (False, None)
+    valid, new_hash = verify_and_rehash("Test123!", encoded, hasher_for_profile("pbkdf2:1000"))
+    assert valid and new_hash.startswith("$pbkdf2-sha256$1000$")
+    assert BcryptHasher(5).needs_rehash(encoded)
+
+
+def test_parse_profiles():
+    """Test per-tenant profile parsing."""
+    assert parse_profiles(" loadtest=bcrypt:4, contoso=scrypt ") == {
+        "loadtest": "bcrypt:4", "contoso": "scrypt"
+    }
+    assert hasher_for_profile("scrypt").cost == ScryptHasher.default_cost
+    with pytest.raises(ValueError):
+        parse_profiles("x=md5")
+
+
+def test_incomplete_scheme_fails_on_instantiation():
+    """Test that a scheme missing an abstract method can't be built."""
+    class NoHash(PasswordHasher):
+        scheme = "nohash"
+
+        @classmethod
+        def identify(cls, encoded: str) -> bool:
+            return False
+
+        @classmethod
+        def verify(cls, password: str, encoded: str) -> bool:
+            return False
+
+        @classmethod
+        def cost_of(cls, encoded: str):
+            return None
+
+    with pytest.raises(TypeError):
+        NoHash()
+
+
+def test_login_rehashes_to_users_own_profile(tmp_path, monkeypatch):
+    """Test that a login moves the stored hash to the profile of the user's tenant, up or down."""
+    from config import config
+    from services.user_service import UserService
+    monkeypatch.setattr(config, "USERS_FILE", tmp_path / "users.json")
+    monkeypatch.setattr(config, "DIRECTORY_SNAPSHOT", False)
+    monkeypatch.setattr(config, "CREDENTIAL_CACHE_ENABLED", False)
+    monkeypatch.setattr(password_hasher, "_default_profile", "pbkdf2:1000")
+    monkeypatch.setattr(password_hasher, "_tenant_profiles", {"loadtest": "bcrypt:4"})
+    service = UserService()
+    service.create_user(User(
+        userPrincipalName="load@contoso.onmicrosoft.com", displayName="Load",
+        passwordHash="Test123!", hashTenant="loadtest"
+    ))
+
+    def stored(upn):
+        encoded = service.get_user_by_upn(upn).passwordHash
+        cls = identify(encoded)
+        return cls.scheme, cls.cost_of(encoded)
+
+    # A loadtest user keeps its cheap profile, and a default user the default one
+    assert service.verify_password("load@contoso.onmicrosoft.com", "Test123!")
+    assert stored("load@contoso.onmicrosoft.com") == ("bcrypt", 4)
+    assert service.verify_password("test@contoso.onmicrosoft.com", "Test123!")
+    assert stored("test@contoso.onmicrosoft.com") == ("pbkdf2", 1000)
+
+    # Config changes move hashes up or down on the next login
+    monkeypatch.setattr(password_hasher, "_default_profile", "pbkdf2:500")
+    monkeypatch.setattr(password_hasher, "_tenant_profiles", {"loadtest": "bcrypt:5"})
+    assert service.verify_password("load@contoso.onmicrosoft.com", "Test123!")
+    assert stored("load@contoso.onmicrosoft.com") == ("bcrypt", 5)
+    assert service.verify_password("test@contoso.onmicrosoft.com", "Test123!")
+    assert stored("test@contoso.onmicrosoft.com") == ("pbkdf2", 500)
+    service.flush()
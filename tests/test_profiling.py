@@ -0,0 +1,79 @@
+"""
+Per-request profiling tests.
+"""
+import cProfile
+import os
+import pstats
+import httpx
+import pytest
+from services.profiling import collapsed_stacks
+
+
+def _leaf():
+    return sum(range(50000))
+
+
+def _outer():
+    _leaf()
+    _leaf()
+
+
+def test_collapsed_stacks():
+    """Test that collapsed stacks follow the call graph and weigh each path by time."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _outer()
+    profiler.disable()
+    profiler.create_stats()
+    
+    stacks = {}
+    for line in collapsed_stacks(profiler.stats).splitlines():
+        stack, micros = line.rsplit(" ", 1)
+        stacks[stack] = int(micros)
+    
+    sum_stack = next(stack for stack in stacks if stack.endswith(";built-in method builtins.sum"))
+    frames = sum_stack.split(";")
+    assert frames[-3].startswith("_outer (test_profiling.py:")
+    assert frames[-2].startswith("_leaf (test_profiling.py:")
+    assert stacks[sum_stack] > 0
+
+
+def test_profile_request(client: httpx.Client, admin_headers: dict, tmp_path):
+    """Test that a request flagged with the admin secret is profiled and downloadable."""
+    secret = admin_headers["X-Admin-Secret"]
+    
+    response = client.get("/common/discovery/v2.0/keys", headers={"X-Profile-Request": secret})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+    
+    listed = client.get("/admin/profiles", headers=admin_headers).json()["profiles"]
+    assert any(p["id"] == profile_id and p["path"] == "/common/discovery/v2.0/keys" for p in listed)
+    
+    response = client.get(f"/admin/profiles/{profile_id}", headers=admin_headers)
+    assert response.status_code == 200
+    (tmp_path / "request.prof").write_bytes(response.content)
+    assert pstats.Stats(str(tmp_path / "request.prof")).total_calls > 0
+    
+    collapsed = client.get(f"/admin/profiles/{profile_id}?format=collapsed", headers=admin_headers).text
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+    assert "jwks" in collapsed
+    
+    # The admin secret never works in the URL, and a wrong header doesn't profile
+    response = client.get(f"/common/v2.0/.well-known/openid-configuration?__profile={secret}")
+    assert "x-profile-id" not in response.headers
+    response = client.get("/common/discovery/v2.0/keys", headers={"X-Profile-Request": "wrong"})
+    assert "x-profile-id" not in response.headers
+    
+    assert client.get("/admin/profiles/unknown", headers=admin_headers).status_code == 404
+
+
+def test_profile_request_with_query_token(client: httpx.Client, admin_headers: dict):
+    """Test that the __profile query flag takes PROFILE_TOKEN."""
+    token = os.getenv("EMULATOR_PROFILE_TOKEN")
+    if not token:
+        pytest.skip("EMULATOR_PROFILE_TOKEN not set")
+    
+    response = client.get(f"/common/v2.0/.well-known/openid-configuration?__profile={token}")
+    assert "x-profile-id" in response.headers
+    response = client.get("/common/v2.0/.well-known/openid-configuration?__profile=wrong")
+    assert "x-profile-id" not in response.headers
@@ -0,0 +1,74 @@
+"""
+Bulk provisioning tests.
+"""
+import json
+from concurrent.futures import ThreadPoolExecutor
+from services.provisioning import RowReader, import_users
+
+
+class FakeDirectory:
+    """Stands in for UserService."""
+
+    def __init__(self, upns=()):
+        self.upns = set(upns)
+        self.batches = []
+
+    def upn_exists(self, upn):
+        return upn in self.upns
+
+    def id_exists(self, user_id):
+        return False
+
+    def create_users(self, users):
+        self.batches.append(users)
+        return len(users)
+
+
+def test_row_reader_handles_split_chunks():
+    """Test that rows split across chunks are reassembled."""
+    data = b'{"a": 1}\n{"a": 2}\n\n{"a": 3}'
+    reader = RowReader("ndjson")
+    rows = []
+    for i in range(0, len(data), 3):
+        rows += reader.feed(data[i:i + 3])
+    rows += reader.close()
+
+    assert rows == [(1, {"a": 1}, None), (2, {"a": 2}, None), (4, {"a": 3}, None)]
+
+
+def test_row_reader_csv():
+    """Test CSV rows with quoting and empty cells."""
+    reader = RowReader("csv")
+    rows = reader.feed(b'userPrincipalName,displayName,jobTitle\r\na@x.com,"Doe, Jane",\r\nb@x.com\n')
+
+    assert rows[0] == (2, {"userPrincipalName": "a@x.com", "displayName": "Doe, Jane"}, None)
+    assert rows[1][0] == 3 and rows[1][1] is None
+
+
+def test_import_batches_and_rejects_duplicates():
+    """Test batching, hashing and UPN uniqueness against the directory and the input."""
+    rows = [
+        {"userPrincipalName": "taken@contoso.com", "displayName": "Taken", "password": "x"},
+        {"userPrincipalName": "new1@contoso.com", "displayName": "New 1", "password": "x"},
+        {"userPrincipalName": "NEW1@contoso.com", "displayName": "Again", "password": "x"},
+        {"userPrincipalName": "new2@contoso.com", "displayName": "New 2",
+         "passwordHash": "$2b$04$abcdefghijklmnopqrstuu5VnDdTKuV1qPRnMbB0L1DVdrp0Zd4Pu"},
+        {"userPrincipalName": "new3@contoso.com", "displayName": "New 3", "password": "x"},
+        {"displayName": "No UPN", "password": "x"},
+    ]
+    data = "".join(json.dumps(row) + "\n" for row in rows).encode()
+    directory = FakeDirectory(upns={"taken@contoso.com"})
+    progress = []
+
+    with ThreadPoolExecutor(2) as pool:
+        report = import_users([data], "ndjson", directory, batch_size=2, pool=pool,
+                              on_progress=progress.append)
+
+    assert report["imported"] == 3
+    assert report["rejected"] == 3
+    assert [e["line"] for e in report["errors"]] == [1, 3, 6]
+    assert [len(batch) for batch in directory.batches] == [2, 1]
+    assert len(progress) == 2
+    users = [user for batch in directory.batches for user in batch]
+    assert all(user.passwordHash.startswith("$2b$") for user in users)
+    assert users[1].passwordHash == rows[3]["passwordHash"]
@@ -0,0 +1,72 @@
+"""
+Redirect URI matching tests.
+"""
+from models.application import Application, RedirectUriMatcher
+
+
+def test_exact_match():
+    """Test that plain URIs must match exactly."""
+    matcher = RedirectUriMatcher(["http://localhost:3029/callback"])
+    
+    assert matcher.matches("http://localhost:3029/callback")
+    assert not matcher.matches("http://localhost:3029/callback/")
+    assert not matcher.matches("http://localhost:3029/other")
+
+
+def test_wildcard_within_segment():
+    """Test that '*' matches inside one path segment only."""
+    matcher = RedirectUriMatcher(["https://pr-*.preview.contoso.com/callback"])
+    
+    assert matcher.matches("https://pr-42.preview.contoso.com/callback")
+    assert not matcher.matches("https://pr-.preview.contoso.com/callback")
+    assert not matcher.matches("https://pr-1.evil.com/x.preview.contoso.com/callback")
+    assert not matcher.matches("https://pr-42.preview.contoso.com/callback/extra")
+
+
+def test_trailing_wildcard_is_prefix():
+    """Test that a trailing '*' accepts any suffix."""
+    matcher = RedirectUriMatcher(["http://localhost:5000/*", "http://localhost:3029/auth"])
+    
+    assert matcher.matches("http://localhost:5000/signin/callback?x=1")
+    assert matcher.matches("http://localhost:3029/auth")
+    assert not matcher.matches("http://localhost:5001/callback")
+
+
+def test_application_uses_matcher():
+    """Test that Application compiles its redirectUris."""
+    app = Application(displayName="Preview", redirectUris=["https://*.preview.contoso.com/cb"])
+    
+    assert app.is_redirect_uri_allowed("https://branch-7.preview.contoso.com/cb")
+    assert not app.is_redirect_uri_allowed("https://preview.contoso.com/cb")
+
+
+def test_wildcard_rejects_host_confusion():
+    """Test that '*' cannot smuggle a different host past the pattern."""
+    matcher = RedirectUriMatcher(["https://*.preview.contoso.com/cb"])
+    
+    assert not matcher.matches("https://evil.com#.preview.contoso.com/cb")
+    assert not matcher.matches("https://evil.com?.preview.contoso.com/cb")
+    assert not matcher.matches("https://evil.com\\.preview.contoso.com/cb")
+    assert not matcher.matches("https://evil.com@branch.preview.contoso.com/cb")
+    assert not matcher.matches("https://user@evil.com.preview.contoso.com/cb")
+    assert not matcher.matches("https://evil.com.preview.contoso.com/cb")
+
+
+def test_wildcard_rejects_fragment_query_and_userinfo():
+    """Test that a fragment, or a query/userinfo the pattern lacks, is rejected."""
+    matcher = RedirectUriMatcher(["https://*.preview.contoso.com/cb", "http://localhost:5000/*"])
+    
+    assert not matcher.matches("https://branch.preview.contoso.com/cb#x")
+    assert not matcher.matches("https://branch.preview.contoso.com/cb?next=evil")
+    assert not matcher.matches("http://localhost:5000/cb#fragment")
+    assert not matcher.matches("http://attacker@localhost:5000/cb")
+    assert matcher.matches("http://localhost:5000/cb?state=1")
+
+
+def test_trailing_wildcard_in_host_is_one_label():
+    """Test that a trailing '*' in the authority does not match beyond the host."""
+    matcher = RedirectUriMatcher(["https://app.contoso.*"])
+    
+    assert matcher.matches("https://app.contoso.net")
+    assert not matcher.matches("https://app.contoso.com@evil.com")
+    assert not matcher.matches("https://app.contoso.com/cb")
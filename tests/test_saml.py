@@ -0,0 +1,57 @@
+"""
+SAML federation metadata tests.
+"""
+import base64
+import hashlib
+import httpx
+from lxml import etree
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+NS = {"md": "urn:oasis:names:tc:SAML:2.0:metadata", "ds": "http://www.w3.org/2000/09/xmldsig#"}
+METADATA_PATH = "/common/FederationMetadata/2007-06/FederationMetadata.xml"
+
+
+def _c14n(element) -> bytes:
+    return etree.tostring(element, method="c14n", exclusive=True)
+
+
+def test_federation_metadata_certificate_and_signature(client: httpx.Client):
+    """Test that the metadata carries a real X.509 certificate and a valid signature."""
+    response = client.get(METADATA_PATH)
+    
+    assert response.status_code == 200
+    root = etree.fromstring(response.content)
+    assert root.get("entityID") == "https://sts.windows.net/common/"
+    assert root.get("validUntil")
+    
+    cert_b64 = root.findtext(".//md:KeyDescriptor//ds:X509Certificate", namespaces=NS)
+    certificate = x509.load_der_x509_certificate(base64.b64decode(cert_b64))
+    
+    signature = root.find("ds:Signature", NS)
+    assert signature is not None
+    signed_info = signature.find("ds:SignedInfo", NS)
+    assert signed_info.find("ds:Reference", NS).get("URI") == "#" + root.get("ID")
+    certificate.public_key().verify(
+        base64.b64decode(signature.findtext("ds:SignatureValue", namespaces=NS)),
+        _c14n(signed_info),
+        padding.PKCS1v15(),
+        hashes.SHA256()
+    )
+    
+    # Enveloped signature: the digest covers the document without the Signature
+    digest = signed_info.findtext(".//ds:DigestValue", namespaces=NS)
+    root.remove(signature)
+    assert base64.b64encode(hashlib.sha256(_c14n(root)).digest()).decode() == digest
+
+
+def test_federation_metadata_conditional_requests(client: httpx.Client):
+    """Test ETag/Last-Modified validation of the cached metadata."""
+    response = client.get(METADATA_PATH)
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    
+    assert client.get(METADATA_PATH).content == response.content
+    assert client.get(METADATA_PATH, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(METADATA_PATH, headers={"If-Modified-Since": last_modified}).status_code == 304
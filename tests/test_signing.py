@@ -0,0 +1,33 @@
+"""
+Signing engine tests.
+"""
+import asyncio
+import json
+import jwt
+from services import signing
+from services.key_service import key_service
+from services.signing import SigningEngine
+
+
+def test_engine_batches_concurrent_requests(monkeypatch):
+    """Test that concurrent signs are batched and each caller gets its own token."""
+    batches = []
+    sign_batch = signing.sign_batch
+    
+    def recording_sign_batch(items):
+        batches.append(len(items))
+        return sign_batch(items)
+    
+    monkeypatch.setattr(signing, "sign_batch", recording_sign_batch)
+    engine = SigningEngine("thread", workers=2, max_batch=8)
+    
+    async def sign_all():
+        return await asyncio.gather(*(engine.sign(json.dumps({"sub": f"user-{i}"}).encode()) for i in range(20)))
+    
+    tokens = asyncio.run(sign_all())
+    engine.shutdown()
+    
+    assert batches == [8, 8, 4]
+    for i, token in enumerate(tokens):
+        claims = jwt.decode(token, key_service.get_verification_key(), algorithms=["RS256"])
+        assert claims == {"sub": f"user-{i}"}
@@ -0,0 +1,68 @@
+"""
+Expiring token store tests.
+"""
+from services.token_store import AuthorizationCode, ExpiringStore, RefreshToken, SQLiteStore
+
+
+def test_take_is_single_use():
+    """Test that take() returns a record only once."""
+    store = ExpiringStore()
+    store.put("rt", RefreshToken("user", "app", expires_at=2**40))
+
+    assert store.take("rt").user_id == "user"
+    assert store.take("rt") is None
+    assert store.stats()["consumed"] == 1
+
+
+def test_expired_records_are_hidden_and_purged(clock):
+    """Test that expired records are not returned and get swept."""
+    store = ExpiringStore(clock=clock)
+    store.put("short", RefreshToken("u1", "app", expires_at=1010))
+    store.put("long", RefreshToken("u2", "app", expires_at=5000))
+
+    clock.now = 1010
+    assert store.get("short") is None
+    assert store.purge_expired() == 0  # already dropped by get()
+
+    clock.now = 5000
+    assert store.purge_expired() == 1
+    assert len(store) == 0
+    assert store.stats()["expired"] == 2
+
+
+def test_heap_does_not_keep_removed_records():
+    """Test that consumed records don't pile up in the expiry heap."""
+    store = ExpiringStore()
+    for i in range(1000):
+        store.put(f"rt{i}", RefreshToken("user", "app", expires_at=2**40))
+        store.take(f"rt{i}")
+
+    assert len(store) == 0
+    assert len(store._expiry_heap) <= 64 + 1
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    """Test that the SQLite backend shares records across instances."""
+    writer = SQLiteStore(tmp_path / "state.db", "authorization_codes", AuthorizationCode)
+    reader = SQLiteStore(tmp_path / "state.db", "authorization_codes", AuthorizationCode)
+    writer.put("code", AuthorizationCode(
+        "user", "app", "http://localhost/cb", "openid", None, "n-1", None, expires_at=2**40
+    ))
+
+    record = reader.take("code")
+    assert record.user_id == "user"
+    assert record.nonce == "n-1"
+    assert writer.take("code") is None
+
+
+def test_sqlite_store_purges_in_batches(tmp_path, clock):
+    """Test that expired rows are deleted across several batches."""
+    store = SQLiteStore(tmp_path / "state.db", "refresh_tokens", RefreshToken, clock=clock)
+    for i in range(SQLiteStore.PURGE_BATCH_SIZE + 10):
+        store.put(f"rt{i}", RefreshToken("user", "app", expires_at=1010))
+    store.put("live", RefreshToken("user", "app", expires_at=9999))
+
+    clock.now = 1010
+    assert store.get("rt0") is None
+    assert store.purge_expired() == SQLiteStore.PURGE_BATCH_SIZE + 10
+    assert len(store) == 1